@@ -8,6 +8,8 @@ import os
 import requests
 
 import cmf_boto
+import cmf_counters
+import item_validation
 from cmf_logger import logger
 
 
@@ -22,6 +24,10 @@ PIPELINE_TEMPLATE_TASK_TABLE = os.getenv('PipelineTemplateTaskDynamoDBTable')
 
 SCHEMAS_TO_OVERWRITE_DURING_UPDATE = ['ssm_job', 'job', 'mgn', 'policy', 'group', 'user', 'role', 'secret']
 
+# The lowercased item names are backfilled by asynchronous invocations of this function, each invocation hands over the
+# remaining schemas to a new one when less than this much time is left.
+NAME_BACKFILL_TIME_MARGIN_MILLIS = int(os.getenv('NAME_BACKFILL_TIME_MARGIN_MILLIS', '120000'))
+
 # Load default schema from json.
 with open('default_schema.json') as json_schema_file:
     default_schema = json.load(json_schema_file)
@@ -101,6 +107,7 @@ def load_cmf_system_defaults():
             TableName=SCHEMA_TABLE,
             Item=item
         )
+    cmf_counters.increment_counter(cmf_counters.SCHEMA_VERSION_COUNTER)
 
     logger.info("Loading default roles")
     for item in default_roles:
@@ -115,6 +122,7 @@ def load_cmf_system_defaults():
             TableName=POLICY_TABLE,
             Item=item
         )
+    cmf_counters.increment_counter(cmf_counters.PERMISSIONS_VERSION_COUNTER)
 
     logger.info("Loading default scripts")
     for item in default_tasks:
@@ -218,6 +226,7 @@ def update_schemas(ddb_client):
     logger.info("Updating default schemas")
     for item in default_schema:
         update_schema(ddb_client, existing_schemas, item)
+    cmf_counters.increment_counter(cmf_counters.SCHEMA_VERSION_COUNTER)
 
 
 def update_cmf_system_defaults():
@@ -233,6 +242,7 @@ def update_cmf_system_defaults():
         )
 
     update_policies(ddb_client)
+    cmf_counters.increment_counter(cmf_counters.PERMISSIONS_VERSION_COUNTER)
 
     logger.info("Replacing default integration tasks")
     for item in default_tasks:
@@ -245,6 +255,32 @@ def update_cmf_system_defaults():
     load_default_pipeline_templates_and_tasks()
 
 
+def start_item_names_backfill(schema_names, context):
+    lambda_client.invoke(FunctionName=context.function_name,
+                         InvocationType='Event',
+                         Payload=json.dumps({'backfill_item_names': schema_names}))
+
+
+def backfill_item_names(schema_names, context):
+    """
+    Backfills the lowercased name attribute of the items of each schema, handing over the schemas left to a new
+    invocation if the time remaining runs out.
+    """
+    def should_stop():
+        return context.get_remaining_time_in_millis() < NAME_BACKFILL_TIME_MARGIN_MILLIS
+
+    for index, schema_name in enumerate(schema_names):
+        table_name = f'{application}-{environment}-{item_validation.map_schema_to_table_name_suffix(schema_name)}'
+        try:
+            data_table = cmf_boto.resource('dynamodb').Table(table_name)
+            if not item_validation.backfill_item_names_lower(data_table, schema_name, should_stop):
+                logger.info(f'Handing over the backfill of {schema_names[index:]} to a new invocation')
+                start_item_names_backfill(schema_names[index:], context)
+                return
+        except Exception as e:
+            logger.error(f'Unable to backfill the item names of {table_name}: {e}')
+
+
 def get_all_ddb_table_items(ddb_table_name):
     client_ddb = cmf_boto.client('dynamodb')
     response = client_ddb.scan(
@@ -261,6 +297,10 @@ def get_all_ddb_table_items(ddb_table_name):
 
 
 def lambda_handler(event, context):
+    if 'backfill_item_names' in event:
+        backfill_item_names(event['backfill_item_names'], context)
+        return
+
     try:
         logger.info('Event:\n {}'.format(event))
         logger.info('Context:\n {}'.format(context))
@@ -287,6 +327,13 @@ def lambda_handler(event, context):
             status = 'SUCCESS'
             message = 'Unexpected event received from CloudFormation'
 
+        if event['RequestType'] in ['Create', 'Update']:
+            try:
+                start_item_names_backfill(item_validation.NAME_INDEX_SCHEMAS, context)
+            except Exception as e:
+                # item name lookups keep scanning the tables until the backfill has completed.
+                logger.error(f'Unable to start the backfill of item names: {e}')
+
     except Exception as e:
         logger.info('FAILED!')
         logger.info(e)
@@ -8,6 +8,7 @@ import os
 from policy import MFAuth
 
 import cmf_boto
+import cmf_dynamodb
 from cmf_utils import cors, default_http_headers
 from cmf_logger import logger, log_event_received
 
@@ -229,7 +230,8 @@ def launch_stack(template_url, app_id, app_name, target_account_id):
         'cloudformation',
         aws_access_key_id=credentials['AccessKeyId'],
         aws_secret_access_key=credentials['SecretAccessKey'],
-        aws_session_token=credentials['SessionToken']
+        aws_session_token=credentials['SessionToken'],
+        credentials_expiration=credentials.get('Expiration')
         )
     stack_name = 'Create-EC2-Servers-for-App-Id-' + app_id + app_name
     capabilities = ['CAPABILITY_IAM', 'CAPABILITY_AUTO_EXPAND','CAPABILITY_NAMED_IAM']
@@ -249,24 +251,13 @@ def launch_stack(template_url, app_id, app_name, target_account_id):
 
 def scan_dynamodb_table(datatype):
     try:
-
         if datatype == 'server':
-            response = servers_table.scan(ConsistentRead=True)
+            table = servers_table
         elif datatype == 'app':
-            response = apps_table.scan(ConsistentRead=True)
+            table = apps_table
         elif datatype == 'wave':
-            response = waves_table.scan(ConsistentRead=True)
-        scan_data = response['Items']
-        while 'LastEvaluatedKey' in response:
-            print("Last Evaluate key is   " + str(response['LastEvaluatedKey']))
-            if datatype == 'server':
-                response = servers_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'],ConsistentRead=True)
-            elif datatype == 'app':
-                response = apps_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'],ConsistentRead=True)
-            elif datatype == 'wave':
-                response = waves_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'],ConsistentRead=True)
-            scan_data.extend(response['Items'])
-        return(scan_data)
+            table = waves_table
+        return cmf_dynamodb.scan_table(table, parallel=True)
 
     except Exception as e:
         print( "ERROR: Unable to retrieve the data from Dynamo DB table: " + str(e))
@@ -14,15 +14,13 @@ from decimal import Decimal
 
 from cmf_logger import logger, log_event_received
 import cmf_boto
+import cmf_dynamodb
+import cmf_item_changes
 from cmf_utils import cors, default_http_headers
 
 application = os.environ['application']
 environment = os.environ['environment']
 
-schema_table_name = '{}-{}-schema'.format(application, environment)
-
-schema_table = cmf_boto.resource('dynamodb').Table(schema_table_name)
-
 PREFIX_INVOCATION = 'Invocation:'
 SUFFIX_DOESNT_EXIST = 'does not exist'
 
@@ -37,14 +35,8 @@ def lambda_handler(event: Any, _):
         logger.debug(f'{PREFIX_INVOCATION} {logging_context}')
 
         #  Get schema object.
-        schema = {}
-        schema_found = False
-        for data_schema in schema_table.scan()['Items']:
-            if data_schema['schema_name'] == schema_name:
-                schema = data_schema
-                schema_found = True
-                break
-        if not schema_found:
+        schema = item_validation.get_schema(schema_name)
+        if not schema:
             msg = 'Invalid schema provided :' + schema_name
             logger.error(f'{PREFIX_INVOCATION} {logging_context}, {msg}')
             return {'headers': {**default_http_headers},
@@ -57,8 +49,12 @@ def lambda_handler(event: Any, _):
         return process_get(event, data_table, schema_name, logging_context)
     elif event['httpMethod'] == 'PUT':
         return process_put(event, data_table, schema_name, schema, logging_context)
+    elif event['httpMethod'] == 'PATCH':
+        return process_patch(event, data_table, schema_name, schema, logging_context)
     elif event['httpMethod'] == 'DELETE':
         return process_delete(event, data_table, schema_name, logging_context)
+    else:
+        return None
 
 
 def process_get(event: Any, data_table: Any, schema_name: str, logging_context: str):
@@ -69,7 +65,7 @@ def process_get(event: Any, data_table: Any, schema_name: str, logging_context:
         )
         if 'ResponseMetadata' in resp and resp['ResponseMetadata']['HTTPStatusCode'] == 200:
             return {'headers': {**default_http_headers},
-                    'body': json.dumps(resp['Items'])}
+                    'body': json.dumps([item_validation.remove_item_name_lower(item) for item in resp['Items']])}
         else:
             msg = 'Error getting data from table for appid: ' + str(event['pathParameters']['appid'])
             logger.error(f'{PREFIX_INVOCATION} {logging_context}, {msg}')
@@ -79,7 +75,7 @@ def process_get(event: Any, data_table: Any, schema_name: str, logging_context:
         resp = data_table.get_item(Key={schema_name + '_id': event['pathParameters']['id']})
         if 'Item' in resp:
             return {'headers': {**default_http_headers},
-                    'body': json.dumps(resp['Item'], cls = JsonEncoder)}
+                    'body': json.dumps(item_validation.remove_item_name_lower(resp['Item']), cls = JsonEncoder)}
         else:
             msg = f'{schema_name} Id {str(event["pathParameters"]["id"])} {SUFFIX_DOESNT_EXIST}'
             logger.error(f'{PREFIX_INVOCATION} {logging_context}, {msg}')
@@ -143,9 +139,11 @@ def process_put_validated(event: Any, data_table: Any, schema_name: str, schema:
             new_audit['createdBy'] = old_audit['createdBy']
 
     new_item['Item']['_history'] = new_audit
+    item_validation.set_item_name_lower(new_item['Item'], schema_name)
     resp = data_table.put_item(
         Item=new_item['Item']
     )
+    cmf_item_changes.increment_items_version_after_write(schema_name)
     return {'headers': {**default_http_headers},
             'body': json.dumps(resp)}
 
@@ -159,17 +157,151 @@ def check_item_exists(existing_item: Any, data_table: Any, event: Any, schema_na
                 'statusCode': 400, 'body': json.dumps({'errors': [msg]})}
 
     # Check if there is an existing [schema]_name
-    existing_data = item_validation.scan_dynamodb_data_table(data_table)
-    for existing_item in existing_data:
-        if schema_name + '_name' in body:
-            if existing_item[schema_name + '_name'].lower() == str(body[schema_name + '_name']).lower() and \
-                    existing_item[schema_name + '_id'] != str(event['pathParameters']['id']):
+    if schema_name + '_name' in body:
+        existing_item_name_ids = item_validation.get_existing_item_name_ids(
+            data_table, schema_name, [body[schema_name + '_name']])
+        for existing_item_ids in existing_item_name_ids.values():
+            if existing_item_ids - {str(event['pathParameters']['id'])}:
                 msg = schema_name + '_name: ' + body[schema_name + '_name'] + ' already exist'
                 logger.error(f'{PREFIX_INVOCATION} {logging_context}, {msg}')
                 return {'headers': {**default_http_headers},
                         'statusCode': 400, 'body': json.dumps({'errors': [msg]})}
 
 
+def process_patch(event: Any, data_table: Any, schema_name: str, schema: Any, logging_context: str):
+    auth = MFAuth()
+    auth_response = auth.get_user_attribute_policy(event, schema_name)
+    if auth_response['action'] == 'allow':
+        return process_patch_validated(event, data_table, schema_name, schema, auth_response, logging_context)
+    else:
+        logger.warning(f'{PREFIX_INVOCATION} {logging_context}, Authorisation failed: {json.dumps(auth_response)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 401,
+                'body': json.dumps({'errors': [auth_response]})}
+
+
+def is_empty_value(value: Any):
+    return value == '' or (isinstance(value, list) and len(value) == 1 and value[0] == '')
+
+
+def get_patch_read_args(schema_name: str, read_attribute_names: Any):
+    # Only the key, the audit and the attributes needed to validate the update are read, unless the schema has to be
+    # validated with the whole item.
+    read_args = {'ConsistentRead': True}
+    if read_attribute_names is not None:
+        projection_attribute_names = {schema_name + '_id', '_history'} | set(read_attribute_names)
+        read_args.update(cmf_dynamodb.get_projection_args(projection_attribute_names))
+    return read_args
+
+
+def get_patch_update_args(item_id: str, schema_name: str, updated_attributes: dict, removed_attribute_names: list,
+                          new_audit: dict, last_modified_timestamp: Any):
+    """
+    Returns the UpdateItem arguments that set the updated attributes and the audit, and remove the removed
+    attributes. The update is conditional on the item not having been modified since it was read.
+    """
+    expression_attribute_names = {'#id': schema_name + '_id', '#history': '_history',
+                                  '#lastModifiedTimestamp': 'lastModifiedTimestamp'}
+    expression_attribute_values = {':history': new_audit}
+    set_actions = ['#history = :history']
+    for i, (key, value) in enumerate(updated_attributes.items()):
+        expression_attribute_names[f'#set{i}'] = key
+        expression_attribute_values[f':set{i}'] = value
+        set_actions.append(f'#set{i} = :set{i}')
+    remove_actions = []
+    for i, key in enumerate(removed_attribute_names):
+        expression_attribute_names[f'#remove{i}'] = key
+        remove_actions.append(f'#remove{i}')
+
+    update_expression = 'SET ' + ', '.join(set_actions)
+    if remove_actions:
+        update_expression += ' REMOVE ' + ', '.join(remove_actions)
+
+    condition_expression = 'attribute_exists(#id) AND '
+    if last_modified_timestamp is None:
+        condition_expression += 'attribute_not_exists(#history.#lastModifiedTimestamp)'
+    else:
+        condition_expression += '#history.#lastModifiedTimestamp = :lastModifiedTimestamp'
+        expression_attribute_values[':lastModifiedTimestamp'] = last_modified_timestamp
+
+    return {
+        'Key': {schema_name + '_id': item_id},
+        'UpdateExpression': update_expression,
+        'ConditionExpression': condition_expression,
+        'ExpressionAttributeNames': expression_attribute_names,
+        'ExpressionAttributeValues': expression_attribute_values,
+        'ReturnValues': 'UPDATED_NEW'
+    }
+
+
+def process_patch_validated(event: Any, data_table: Any, schema_name: str, schema: Any, auth_response: dict,
+                            logging_context: str):
+    """
+    Updates only the attributes in the request body with an UpdateExpression, attributes set to an empty value are
+    removed. The update is validated without reading the whole item and is rejected with a 409 if the item was
+    modified after it was read.
+    """
+    try:
+        body = json.loads(event['body'], parse_float=Decimal)
+        if not isinstance(body, dict):
+            raise ValueError('body is not an object')
+    except Exception as e:
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, {str(e)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 400, 'body': json.dumps({'errors': ['malformed json input']})}
+    if schema_name + '_id' in body or any(key.startswith('_') for key in body.keys()):
+        msg = 'You cannot modify ' + schema_name + '_id or system attributes, they are managed by the system'
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, {msg}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 400, 'body': json.dumps({'errors': [msg]})}
+
+    item_id = event['pathParameters']['id']
+    validator = item_validation.get_schema_validator(schema)
+    read_attribute_names = validator.get_update_attribute_names(set(body.keys()))
+    existing_item = data_table.get_item(Key={schema_name + '_id': item_id},
+                                        **get_patch_read_args(schema_name, read_attribute_names))
+    response = check_item_exists(existing_item, data_table, event, schema_name, body, logging_context)
+    if response is not None:
+        return response
+
+    updated_attributes = {key: value for key, value in body.items() if not is_empty_value(value)}
+    removed_attribute_names = [key for key, value in body.items() if is_empty_value(value)]
+    item = {key: value for key, value in existing_item['Item'].items() if key not in removed_attribute_names}
+    item.update(updated_attributes)
+
+    related_data = item_validation.get_relationship_data([updated_attributes], schema) if updated_attributes else None
+    item_validation_result = validator.validate_update(item, set(body.keys()), related_data)
+    if item_validation_result is not None:
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, Item validation failed: '
+                     f'{json.dumps(item_validation_result)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 400, 'body': json.dumps({'errors': [item_validation_result]})}
+
+    old_audit = existing_item['Item'].get('_history', {})
+    new_audit = {key: old_audit[key] for key in ['createdTimestamp', 'createdBy'] if key in old_audit}
+    if 'user' in auth_response:
+        new_audit['lastModifiedBy'] = auth_response['user']
+        new_audit['lastModifiedTimestamp'] = datetime.now(timezone.utc).isoformat()
+    item_validation.set_item_name_lower(updated_attributes, schema_name)
+
+    try:
+        resp = data_table.update_item(**get_patch_update_args(
+            item_id, schema_name, updated_attributes, removed_attribute_names, new_audit,
+            old_audit.get('lastModifiedTimestamp')))
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        msg = f'{schema_name} Id: {item_id} was modified or deleted by another request, retry the update'
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, {msg}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 409, 'body': json.dumps({'errors': [msg]})}
+
+    cmf_item_changes.increment_items_version_after_write(schema_name)
+    item_validation.remove_item_name_lower(resp.get('Attributes', {}))
+    return {'headers': {**default_http_headers},
+            'body': json.dumps(resp, cls=JsonEncoder)}
+
+
 def cleanup_keys(body: Any, existing_item: Any):
     # Merge new attributes with existing one
     for key in body.keys():
@@ -219,6 +351,7 @@ def process_delete(event: Any, data_table: Any, schema_name: str, logging_contex
                     return {'headers': {**default_http_headers},
                             'statusCode': 400, 'body': json.dumps({'errors': [msg]})}
 
+            cmf_item_changes.increment_items_version_after_write(schema_name)
             return get_delete_response(logging_context, respdel)
 
         else:
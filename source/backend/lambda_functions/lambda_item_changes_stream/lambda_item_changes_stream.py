@@ -0,0 +1,36 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+import os
+
+import cmf_item_changes
+from cmf_logger import logger
+
+application = os.environ['application']
+environment = os.environ['environment']
+
+# Records the changes to the items of CHANGE_LOG_SCHEMAS from the streams of their tables. This lambda has its own event
+# source mappings, separate from the Migration Hub stream lambdas, so that a batch whose changes could not be recorded
+# is retried by the stream, and sent to the on-failure destination, without repeating the Migration Hub updates.
+TABLE_SCHEMA_NAMES = {f'{application}-{environment}-{schema_name}s': schema_name
+                      for schema_name in cmf_item_changes.CHANGE_LOG_SCHEMAS}
+
+
+def get_schema_name(event_source_arn: str):
+    # Stream ARNs are in the form arn:aws:dynamodb:<region>:<account>:table/<table name>/stream/<label>.
+    table_name = event_source_arn.split(':table/')[-1].split('/')[0]
+    return TABLE_SCHEMA_NAMES.get(table_name)
+
+
+def lambda_handler(event, _):
+    records_by_schema = {}
+    for record in event['Records']:
+        schema_name = get_schema_name(record.get('eventSourceARN', ''))
+        if schema_name is None:
+            logger.warning(f"Ignoring stream record from unexpected source: {record.get('eventSourceARN')}")
+            continue
+        records_by_schema.setdefault(schema_name, []).append(record)
+
+    # Errors are raised so that the stream retries the batch, the changes must not be dropped.
+    for schema_name, records in records_by_schema.items():
+        cmf_item_changes.record_stream_changes(schema_name, records)
@@ -0,0 +1,580 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+
+import codecs
+import csv
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Iterator
+from urllib.parse import unquote_plus
+
+import simplejson as json
+from botocore.exceptions import ClientError
+
+import cmf_boto
+import item_validation
+from cmf_logger import logger, log_event_received
+from cmf_utils import default_http_headers
+from policy import MFAuth
+
+application = os.environ['application']
+environment = os.environ['environment']
+import_bucket_name = os.environ.get('import_bucket', '')
+import_jobs_table_name = '{}-{}-import_jobs'.format(application, environment)
+items_function_name = '{}-{}-items'.format(application, environment)
+
+import_jobs_table = cmf_boto.resource('dynamodb').Table(import_jobs_table_name)
+lambda_client = cmf_boto.client('lambda')
+s3_client = cmf_boto.client('s3')
+
+PREFIX_INVOCATION = 'Invocation:'
+
+# Payloads are uploaded to the import bucket with a presigned URL, the upload notification starts a worker that
+# passes the records to the items lambda in chunks, so they are validated and written exactly as by a POST to
+# /user/{schema}. Progress and per-chunk errors are recorded on the job for clients to poll.
+IMPORT_KEY_PREFIX = 'imports/'
+IMPORT_UPLOAD_URL_EXPIRY_SECONDS = 3600
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '500'))
+IMPORT_JOB_RETENTION_DAYS = 30
+
+# Content types of the supported payload formats. JSON payloads are loaded whole, so they are limited to
+# IMPORT_MAX_JSON_PAYLOAD_BYTES. CSV and NDJSON payloads are read line by line from the byte offset the previous chunk
+# ended at, so their memory use and the time to resume do not depend on the size of the payload.
+IMPORT_FORMAT_JSON = 'json'
+IMPORT_FORMAT_CSV = 'csv'
+IMPORT_FORMAT_NDJSON = 'ndjson'
+IMPORT_FORMAT_CONTENT_TYPES = {
+    IMPORT_FORMAT_JSON: 'application/json',
+    IMPORT_FORMAT_CSV: 'text/csv',
+    IMPORT_FORMAT_NDJSON: 'application/x-ndjson'
+}
+IMPORT_MAX_JSON_PAYLOAD_BYTES = int(os.environ.get('IMPORT_MAX_JSON_PAYLOAD_BYTES', str(10 * 1024 * 1024)))
+
+# CSV columns are mapped to the schema attributes with the same name, optionally prefixed with the schema name in square
+# brackets as in the import templates, e.g. [server]server_name. Multiple values are separated by semicolons.
+CSV_LIST_SEPARATOR = ';'
+CSV_TAG_SEPARATOR = '='
+CSV_TRUE_VALUES = ['true', '1', 'on']
+
+# A worker hands the job over to a new invocation of this lambda when less time than this remains before it times out.
+IMPORT_HANDOVER_REMAINING_MILLIS = int(os.environ.get('IMPORT_HANDOVER_REMAINING_MILLIS', '120000'))
+
+# Only the first MAX_JOB_ERRORS chunk errors are kept on the job, to stay within the DynamoDB item size limit.
+MAX_JOB_ERRORS = 100
+
+JOB_STATUS_AWAITING_UPLOAD = 'awaiting_upload'
+JOB_STATUS_IN_PROGRESS = 'in_progress'
+JOB_STATUS_COMPLETED = 'completed'
+JOB_STATUS_FAILED = 'failed'
+
+# Job attributes only used by the workers, they are not returned to clients.
+PRIVATE_JOB_ATTRIBUTES = ['request_context', 'worker_id', 'expires', 'records_in_progress', 'payload_offset',
+                          'payload_line']
+
+# A chunk is recorded on the job before it is sent to the items lambda. If the worker stops before the chunk's progress
+# is recorded, some of its records may have been created, so the next worker skips it instead of importing it twice.
+INTERRUPTED_CHUNK_MESSAGE = 'The import of these records was interrupted, some of them may have been created. ' \
+                            'Check the existing items and import the missing records again.'
+
+
+class JobClaimedException(Exception):
+    pass
+
+
+class InvalidImportException(Exception):
+    pass
+
+
+def lambda_handler(event, context):
+    log_event_received(event)
+
+    if 'Records' in event:
+        # Notifications of payloads uploaded to the import bucket.
+        for record in event['Records']:
+            key = unquote_plus(record['s3']['object']['key'])
+            process_import_job(get_job_id_from_key(key), None, context)
+        return None
+
+    if 'import_job_id' in event:
+        # Handover from a worker that was about to time out.
+        process_import_job(event['import_job_id'], event.get('worker_id'), context)
+        return None
+
+    schema_name = event['pathParameters']['schema']
+    logging_context = schema_name + ':import:' + event['httpMethod']
+    if not item_validation.get_schema(schema_name):
+        msg = 'Invalid schema provided :' + schema_name
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, {msg}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 400, 'body': json.dumps({'errors': [msg]})}
+
+    if event['httpMethod'] == 'POST':
+        return process_post(event, schema_name, logging_context)
+    elif event['httpMethod'] == 'GET':
+        return process_get(event, schema_name, logging_context)
+
+    msg = f'Method {event["httpMethod"]} is not supported'
+    logger.error(f'{PREFIX_INVOCATION} {logging_context}, {msg}')
+    return {'headers': {**default_http_headers},
+            'statusCode': 405, 'body': json.dumps({'errors': [msg]})}
+
+
+def get_job_id_from_key(key: str):
+    return key[len(IMPORT_KEY_PREFIX):].split('.')[0]
+
+
+def get_public_job(job: dict):
+    return {key: value for key, value in job.items() if key not in PRIVATE_JOB_ATTRIBUTES}
+
+
+def process_post(event: dict, schema_name: str, logging_context: str):
+    auth_response = MFAuth().get_user_resource_creation_policy(event, schema_name)
+    if auth_response['action'] != 'allow':
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, Authorisation failed: {json.dumps(auth_response)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 401,
+                'body': json.dumps({'errors': [auth_response]})}
+
+    try:
+        body = json.loads(event['body']) if event.get('body') else {}
+    except ValueError as e:
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, {str(e)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 400, 'body': json.dumps({'errors': ['malformed json input']})}
+    import_format = body.get('format', IMPORT_FORMAT_JSON) if isinstance(body, dict) else None
+    if import_format not in IMPORT_FORMAT_CONTENT_TYPES:
+        msg = f'Invalid import format, supported formats are: {", ".join(IMPORT_FORMAT_CONTENT_TYPES.keys())}'
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, {msg}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 400, 'body': json.dumps({'errors': [msg]})}
+
+    job_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    job = {
+        'job_id': job_id,
+        'schema_name': schema_name,
+        'status': JOB_STATUS_AWAITING_UPLOAD,
+        'format': import_format,
+        'payload_key': f'{IMPORT_KEY_PREFIX}{job_id}.{import_format}',
+        'records_processed': 0,
+        'records_created': 0,
+        'records_failed': 0,
+        'errors': [],
+        'createdTimestamp': now.isoformat(),
+        # The records are imported with the permissions of the user that created the job.
+        'request_context': {'authorizer': {'claims': event['requestContext']['authorizer']['claims']}},
+        'expires': int((now + timedelta(days=IMPORT_JOB_RETENTION_DAYS)).timestamp())
+    }
+    if 'user' in auth_response:
+        job['createdBy'] = auth_response['user']
+    import_jobs_table.put_item(Item=job)
+
+    upload_url = s3_client.generate_presigned_url(
+        'put_object',
+        Params={'Bucket': import_bucket_name, 'Key': job['payload_key'],
+                'ContentType': IMPORT_FORMAT_CONTENT_TYPES[import_format]},
+        ExpiresIn=IMPORT_UPLOAD_URL_EXPIRY_SECONDS
+    )
+    logger.info(f'{PREFIX_INVOCATION} {logging_context}, Created import job {job_id}.')
+    return {'headers': {**default_http_headers},
+            'body': json.dumps({'job': get_public_job(job), 'upload_url': upload_url})}
+
+
+def process_get(event: dict, schema_name: str, logging_context: str):
+    job_id = (event.get('pathParameters') or {}).get('job_id')
+    job = import_jobs_table.get_item(Key={'job_id': job_id}).get('Item') if job_id else None
+    if not job or job['schema_name'] != schema_name:
+        msg = f'Import job {job_id} does not exist'
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, {msg}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 404, 'body': json.dumps({'errors': [msg]})}
+
+    return {'headers': {**default_http_headers},
+            'body': json.dumps(get_public_job(job))}
+
+
+def process_import_job(job_id: str, previous_worker_id: Any, context: Any):
+    """
+    Imports the records of the job's payload, continuing from the last completed chunk.
+
+    Args:
+        job_id: id of the import job
+        previous_worker_id: request id of the worker that handed the job over, None when started by the upload
+        context: lambda context, used to hand the job over before the lambda times out
+    """
+    worker_id = context.aws_request_id
+    try:
+        job = claim_import_job(job_id, previous_worker_id, worker_id)
+    except JobClaimedException:
+        logger.warning(f'Import job {job_id} is not awaiting processing by this worker, ignoring.')
+        return
+
+    try:
+        records, payload_position = read_import_records(job)
+        import_records(job, records, payload_position, worker_id, context)
+    except JobClaimedException:
+        logger.warning(f'Import job {job_id} was claimed by another worker, stopping.')
+    except Exception as e:
+        logger.error(f'Import job {job_id} failed: {str(e)}')
+        fail_import_job(job_id, worker_id, str(e))
+
+
+def claim_import_job(job_id: str, previous_worker_id: Any, worker_id: str):
+    """
+    Makes worker_id the only worker allowed to update the job and returns the job. A new job can be claimed by the
+    worker started by its upload, a job in progress by the worker it was handed over to. Retries of the same
+    invocation share its request id and can reclaim the job.
+
+    Raises:
+        JobClaimedException: if the job does not exist or is not awaiting this worker
+    """
+    condition = '(#status = :in_progress AND worker_id IN (:worker_id, :previous_worker_id))'
+    values = {
+        ':in_progress': JOB_STATUS_IN_PROGRESS,
+        ':worker_id': worker_id,
+        ':previous_worker_id': previous_worker_id or worker_id,
+        ':now': datetime.now(timezone.utc).isoformat()
+    }
+    if previous_worker_id is None:
+        condition += ' OR #status = :awaiting_upload'
+        values[':awaiting_upload'] = JOB_STATUS_AWAITING_UPLOAD
+    try:
+        response = import_jobs_table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression='SET #status = :in_progress, worker_id = :worker_id, '
+                             'startedTimestamp = if_not_exists(startedTimestamp, :now)',
+            ConditionExpression=condition,
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_NEW'
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            raise JobClaimedException(job_id) from e
+        raise
+    return response['Attributes']
+
+
+def read_import_records(job: dict):
+    """
+    Returns an iterator over the records of the job's payload not yet processed, in the job's format, and the position
+    in the payload after the last record returned. CSV and NDJSON payloads are read from the byte offset recorded on
+    the job and their position is updated as records are read, JSON payloads have no position.
+
+    Raises:
+        InvalidImportException: if the payload is not valid in the job's format, or while iterating for CSV and NDJSON
+    """
+    import_format = job.get('format', IMPORT_FORMAT_JSON)
+    if import_format == IMPORT_FORMAT_JSON:
+        return islice(load_json_records(job), int(job['records_processed']), None), None
+
+    payload_position = {'payload_offset': int(job.get('payload_offset', 0)),
+                        'payload_line': int(job.get('payload_line', 0))}
+    # Jobs started before the payload offset was recorded skip the records processed instead.
+    records_to_skip = 0 if 'payload_offset' in job else int(job['records_processed'])
+    lines = count_payload_lines(iter_payload_lines(job['payload_key'], payload_position['payload_offset']),
+                                payload_position)
+    if import_format == IMPORT_FORMAT_CSV:
+        schema = item_validation.get_schema(job['schema_name'])
+        header = read_csv_header(job['payload_key']) if payload_position['payload_offset'] else None
+        records = read_csv_records(lines, job['schema_name'], schema, header, payload_position['payload_line'])
+    else:
+        records = read_ndjson_records(lines, payload_position)
+    return islice(records, records_to_skip, None), payload_position
+
+
+def iter_payload_lines(payload_key: str, payload_offset: int) -> Iterator[bytes]:
+    """
+    Yields the lines of the payload from payload_offset, with their line endings, using a ranged get when resuming.
+    """
+    get_args = {'Bucket': import_bucket_name, 'Key': payload_key}
+    if payload_offset:
+        get_args['Range'] = f'bytes={payload_offset}-'
+    try:
+        response = s3_client.get_object(**get_args)
+    except ClientError as e:
+        # The previous worker stopped after the last record was processed.
+        if payload_offset and e.response.get('Error', {}).get('Code') == 'InvalidRange':
+            return
+        raise
+    yield from response['Body'].iter_lines(keepends=True)
+
+
+def count_payload_lines(lines: Iterator[bytes], payload_position: dict) -> Iterator[bytes]:
+    """
+    Yields lines, advancing the byte offset and line number of payload_position past each line as it is read.
+    """
+    for line in lines:
+        payload_position['payload_offset'] += len(line)
+        payload_position['payload_line'] += 1
+        yield line
+
+
+def read_csv_header(payload_key: str) -> list:
+    """
+    Returns the header row of a CSV payload, reading only its first line.
+    """
+    response = s3_client.get_object(Bucket=import_bucket_name, Key=payload_key)
+    try:
+        first_line = next(response['Body'].iter_lines(keepends=True), b'')
+    finally:
+        response['Body'].close()
+    try:
+        return next(csv.reader([first_line.decode('utf-8-sig')]), [])
+    except (csv.Error, UnicodeError) as e:
+        raise InvalidImportException(f'The import payload is not valid CSV: {str(e)}') from e
+
+
+def load_json_records(job: dict) -> list:
+    """
+    Returns the records of a JSON payload, a list of items or a single item.
+
+    Raises:
+        InvalidImportException: if the payload is larger than IMPORT_MAX_JSON_PAYLOAD_BYTES or not valid JSON
+    """
+    response = s3_client.get_object(Bucket=import_bucket_name, Key=job['payload_key'])
+    if response['ContentLength'] > IMPORT_MAX_JSON_PAYLOAD_BYTES:
+        response['Body'].close()
+        raise InvalidImportException(f'JSON import payloads are limited to {IMPORT_MAX_JSON_PAYLOAD_BYTES} bytes, '
+                                     f'import larger payloads in the {IMPORT_FORMAT_NDJSON} format.')
+    try:
+        records = json.loads(response['Body'].read())
+    except ValueError as e:
+        raise InvalidImportException(f'The import payload is not valid JSON: {str(e)}') from e
+    if isinstance(records, dict):
+        records = [records]
+    if not isinstance(records, list):
+        raise InvalidImportException('The import payload must be a JSON list of items.')
+    return records
+
+
+def read_ndjson_records(lines: Iterator[bytes], payload_position: dict) -> Iterator[dict]:
+    """
+    Yields the records of an NDJSON payload, one item per line. Blank lines are ignored. Line numbers in errors are
+    taken from payload_position, which count_payload_lines advances as lines are read.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        line_number = payload_position['payload_line']
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise InvalidImportException(f'Line {line_number} of the import payload is not valid JSON: {str(e)}') \
+                from e
+        if not isinstance(record, dict):
+            raise InvalidImportException(f'Line {line_number} of the import payload is not a JSON object.')
+        yield record
+
+
+def read_csv_records(lines: Iterator[bytes], schema_name: str, schema: dict, header: Any = None,
+                     first_line_number: int = 0) -> Iterator[dict]:
+    """
+    Yields the records of a CSV payload, converting the values of the columns mapped to the schema's attributes.
+    Columns that are not mapped and empty values are ignored. The first line is the header row, unless the header of a
+    payload read from after its header is provided, in which case first_line_number is the number of lines before.
+    """
+    reader = csv.reader(codecs.iterdecode(lines, 'utf-8' if header is not None else 'utf-8-sig'))
+    if header is None:
+        try:
+            header = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            raise InvalidImportException(f'The import payload is not valid CSV: {str(e)}') from e
+    column_attributes = get_column_attributes(header, schema_name, schema)
+    if not any(column_attributes):
+        raise InvalidImportException(f'None of the columns of the import payload are attributes of {schema_name}.')
+
+    try:
+        for row in reader:
+            record = {}
+            for attribute, value in zip(column_attributes, row):
+                if attribute and value != '':
+                    record[attribute['name']] = convert_csv_value(attribute, value)
+            if record:
+                yield record
+    except csv.Error as e:
+        raise InvalidImportException(f'Line {first_line_number + reader.line_num} of the import payload is not valid '
+                                     f'CSV: {str(e)}') from e
+
+
+def get_column_attributes(header: list, schema_name: str, schema: dict) -> list:
+    """
+    Returns the schema attribute mapped to each column of header, None for columns that are not mapped.
+    """
+    attributes = {attribute['name'].lower(): attribute for attribute in schema.get('attributes', [])}
+    schema_prefix = f'[{schema_name}]'.lower()
+    column_attributes = []
+    for column in header:
+        column_name = column.strip().lower()
+        if column_name.startswith(schema_prefix):
+            column_name = column_name[len(schema_prefix):]
+        column_attributes.append(attributes.get(column_name))
+    return column_attributes
+
+
+def convert_csv_value(attribute: dict, value: str):
+    """
+    Converts a CSV value to the type of the attribute, as the import in the web interface does.
+    """
+    attribute_type = attribute.get('type')
+    if attribute_type == 'multivalue-string' or \
+            (attribute_type in ['list', 'relationship'] and attribute.get('listMultiSelect')):
+        return value.split(CSV_LIST_SEPARATOR)
+    elif attribute_type == 'tag':
+        tags = value[:-1] if value.endswith(CSV_LIST_SEPARATOR) else value
+        if not tags:
+            return []
+        return [{'key': key, 'value': tag_value}
+                for key, _, tag_value in (tag.partition(CSV_TAG_SEPARATOR) for tag in tags.split(CSV_LIST_SEPARATOR))]
+    elif attribute_type == 'checkbox':
+        return value.strip().lower() in CSV_TRUE_VALUES
+    return value
+
+
+def import_records(job: dict, records: Iterator[dict], payload_position: Any, worker_id: str, context: Any):
+    """
+    Imports records, which start after the records processed by previous workers, in chunks of IMPORT_CHUNK_SIZE,
+    skipping the chunk a previous worker was interrupted in, which is reported as failed. The payload position after
+    each chunk is recorded with its progress, so that the next worker can resume reading from it.
+    """
+    job_id = job['job_id']
+    offset = int(job['records_processed'])
+    errors_recorded = len(job.get('errors', []))
+
+    records_interrupted = int(job.get('records_in_progress', 0))
+    if records_interrupted:
+        chunk = list(islice(records, records_interrupted))
+        logger.warning(f'Import job {job_id}, skipping {len(chunk)} records interrupted at record {offset + 1}.')
+        chunk_error = None
+        if errors_recorded < MAX_JOB_ERRORS:
+            chunk_error = {'records': f'{offset + 1}-{offset + len(chunk)}', 'errors': [INTERRUPTED_CHUNK_MESSAGE]}
+            errors_recorded += 1
+        offset += len(chunk)
+        record_import_progress(job, worker_id, offset, 0, len(chunk), chunk_error, payload_position)
+
+    while True:
+        if context.get_remaining_time_in_millis() < IMPORT_HANDOVER_REMAINING_MILLIS:
+            hand_over_import_job(job_id, worker_id, context)
+            return
+
+        chunk = list(islice(records, IMPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+        update_import_job(job_id, worker_id, 'SET records_in_progress = :records_in_progress',
+                          {':records_in_progress': len(chunk)})
+        records_created, errors = import_chunk(job, chunk)
+        chunk_error = None
+        if errors and errors_recorded < MAX_JOB_ERRORS:
+            chunk_error = {'records': f'{offset + 1}-{offset + len(chunk)}', 'errors': errors}
+            errors_recorded += 1
+        offset += len(chunk)
+        record_import_progress(job, worker_id, offset, records_created, len(chunk) - records_created, chunk_error,
+                               payload_position)
+
+    update_import_job(job_id, worker_id,
+                      'SET #status = :completed, records_total = :records_total, completedTimestamp = :now',
+                      {':completed': JOB_STATUS_COMPLETED, ':records_total': offset,
+                       ':now': datetime.now(timezone.utc).isoformat()})
+    logger.info(f'Import job {job_id} completed, {offset} records processed.')
+
+
+def import_chunk(job: dict, chunk: list):
+    """
+    Creates the records in chunk with the items lambda.
+
+    Returns:
+        A tuple of the number of records created and the errors reported for the chunk, if any
+    """
+    event_items = {
+        'httpMethod': 'POST',
+        'requestContext': job['request_context'],
+        'pathParameters': {'schema': job['schema_name']},
+        'body': json.dumps(chunk)
+    }
+    response = lambda_client.invoke(
+        FunctionName=items_function_name,
+        InvocationType='RequestResponse',
+        Payload=json.dumps(event_items)
+    )
+    payload = json.loads(response['Payload'].read().decode('utf-8'))
+    if 'FunctionError' in response:
+        return 0, [f'Unhandled error creating records: {payload.get("errorMessage", "")}']
+
+    try:
+        body = json.loads(payload.get('body', ''))
+    except ValueError:
+        body = payload.get('body', '')
+    if payload.get('statusCode', 200) >= 400:
+        return 0, body.get('errors', body) if isinstance(body, dict) else [body]
+
+    return len(body.get('newItems', [])), body.get('errors')
+
+
+def record_import_progress(job: dict, worker_id: str, records_processed: int, records_created: int,
+                           records_failed: int, chunk_error: Any, payload_position: Any = None):
+    started = datetime.fromisoformat(job['startedTimestamp'])
+    elapsed_seconds = max((datetime.now(timezone.utc) - started).total_seconds(), 1)
+    update_expression = 'SET records_processed = :records_processed, records_per_second = :records_per_second, ' \
+                        'lastModifiedTimestamp = :now'
+    values = {
+        ':records_processed': records_processed,
+        ':records_per_second': Decimal(str(round(records_processed / elapsed_seconds, 1))),
+        ':now': datetime.now(timezone.utc).isoformat(),
+        ':records_created': records_created,
+        ':records_failed': records_failed
+    }
+    for position_attribute, position in (payload_position or {}).items():
+        update_expression += f', {position_attribute} = :{position_attribute}'
+        values[f':{position_attribute}'] = position
+    if chunk_error:
+        update_expression += ', errors = list_append(errors, :chunk_error)'
+        values[':chunk_error'] = [chunk_error]
+    update_expression += ' REMOVE records_in_progress ADD records_created :records_created, ' \
+                         'records_failed :records_failed'
+    update_import_job(job['job_id'], worker_id, update_expression, values)
+
+
+def update_import_job(job_id: str, worker_id: str, update_expression: str, values: dict):
+    """
+    Updates the job if it is still claimed by worker_id, raises JobClaimedException otherwise.
+    """
+    update_args = {
+        'Key': {'job_id': job_id},
+        'UpdateExpression': update_expression,
+        'ConditionExpression': 'worker_id = :worker_id',
+        'ExpressionAttributeValues': {**values, ':worker_id': worker_id}
+    }
+    if '#status' in update_expression:
+        update_args['ExpressionAttributeNames'] = {'#status': 'status'}
+    try:
+        import_jobs_table.update_item(**update_args)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            raise JobClaimedException(job_id) from e
+        raise
+
+
+def hand_over_import_job(job_id: str, worker_id: str, context: Any):
+    logger.info(f'Handing over import job {job_id} before the lambda times out.')
+    lambda_client.invoke(
+        FunctionName=context.function_name,
+        InvocationType='Event',
+        Payload=json.dumps({'import_job_id': job_id, 'worker_id': worker_id})
+    )
+
+
+def fail_import_job(job_id: str, worker_id: str, message: str):
+    try:
+        update_import_job(job_id, worker_id,
+                          'SET #status = :failed, completedTimestamp = :now, '
+                          'errors = list_append(errors, :error)',
+                          {':failed': JOB_STATUS_FAILED, ':now': datetime.now(timezone.utc).isoformat(),
+                           ':error': [{'errors': [message]}]})
+    except JobClaimedException:
+        logger.warning(f'Import job {job_id} was claimed by another worker, not marked as failed.')
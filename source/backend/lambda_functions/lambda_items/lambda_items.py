@@ -4,8 +4,9 @@
 
 import os
 import json
-from time import sleep
-from boto3.dynamodb.types import TypeSerializer
+import base64
+import binascii
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 import uuid
 from policy import MFAuth
@@ -13,18 +14,52 @@ import item_validation
 from typing import Any
 from decimal import Decimal
 
+from botocore.exceptions import ClientError
+
 import cmf_boto
+import cmf_counters
+import cmf_dynamodb
+import cmf_item_changes
+import cmf_json
 from cmf_logger import logger, log_event_received
-from cmf_utils import cors, default_http_headers
+from cmf_utils import cors, default_http_headers, ETAG_HTTP_HEADERS, get_etag, is_etag_matched, \
+    get_not_modified_response
 
 application = os.environ['application']
 environment = os.environ['environment']
 
-schema_table_name = '{}-{}-schema'.format(application, environment)
-schema_table = cmf_boto.resource('dynamodb').Table(schema_table_name)
 client_ddb = cmf_boto.client('dynamodb')
 PREFIX_INVOCATION = 'Invocation:'
 
+# GET returns a single page of items when the limit or cursor query string parameters are provided.
+DEFAULT_GET_PAGE_LIMIT = 100
+MAX_GET_PAGE_LIMIT = 1000
+CURSOR_NOT_VALID_MESSAGE = 'cursor is not valid, it must be the nextCursor of a previous response'
+# GET returns all items sorted by name unless the sort query string parameter is none, in which case the items are
+# returned in the order they are read and encoded one page at a time.
+SORT_BY_NAME = 'name'
+SORT_NONE = 'none'
+
+
+# Bulk updates and deletes report a result for every record in the request.
+BULK_STATUS_UPDATED = 'updated'
+BULK_STATUS_NOT_FOUND = 'not_found'
+BULK_STATUS_INVALID = 'invalid'
+BULK_STATUS_UNPROCESSED = 'unprocessed'
+BULK_STATUS_DELETED = 'deleted'
+BULK_STATUS_PROTECTED = 'protected'
+BULK_STATUS_CONFLICT = 'conflict'
+BULK_DELETE_MAX_WORKERS = int(os.environ.get('BULK_DELETE_MAX_WORKERS', '8'))
+BULK_PUT_MAX_WORKERS = int(os.environ.get('BULK_PUT_MAX_WORKERS', '8'))
+
+
+class InvalidQueryParameterException(Exception):
+    pass
+
+
+class InvalidBulkRequestException(Exception):
+    pass
+
 
 def lambda_handler(event, _):
     logging_context = ''
@@ -35,14 +70,8 @@ def lambda_handler(event, _):
         logging_context = schema_name + ':' + event['httpMethod']
         logger.debug(f'{PREFIX_INVOCATION} {logging_context}')
         #  Get schema object.
-        schema = {}
-        schema_found = False
-        for data_schema in schema_table.scan()['Items']:
-            if data_schema['schema_name'] == schema_name:
-                schema = data_schema
-                schema_found = True
-                break
-        if not schema_found:
+        schema = item_validation.get_schema(schema_name)
+        if not schema:
             msg = 'Invalid schema provided :' + schema_name
             logger.error(msg)
             return {'headers': {**default_http_headers},
@@ -57,46 +86,259 @@ def lambda_handler(event, _):
     data_table = cmf_boto.resource('dynamodb').Table(data_table_name)
 
     if event['httpMethod'] == 'GET':
-        return process_get(data_table, schema_name, logging_context)
+        return process_get(event, data_table, schema_name, logging_context)
     elif event['httpMethod'] == 'POST':
         return process_post(event, data_table, data_table_name, schema, schema_name, logging_context)
+    elif event['httpMethod'] == 'PUT':
+        return process_put(event, data_table, data_table_name, schema, schema_name, logging_context)
+    elif event['httpMethod'] == 'DELETE':
+        return process_delete(event, data_table_name, schema_name, logging_context)
+    else:
+        return None
 
 
-def get_items(items: list, start_indx: int, num_items: int):
-    result = []
-    max_indx = len(items) - 1
-    end_indx = start_indx + num_items
-    if end_indx > max_indx:
-        # Not enough items to get requested num_items.
-        end_indx = max_indx + 1
-    for i in range(start_indx, end_indx):
-        result.append(items[i])
-    return result
+def get_item_id_counter_name(schema_name: str):
+    return f'{schema_name}_id'
+
+
+def seed_item_id_counter(data_table: Any, schema_name: str):
+    # One-time migration for tables created before ids were allocated from the counters table, the counter is
+    # seeded from the highest id already used in the data table.
+    id_key = schema_name + '_id'
+    scan_args = {'ProjectionExpression': '#id', 'ExpressionAttributeNames': {'#id': id_key}}
+    max_id = 0
+    response = data_table.scan(**scan_args)
+    while True:
+        for item in response['Items']:
+            max_id = max(max_id, int(item[id_key]))
+        if 'LastEvaluatedKey' not in response:
+            break
+        response = data_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], **scan_args)
+
+    cmf_counters.seed_counter(get_item_id_counter_name(schema_name), max_id)
+
+
+def reserve_item_ids(data_table: Any, schema_name: str, number_of_ids: int):
+    """
+    Atomically reserves a contiguous block of number_of_ids ids for the schema and returns the first id in the block.
+    """
+    counter_name = get_item_id_counter_name(schema_name)
+    try:
+        last_id = cmf_counters.increment_counter(counter_name, number_of_ids, require_existing=True)
+    except cmf_counters.CounterNotFoundException:
+        seed_item_id_counter(data_table, schema_name)
+        last_id = cmf_counters.increment_counter(counter_name, number_of_ids)
+
+    return last_id - number_of_ids + 1
+
+
+def get_query_string_parameters(event: dict):
+    return event.get('queryStringParameters') or {}
+
+
+def get_page_limit(query_parameters: dict):
+    if 'limit' not in query_parameters:
+        return DEFAULT_GET_PAGE_LIMIT
+    try:
+        limit = int(query_parameters['limit'])
+    except ValueError:
+        raise InvalidQueryParameterException(f'limit must be an integer, provided: {query_parameters["limit"]}')
+    if limit < 1 or limit > MAX_GET_PAGE_LIMIT:
+        raise InvalidQueryParameterException(f'limit must be between 1 and {MAX_GET_PAGE_LIMIT}, provided: {limit}')
+    return limit
+
+
+def get_projection_fields(query_parameters: dict, schema_name: str):
+    """
+    Returns the attribute names requested in the fields query string parameter, or None if all attributes are
+    requested. The id and name attributes are always returned so that items can be identified and ordered.
+    """
+    fields = [field.strip() for field in query_parameters.get('fields', '').split(',') if field.strip()]
+    if not fields:
+        return None
+    return sorted(set(fields) | {schema_name + '_id', schema_name + '_name'})
+
+
+def get_filters(query_parameters: dict):
+    """
+    Returns the conditions in the filter query string parameter, a JSON list of objects with the attribute, the
+    comparator (eq, in, begins_with or exists) and the value, for example
+    [{"attribute": "app_id", "comparator": "in", "value": ["1", "2"]}].
+    """
+    if not query_parameters.get('filter'):
+        return []
+    try:
+        filters = json.loads(query_parameters['filter'], parse_float=Decimal)
+        cmf_dynamodb.validate_filters(filters)
+    except ValueError:
+        raise InvalidQueryParameterException('filter is not valid JSON')
+    except cmf_dynamodb.InvalidFilterException as e:
+        raise InvalidQueryParameterException(f'filter is not valid, {str(e)}')
+    return filters
+
+
+def encode_cursor(last_evaluated_key: dict):
+    cursor = cmf_json.dumps({'key': last_evaluated_key})
+    return base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(cursor: str):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))['key']
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise InvalidQueryParameterException(CURSOR_NOT_VALID_MESSAGE)
 
 
-def get_vacant_id(existing_items_list: list, schema_name: str):
-    ids = []
-    for item in existing_items_list:
-        ids.append(int(item[schema_name + '_id']))
-    ids.sort()
-    if ids:
-        # Get highest id from existing records
-        item_id = ids[-1]
-        # Increment by 1
-        item_id += 1
+def sort_items_by_name(items: list, schema_name: str):
+    name_key = schema_name + '_name'
+    return sorted(items, key=lambda i: i.get(name_key, ''))
+
+
+def get_items_page(query_parameters: dict, data_table: Any, projection_fields: list, filters: list):
+    """
+    Returns a page of items and the cursor for the next page. Items matching an eq filter on a key are queried,
+    otherwise the table is scanned with consistent reads. Pages are returned in table or index order.
+    """
+    limit = get_page_limit(query_parameters)
+    exclusive_start_key = decode_cursor(query_parameters['cursor']) if 'cursor' in query_parameters else None
+
+    filter_key_conditions = cmf_dynamodb.get_filter_key_conditions(data_table, filters, multiple_values=False)
+    if filter_key_conditions:
+        index_name, key_conditions, remaining_filters = filter_key_conditions
+        key_condition = key_conditions[0]
+        filter_expression = cmf_dynamodb.get_filter_condition(remaining_filters)
     else:
-        # No existing record id allocated, start at 1
-        item_id = 1
-    return item_id
+        index_name, key_condition = None, None
+        filter_expression = cmf_dynamodb.get_filter_condition(filters)
+
+    if exclusive_start_key is not None and \
+            not cmf_dynamodb.is_valid_exclusive_start_key(data_table, exclusive_start_key, index_name):
+        raise InvalidQueryParameterException(CURSOR_NOT_VALID_MESSAGE)
+
+    items, last_evaluated_key = cmf_dynamodb.read_page(
+        data_table, limit, exclusive_start_key, key_condition, index_name, projection_fields, filter_expression,
+        consistent_read=index_name is None)
+
+    next_cursor = encode_cursor(last_evaluated_key) if last_evaluated_key else None
+    return items, next_cursor
+
+
+def is_sorted_by_name(query_parameters: dict):
+    sort = query_parameters.get('sort', SORT_BY_NAME)
+    if sort not in [SORT_BY_NAME, SORT_NONE]:
+        raise InvalidQueryParameterException(f'sort must be {SORT_BY_NAME} or {SORT_NONE}, provided: {sort}')
+    return sort == SORT_BY_NAME
+
 
+def get_all_item_pages(data_table: Any, schema_name: str, projection_fields: list, filters: list,
+                       sort_by_name: bool = True):
+    """
+    Returns all items as an iterable of pages. Items are read with a consistent parallel scan, or with key queries
+    when a filter matches a key. Unless sorted by name, the pages are yielded as they are read, so that only one page
+    is held at a time; sorting needs all items and returns them as a single page.
+    """
+    if filters:
+        pages = cmf_dynamodb.get_filtered_item_pages(data_table, filters, projection_fields)
+    else:
+        pages = item_validation.iterate_dynamodb_data_table(data_table, projection_fields, parallel=True)
+
+    if not sort_by_name:
+        return pages
+
+    items = []
+    for page in pages:
+        items.extend(page)
+    return [sort_items_by_name(items, schema_name)]
+
+
+def remove_internal_attributes(items: list):
+    # The lowercased name is only used to check name uniqueness and is not returned to callers.
+    return [item_validation.remove_item_name_lower(item) for item in items]
+
+
+def get_changed_items(query_parameters: dict, data_table: Any, schema_name: str, projection_fields: list):
+    """
+    Returns the items modified, and the ids of the items deleted, since the modifiedSince query string parameter, with
+    the syncTimestamp to pass as modifiedSince on the next request.
+    """
+    if schema_name not in cmf_item_changes.CHANGE_LOG_SCHEMAS:
+        raise InvalidQueryParameterException(f'modifiedSince is not supported for {schema_name} items')
+    if any(parameter in query_parameters for parameter in ['limit', 'cursor', 'filter']):
+        raise InvalidQueryParameterException('modifiedSince cannot be combined with limit, cursor or filter')
+    try:
+        modified_since = cmf_item_changes.parse_timestamp(query_parameters['modifiedSince'])
+    except ValueError:
+        raise InvalidQueryParameterException(f'modifiedSince must be an ISO 8601 timestamp, provided: '
+                                             f'{query_parameters["modifiedSince"]}')
 
-def process_get(data_table: Any, schema_name: str, logging_context: str):
-    item = item_validation.scan_dynamodb_data_table(data_table)
-    new_item = sorted(item, key=lambda i: i[schema_name + '_name'])
-    body = json.dumps(new_item, cls = JsonEncoder)
+    try:
+        sync_timestamp, modified_ids, deleted_ids = cmf_item_changes.get_changes(schema_name, modified_since)
+    except cmf_item_changes.ChangesExpiredException:
+        raise InvalidQueryParameterException(f'modifiedSince is older than the {cmf_item_changes.CHANGE_RETENTION_DAYS}'
+                                             f' days changes are kept for, reload all items')
+
+    id_key = schema_name + '_id'
+    items = cmf_dynamodb.batch_get_items(cmf_boto.resource('dynamodb'), data_table.name,
+                                         [{id_key: item_id} for item_id in modified_ids], projection_fields)
+    # Items deleted after they were modified are reported as deleted.
+    found_ids = {item[id_key] for item in items}
+    deleted_ids = deleted_ids + [item_id for item_id in modified_ids if item_id not in found_ids]
+
+    return {
+        'items': remove_internal_attributes(sort_items_by_name(items, schema_name)),
+        'deleted': sorted(deleted_ids),
+        'syncTimestamp': sync_timestamp
+    }
+
+
+def get_items_etag(schema_name: str, query_parameters: dict):
+    """
+    Returns the ETag of the item listing for the query string parameters, or None if the schema's items are not
+    versioned or the listing is not read with consistent reads. The version is read before the items so that a
+    concurrent change is never hidden behind the ETag, which only holds if the items are read consistently, so
+    filtered listings, which may query an index, and modifiedSince changes have no ETag.
+    """
+    if schema_name not in cmf_counters.ITEMS_VERSION_SCHEMAS or \
+            any(parameter in query_parameters for parameter in ['filter', 'modifiedSince']):
+        return None
+    items_version = cmf_counters.get_counter(cmf_counters.get_items_version_counter(schema_name))
+    return get_etag(schema_name, items_version, json.dumps(query_parameters, sort_keys=True))
+
+
+def process_get(event: dict, data_table: Any, schema_name: str, logging_context: str):
     logger.info(f'{PREFIX_INVOCATION} {logging_context} Received event is: GET')
-    logger.info(f'{PREFIX_INVOCATION} {logging_context} {"Retrieved items are: {}".format(body)}')
-    return {'headers': {**default_http_headers},
+    query_parameters = get_query_string_parameters(event)
+    etag = get_items_etag(schema_name, query_parameters)
+    if etag and is_etag_matched(event, etag):
+        logger.info(f'{PREFIX_INVOCATION} {logging_context} Items not modified.')
+        return get_not_modified_response(etag)
+
+    try:
+        projection_fields = get_projection_fields(query_parameters, schema_name)
+        filters = get_filters(query_parameters)
+        sort_by_name = is_sorted_by_name(query_parameters)
+        if 'modifiedSince' in query_parameters:
+            changes = get_changed_items(query_parameters, data_table, schema_name, projection_fields)
+            item_count = len(changes['items'])
+            body = cmf_json.dumps(changes)
+        elif 'limit' in query_parameters or 'cursor' in query_parameters:
+            items, next_cursor = get_items_page(query_parameters, data_table, projection_fields, filters)
+            item_count = len(items)
+            body = cmf_json.dumps({'items': remove_internal_attributes(items), 'nextCursor': next_cursor})
+        else:
+            body, item_count = cmf_json.encode_pages(
+                remove_internal_attributes(page)
+                for page in get_all_item_pages(data_table, schema_name, projection_fields, filters, sort_by_name))
+    except InvalidQueryParameterException as e:
+        logger.error(f'{PREFIX_INVOCATION} {logging_context} {str(e)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 400, 'body': json.dumps({'errors': [str(e)]})}
+
+    logger.info(f'{PREFIX_INVOCATION} {logging_context} Retrieved {item_count} items.')
+    headers = {**default_http_headers}
+    if etag:
+        headers.update({**ETAG_HTTP_HEADERS, 'ETag': etag})
+    return {'headers': headers,
             'body': body}
 
 
@@ -141,8 +383,11 @@ def process_authorized_post(body: dict, data_table: Any, data_table_name: str, s
     if response is not None:
         return response
 
-    # Get Data table content
-    existing_items_list = item_validation.scan_dynamodb_data_table(data_table)
+    # Get the existing items with the same names, when the schema requires unique names.
+    existing_item_name_ids = {}
+    if not schema.get('allow_duplicates', False):
+        existing_item_name_ids = item_validation.get_existing_item_name_ids(
+            data_table, schema_name, [item[schema_name + '_name'] for item in body])
 
     # Create record audit.
     new_audit = {}
@@ -170,17 +415,25 @@ def process_authorized_post(body: dict, data_table: Any, data_table_name: str, s
 
     # Validate records before putRequest.
     _, item_name_duplicates, item_name_exists, items_validation_errors, items_validated = \
-        get_validated_items(body, schema_name, schema, related_data, existing_items_list, new_audit)
+        get_validated_items(body, schema_name, schema, related_data, existing_item_name_ids, new_audit, data_table)
 
-    responses = []
+    unprocessed_items = []
     logger.debug(f'{PREFIX_INVOCATION} {logging_context}, Validated items to process: '
                  f'{json.dumps(items_validated)}')
     # if there are valid items then process them only.
     if items_validated:
-        save_validated_items(items_validated, data_table_name, responses, logging_context)
+        unprocessed_items = save_validated_items(items_validated, data_table_name, logging_context)
+        # Only report items as new if they were written.
+        unprocessed_item_ids = {item[schema_name + '_id'] for item in unprocessed_items}
+        items_validated = remove_internal_attributes(
+            [item for item in items_validated if item[schema_name + '_id'] not in unprocessed_item_ids])
+        if items_validated:
+            cmf_item_changes.increment_items_version_after_write(schema_name)
 
     has_errors, return_messages = check_for_errors(items_validation_errors, item_name_duplicates,
-                                                   item_name_exists, responses, logging_context)
+                                                   item_name_exists,
+                                                   [item[schema_name + '_name'] for item in unprocessed_items],
+                                                   logging_context)
 
     if has_errors:
         logger.warning(f'{PREFIX_INVOCATION} {logging_context}, '
@@ -194,61 +447,20 @@ def process_authorized_post(body: dict, data_table: Any, data_table_name: str, s
                 'body': json.dumps({'newItems': items_validated})}
 
 
-def save_validated_items(items_validated: list, data_table_name: str, responses: list, logging_context: str):
-    ts = TypeSerializer()
-    start_indx = 0
+def save_validated_items(items_validated: list, data_table_name: str, logging_context: str):
+    """
+    Writes the validated items to the data table and returns the items that could not be written.
+    """
     logger.info(f'{PREFIX_INVOCATION} {logging_context}, Number of valid items to process: '
                 f'{str(len(items_validated))}')
-    while True:
-        item_list = get_items(items_validated, start_indx, 25)
-        table_content = []
-        for item in item_list:
-            put_request = {'PutRequest': {'Item': ts.serialize(item)['M']}}
-            table_content.append(put_request)
-        resp = client_ddb.batch_write_item(
-            RequestItems={data_table_name: table_content}
-        )
-        resp = retry_unprocessed_items(resp, item_list, logging_context)
-        responses.append(resp)
-        new_start_indx = start_indx + 25
-        max_indx = len(items_validated) - 1
-        if max_indx >= new_start_indx:
-            start_indx += 25
-        else:
-            break
-
-
-def retry_unprocessed_items(resp: dict, item_list: list, logging_context: str):
-    if len(resp['UnprocessedItems']) == 0:
-        logger.debug(f'{PREFIX_INVOCATION} {logging_context}, Successfully wrote '
-                     f'{str(len(item_list))} items')
+    unprocessed_items = cmf_dynamodb.batch_put_items(client_ddb, data_table_name, items_validated)
+    if unprocessed_items:
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, {str(len(unprocessed_items))} items could not be '
+                     f'written after retrying')
     else:
-        # Hit the provisioned write limit
-        logger.info(f'{PREFIX_INVOCATION} {logging_context}, '
-                    f'Hit write limit, backing off then retrying')
-        sleep(5)
-
-        # Items left over that haven't been inserted
-        unprocessed_items = resp['UnprocessedItems']
-        logger.debug(f'{PREFIX_INVOCATION} {logging_context}, Resubmitting items')
-        # Loop until unprocessed items are written
-        # TODO //NOSONAR
-        # inifinite loop warning if there are unexpected errors from the batch write api
-        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/dynamodb/client/batch_write_item.html
-        # check the comments in the function check_for_errors
-        while len(unprocessed_items) > 0:
-            resp = client_ddb.batch_write_item(
-                RequestItems=unprocessed_items
-            )
-            # If any items are still left over, add them to the
-            # list to be written
-            unprocessed_items = resp['UnprocessedItems']
-
-            # If there are items left over, we could do with
-            # sleeping some more
-            if len(unprocessed_items) > 0:
-                sleep(5)
-    return resp
+        logger.debug(f'{PREFIX_INVOCATION} {logging_context}, Successfully wrote '
+                     f'{str(len(items_validated))} items')
+    return unprocessed_items
 
 
 def validate_records_in_payload(body, schema_name, logging_context):
@@ -267,20 +479,28 @@ def validate_records_in_payload(body, schema_name, logging_context):
                                                "_id, this is managed by the system"}
 
 
-def get_new_item_id_number(existing_item_list, schema, schema_name):
-    if schema.get('key_type', 'number') == 'number':
-        # Get vacant {schema}_id based on incremental numbering.
-        return get_vacant_id(existing_item_list, schema_name)
+def get_new_item_id_number(data_table, schema, schema_name, number_of_ids):
+    if schema.get('key_type', 'number') == 'number' and number_of_ids > 0:
+        # Reserve a block of {schema}_id numbers for the new items.
+        return reserve_item_ids(data_table, schema_name, number_of_ids)
     else:
         return None
 
 
-def validate_item(schema, schema_name, item, existing_item_list, related_data, item_name_exists_errors, items_validation_errors, item_name_duplicates_errors, item_name_list):
+def update_item_id_counter_with_provided_ids(items, schema, schema_name):
+    # Ensure ids provided by the caller are never handed out by the counter.
+    if schema.get('key_type', 'number') != 'number':
+        return
+    provided_ids = [int(item[schema_name + '_id']) for item in items if item.get(schema_name + '_id')]
+    if provided_ids:
+        cmf_counters.set_counter_minimum(get_item_id_counter_name(schema_name), max(provided_ids))
+
+
+def validate_item(schema, schema_name, item, existing_item_name_ids, related_data, item_name_exists_errors, items_validation_errors, item_name_duplicates_errors, item_name_list):
     is_valid = True
     # Check if the record already exists based on _name if schema does not allow duplicate _names.
-    if not schema.get('allow_duplicates', False) and item_validation.does_item_exist(schema_name + '_name',
-                                                                                     item[schema_name + '_name'],
-                                                                                     existing_item_list):
+    if not schema.get('allow_duplicates', False) and \
+            item_validation.normalize_item_name(item[schema_name + '_name']) in existing_item_name_ids:
         item_name_exists_errors.append(item[schema_name + '_name'])
         is_valid = False
 
@@ -300,34 +520,42 @@ def validate_item(schema, schema_name, item, existing_item_list, related_data, i
     return is_valid
 
 
-def get_validated_items(body, schema_name, schema, related_data, existing_item_list, new_audit) -> \
+def get_validated_items(body, schema_name, schema, related_data, existing_item_name_ids, new_audit, data_table) -> \
         (dict, dict, dict, dict):
     item_name_list = []
     item_name_duplicates = []
     item_name_exists = []
     items_validation_errors = []
     items_validated = []
-
-    next_vacant_item_id_number = get_new_item_id_number(existing_item_list, schema, schema_name)
+    valid_items = []
 
     for item in body:
         is_valid = validate_item(
-            schema, schema_name, item, existing_item_list, related_data, item_name_exists, items_validation_errors, item_name_duplicates, item_name_list
+            schema, schema_name, item, existing_item_name_ids, related_data, item_name_exists, items_validation_errors, item_name_duplicates, item_name_list
         )
 
         if is_valid:
-            try:
-                set_new_item_system_attributes(
-                    item, schema_name, schema, items_validation_errors, next_vacant_item_id_number, new_audit
-                )
-                # if next_item_id_number specified then increment.
-                if next_vacant_item_id_number:
-                    next_vacant_item_id_number += 1
-            except ValueError:
-                return item_name_list, item_name_duplicates, item_name_exists, items_validation_errors, items_validated
-
-            # Add item to be processed.
-            items_validated.append(item)
+            valid_items.append(item)
+
+    number_of_ids_required = len([item for item in valid_items if not item.get(f'__{schema_name}_id', None)])
+    next_vacant_item_id_number = get_new_item_id_number(data_table, schema, schema_name, number_of_ids_required)
+
+    for item in valid_items:
+        id_provided = bool(item.get(f'__{schema_name}_id', None))
+        try:
+            set_new_item_system_attributes(
+                item, schema_name, schema, items_validation_errors, next_vacant_item_id_number, new_audit
+            )
+            # if next_item_id_number specified and used then increment.
+            if next_vacant_item_id_number and not id_provided:
+                next_vacant_item_id_number += 1
+        except ValueError:
+            break
+
+        # Add item to be processed.
+        items_validated.append(item)
+
+    update_item_id_counter_with_provided_ids(items_validated, schema, schema_name)
 
     return item_name_list, item_name_duplicates, item_name_exists, items_validation_errors, items_validated
 
@@ -349,12 +577,13 @@ def set_new_item_system_attributes(item, schema_name, schema, items_validation_e
             next_item_id_number += 1
         else:
             item[schema_name + '_id'] = str(uuid.uuid4())
+    item_validation.set_item_name_lower(item, schema_name)
     # Add audit data to new item.
     item['_history'] = new_audit
 
 
-def check_for_errors(items_validation_errors: list, item_name_duplicates: list, item_name_exists: list, responses: list,
-                     logging_context: str) -> (bool, dict):
+def check_for_errors(items_validation_errors: list, item_name_duplicates: list, item_name_exists: list,
+                     unprocessed_items: list, logging_context: str) -> (bool, dict):
     return_messages = {}
     has_errors = False
     # If validation errors were found then report the list to calling function.
@@ -376,31 +605,315 @@ def check_for_errors(items_validation_errors: list, item_name_duplicates: list,
         return_messages['existing_name'] = item_name_exists
         has_errors = True
 
-    # Check responses for all chunks
-    # TODO //NOSONAR
-    # this is unreachable because the loop while len(unprocessed_items) > 0: doesn't exit
-    # until all the items are put
-    # it could theoretically be an infinite loop
-    # implementing exponential backoff or at least adding max number of re-tries and having this check makes sense
-    unprocessed_items = []
-    for response in responses:
-        if (response['ResponseMetadata']['HTTPStatusCode'] != 200):
-            if 'UnprocessedItems' in response:
-                if 'PutRequest' in response['UnprocessedItems']:
-                    unprocessed_items.append(response['UnprocessedItems']['PutRequest'])
-                    has_errors = True
-
-    # add unprocessed items to return messages.
+    # Items that could not be written, after retrying, are reported by name.
     if unprocessed_items:
         return_messages['unprocessed_items'] = unprocessed_items
+        has_errors = True
 
     return has_errors, return_messages
 
 
-class JsonEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return str(obj)
-        elif isinstance(obj, bytes):
-            return str(obj, encoding='utf-8')
-        return json.JSONEncoder.default(self, obj)
+def get_bulk_updates(event: dict, schema_name: str):
+    """
+    Returns the updates in the body of a bulk PUT, a list of {"id": "1", "attributes": {...}} objects, or a single
+    object. Ids are returned as strings.
+    """
+    try:
+        body = json.loads(event['body'], parse_float=Decimal)
+    except (TypeError, ValueError):
+        raise InvalidBulkRequestException('malformed json input')
+    if isinstance(body, dict):
+        body = [body]
+    if not isinstance(body, list) or not body:
+        raise InvalidBulkRequestException('body must be a list of objects with an id and attributes')
+
+    updates = []
+    item_ids = set()
+    for update in body:
+        if not isinstance(update, dict) or update.get('id') in (None, '') or \
+                not isinstance(update.get('attributes'), dict) or not update['attributes']:
+            raise InvalidBulkRequestException('each update must have an id and a non-empty attributes object, '
+                                              f'provided: {cmf_json.dumps(update)}')
+        if schema_name + '_id' in update['attributes']:
+            raise InvalidBulkRequestException(f'You cannot modify {schema_name}_id, it is managed by the system')
+        item_id = str(update['id'])
+        if item_id in item_ids:
+            raise InvalidBulkRequestException(f'{schema_name} Id: {item_id} is updated more than once')
+        item_ids.add(item_id)
+        updates.append({'id': item_id, 'attributes': update['attributes']})
+
+    return updates
+
+
+def process_put(event: dict, data_table: Any, data_table_name: str, schema: dict, schema_name: str,
+                logging_context: str):
+    try:
+        updates = get_bulk_updates(event, schema_name)
+    except InvalidBulkRequestException as e:
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, {str(e)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 400, 'body': json.dumps({'errors': [str(e)]})}
+
+    # The policy is evaluated once for the set of all the attributes being updated.
+    attribute_names = {key for update in updates for key in update['attributes'].keys()}
+    auth = MFAuth()
+    auth_response = auth.get_user_attribute_policy(event, schema_name, attribute_names)
+    if auth_response['action'] != 'allow':
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, Authorisation failed: {json.dumps(auth_response)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 401,
+                'body': json.dumps({'errors': [auth_response]})}
+
+    logger.info(f'{PREFIX_INVOCATION} {logging_context}, Starting update of {str(len(updates))} items.')
+    try:
+        results = process_authorized_put(updates, data_table, data_table_name, schema_name, schema, auth_response,
+                                         logging_context)
+    except Exception as e:
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, Unhandled exception: {str(e)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 500,
+                'body': json.dumps(
+                    {'errors': ['Unhandled API Exception: check logs for detailed error message.']})}
+
+    return {'headers': {**default_http_headers},
+            'body': cmf_json.dumps({'results': results})}
+
+
+def get_existing_items(data_table_name: str, schema_name: str, item_ids: list):
+    """
+    Returns a dict of id to the existing item for the ids provided, ids that do not exist are omitted.
+    """
+    id_key = schema_name + '_id'
+    items = cmf_dynamodb.batch_get_items(
+        cmf_boto.resource('dynamodb'), data_table_name, [{id_key: item_id} for item_id in item_ids])
+    return {item[id_key]: item for item in items}
+
+
+def merge_item_attributes(existing_item: dict, attributes: dict):
+    # Merge new attributes with the existing ones, attributes set to an empty value are removed.
+    item = {**existing_item, **attributes}
+    for key in list(item.keys()):
+        if item[key] == '' or (isinstance(item[key], list) and len(item[key]) == 1 and item[key][0] == ''):
+            del item[key]
+    return item
+
+
+def get_update_name_errors(updates: list, data_table: Any, schema_name: str, schema: dict):
+    """
+    Returns a dict of id to the error message for the updates that rename an item to a name that is already used by
+    another item, or by another update in the same request.
+    """
+    name_key = schema_name + '_name'
+    new_names = {update['id']: update['attributes'][name_key] for update in updates
+                 if name_key in update['attributes']}
+    if not new_names or schema.get('allow_duplicates', False):
+        return {}
+
+    existing_item_name_ids = item_validation.get_existing_item_name_ids(data_table, schema_name, new_names.values())
+    name_errors = {}
+    requested_lower_names = set()
+    for item_id, name in new_names.items():
+        lower_name = item_validation.normalize_item_name(name)
+        if existing_item_name_ids.get(lower_name, set()) - {item_id}:
+            name_errors[item_id] = f'{name_key}: {name} already exist'
+        elif lower_name in requested_lower_names:
+            name_errors[item_id] = f'{name_key}: {name} is duplicated in the request'
+        requested_lower_names.add(lower_name)
+
+    return name_errors
+
+
+def get_updated_audit(existing_item: dict, auth_response: dict, timestamp: str):
+    new_audit = {}
+    if 'user' in auth_response:
+        new_audit['lastModifiedBy'] = auth_response['user']
+        new_audit['lastModifiedTimestamp'] = timestamp
+
+    old_audit = existing_item.get('_history', {})
+    if 'createdTimestamp' in old_audit:
+        new_audit['createdTimestamp'] = old_audit['createdTimestamp']
+    if 'createdBy' in old_audit:
+        new_audit['createdBy'] = old_audit['createdBy']
+    return new_audit
+
+
+def process_authorized_put(updates: list, data_table: Any, data_table_name: str, schema_name: str, schema: dict,
+                           auth_response: dict, logging_context: str):
+    """
+    Validates and writes a batch of updates, reading the existing items, checking names and loading the related
+    records for validation once for the whole batch.
+
+    Each item is written only if it has not been modified since it was read, updates that lose the race with another
+    request are reported with the conflict status.
+
+    Returns:
+        List of {'id', 'status', 'errors'} results in the order of the updates, errors is only set for updates that
+        were not applied
+    """
+    results = {update['id']: {'id': update['id']} for update in updates}
+    existing_items = get_existing_items(data_table_name, schema_name, list(results.keys()))
+    name_errors = get_update_name_errors(updates, data_table, schema_name, schema)
+
+    updated_items = {}
+    for update in updates:
+        item_id = update['id']
+        if item_id not in existing_items:
+            results[item_id].update(status=BULK_STATUS_NOT_FOUND,
+                                    errors=[f'{schema_name} Id: {item_id} does not exist'])
+        elif item_id in name_errors:
+            results[item_id].update(status=BULK_STATUS_INVALID, errors=[name_errors[item_id]])
+        else:
+            updated_items[item_id] = merge_item_attributes(existing_items[item_id], update['attributes'])
+
+    related_data = item_validation.get_relationship_data(list(updated_items.values()), schema) \
+        if updated_items else None
+    timestamp = datetime.now(timezone.utc).isoformat()
+    items_validated = []
+    for item_id, item in updated_items.items():
+        item_validation_result = item_validation.check_valid_item_create(item, schema, related_data)
+        if item_validation_result is not None:
+            results[item_id].update(status=BULK_STATUS_INVALID, errors=item_validation_result)
+            continue
+        item['_history'] = get_updated_audit(existing_items[item_id], auth_response, timestamp)
+        item_validation.set_item_name_lower(item, schema_name)
+        items_validated.append(item)
+
+    written_count = 0
+    for result in put_updated_items(data_table_name, schema_name, items_validated, existing_items):
+        results[result['id']].update(result)
+        if result['status'] == BULK_STATUS_UPDATED:
+            written_count += 1
+    if written_count:
+        cmf_item_changes.increment_items_version_after_write(schema_name)
+
+    logger.info(f'{PREFIX_INVOCATION} {logging_context}, Updated {written_count} of {len(updates)} items.')
+    return list(results.values())
+
+
+def put_updated_item(data_table_name: str, schema_name: str, item: dict, last_modified_timestamp: Any):
+    """
+    Writes the updated item in a conditional PutItem, which fails if the item was modified or deleted by another
+    request since it was read.
+    """
+    item_id = item[schema_name + '_id']
+    result = {'id': item_id}
+    put_args = {
+        'Item': item,
+        'ConditionExpression': 'attribute_exists(#id) AND ',
+        'ExpressionAttributeNames': {'#id': schema_name + '_id', '#history': '_history',
+                                     '#lastModifiedTimestamp': 'lastModifiedTimestamp'}
+    }
+    if last_modified_timestamp is None:
+        put_args['ConditionExpression'] += 'attribute_not_exists(#history.#lastModifiedTimestamp)'
+    else:
+        put_args['ConditionExpression'] += '#history.#lastModifiedTimestamp = :lastModifiedTimestamp'
+        put_args['ExpressionAttributeValues'] = {':lastModifiedTimestamp': last_modified_timestamp}
+    try:
+        cmf_boto.resource('dynamodb').Table(data_table_name).put_item(**put_args)
+        result['status'] = BULK_STATUS_UPDATED
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            logger.error(f'{PREFIX_INVOCATION} Unable to update {schema_name} Id: {item_id}, {str(e)}')
+            result.update(status=BULK_STATUS_UNPROCESSED, errors=['Item could not be written, retry the update'])
+        else:
+            result.update(status=BULK_STATUS_CONFLICT,
+                          errors=[f'{schema_name} Id: {item_id} was modified or deleted by another request, '
+                                  f'retry the update'])
+    return result
+
+
+def put_updated_items(data_table_name: str, schema_name: str, items: list, existing_items: dict):
+    """
+    Writes the updated items concurrently and returns a result for each item in order. BatchWriteItem does not
+    support conditions, so each item is written with its own conditional PutItem.
+    """
+    def put_item(item):
+        existing_item = existing_items[item[schema_name + '_id']]
+        return put_updated_item(data_table_name, schema_name, item,
+                                existing_item.get('_history', {}).get('lastModifiedTimestamp'))
+
+    if len(items) <= 1:
+        return [put_item(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(BULK_PUT_MAX_WORKERS, len(items))) as executor:
+        return list(executor.map(put_item, items))
+
+
+def get_bulk_delete_ids(event: dict):
+    """
+    Returns the ids in the body of a bulk DELETE, a list of ids, as strings without duplicates.
+    """
+    try:
+        body = json.loads(event['body'])
+    except (TypeError, ValueError):
+        raise InvalidBulkRequestException('malformed json input')
+    if not isinstance(body, list) or not body:
+        raise InvalidBulkRequestException('body must be a list of ids')
+    for item_id in body:
+        if not isinstance(item_id, (str, int)) or isinstance(item_id, bool) or item_id == '':
+            raise InvalidBulkRequestException(f'ids must be strings or numbers, provided: {json.dumps(item_id)}')
+    return list(dict.fromkeys(str(item_id) for item_id in body))
+
+
+def process_delete(event: dict, data_table_name: str, schema_name: str, logging_context: str):
+    try:
+        item_ids = get_bulk_delete_ids(event)
+    except InvalidBulkRequestException as e:
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, {str(e)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 400, 'body': json.dumps({'errors': [str(e)]})}
+
+    auth = MFAuth()
+    auth_response = auth.get_user_resource_creation_policy(event, schema_name)
+    if auth_response['action'] != 'allow':
+        logger.error(f'{PREFIX_INVOCATION} {logging_context}, Authorisation failed: {json.dumps(auth_response)}')
+        return {'headers': {**default_http_headers},
+                'statusCode': 401,
+                'body': json.dumps({'errors': [auth_response]})}
+
+    logger.info(f'{PREFIX_INVOCATION} {logging_context}, Starting delete of {str(len(item_ids))} items.')
+    results = delete_items(data_table_name, schema_name, item_ids)
+    deleted_count = len([result for result in results if result['status'] == BULK_STATUS_DELETED])
+    if deleted_count:
+        cmf_item_changes.increment_items_version_after_write(schema_name)
+    logger.info(f'{PREFIX_INVOCATION} {logging_context}, Deleted {deleted_count} of {len(item_ids)} items.')
+    return {'headers': {**default_http_headers},
+            'body': json.dumps({'results': results})}
+
+
+def delete_item(data_table_name: str, schema_name: str, item_id: str):
+    """
+    Deletes the item unless it has deletion protection enabled, in a single conditional DeleteItem. When the
+    condition fails the item returned by DynamoDB tells whether the item was protected or does not exist.
+    """
+    result = {'id': item_id}
+    try:
+        client_ddb.delete_item(
+            TableName=data_table_name,
+            Key={schema_name + '_id': {'S': item_id}},
+            ConditionExpression='attribute_exists(#id) AND #deletion_protection <> :protected',
+            ExpressionAttributeNames={'#id': schema_name + '_id', '#deletion_protection': 'deletion_protection'},
+            ExpressionAttributeValues={':protected': {'BOOL': True}},
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+        result['status'] = BULK_STATUS_DELETED
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            logger.error(f'{PREFIX_INVOCATION} Unable to delete {schema_name} Id: {item_id}, {str(e)}')
+            result.update(status=BULK_STATUS_UNPROCESSED, errors=['Item could not be deleted, retry the delete'])
+        elif 'Item' in e.response:
+            result.update(status=BULK_STATUS_PROTECTED,
+                          errors=['Record has deletion protection flag enabled, and cannot be deleted.'])
+        else:
+            result.update(status=BULK_STATUS_NOT_FOUND, errors=[f'{schema_name} Id: {item_id} does not exist'])
+    return result
+
+
+def delete_items(data_table_name: str, schema_name: str, item_ids: list):
+    """
+    Deletes the items concurrently, honouring deletion protection, and returns a result for each id in order.
+    BatchWriteItem does not support conditions, so each item is deleted with its own conditional DeleteItem.
+    """
+    if len(item_ids) == 1:
+        return [delete_item(data_table_name, schema_name, item_ids[0])]
+    with ThreadPoolExecutor(max_workers=min(BULK_DELETE_MAX_WORKERS, len(item_ids))) as executor:
+        return list(executor.map(lambda item_id: delete_item(data_table_name, schema_name, item_id), item_ids))
@@ -7,7 +7,9 @@ import simplejson as json
 from datetime import datetime, timezone
 
 import cmf_boto
-from cmf_utils import cors, default_http_headers, CONST_DT_FORMAT, get_date_from_string
+import cmf_counters
+from cmf_utils import cors, default_http_headers, CONST_DT_FORMAT, get_date_from_string, ETAG_HTTP_HEADERS, \
+    get_etag, is_etag_matched, get_not_modified_response
 from cmf_logger import logger, log_event_received
 
 application = os.environ['application']
@@ -40,6 +42,11 @@ def lambda_handler(event, _):
     log_event_received(event)
 
     if event['httpMethod'] == 'GET':
+        # Notifications only report schema changes, so they are unchanged while the schema version is.
+        etag = get_etag('notifications', cmf_counters.get_counter(cmf_counters.SCHEMA_VERSION_COUNTER))
+        if is_etag_matched(event, etag):
+            return get_not_modified_response(etag)
+
         resp_server = schema_table.get_item(Key={'schema_name': 'server'})
         resp_app = schema_table.get_item(Key={'schema_name': 'app'})
         resp_wave = schema_table.get_item(Key={'schema_name': 'wave'})
@@ -68,7 +75,7 @@ def lambda_handler(event, _):
         notifications['notifications'].append(schema_notifications)
         notifications['lastChangeDate'] = last_change_date.isoformat()
 
-        return {'headers': {**default_http_headers},
+        return {'headers': {**default_http_headers, **ETAG_HTTP_HEADERS, 'ETag': etag},
                 'statusCode': 200,
                 'body': json.dumps(notifications)
                 }
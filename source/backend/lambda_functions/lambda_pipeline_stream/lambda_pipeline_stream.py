@@ -2,6 +2,7 @@
 #  SPDX-License-Identifier: Apache-2.0
 
 import cmf_boto
+import cmf_dynamodb
 import boto3
 from boto3.dynamodb.conditions import Key
 import botocore
@@ -26,16 +27,7 @@ pipelines_table = cmf_boto.resource('dynamodb').Table(pipelines_table_name)
 
 
 def query_dynamodb_index(data_table, index_name, key_condition):
-    response = data_table.query(
-        IndexName=index_name,
-        KeyConditionExpression=key_condition
-    )
-    query_data = response['Items']
-    while 'LastEvaluatedKey' in response:
-        logger.info("Last Evaluated key is " + str(response['LastEvaluatedKey']))
-        response = data_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], ConsistentRead=True)
-        query_data.extend(response['Items'])
-    return query_data
+    return cmf_dynamodb.query_table(data_table, key_condition, index_name)
 
 
 def handle_creation_pipeline_event(dynamodb_image):
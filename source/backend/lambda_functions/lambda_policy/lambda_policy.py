@@ -7,6 +7,7 @@ import json
 from typing import Any
 
 import cmf_boto
+import cmf_counters
 from cmf_logger import logger, log_event_received
 from cmf_utils import cors, default_http_headers
 
@@ -100,6 +101,7 @@ def update_policy(item_list: list, body: dict, entity_access: list[dict[str, Any
             'entity_access': entity_access
         }
     )
+    cmf_counters.increment_counter(cmf_counters.PERMISSIONS_VERSION_COUNTER)
 
     resp = policy_table.get_item(Key={'policy_id': str(policy_id)})
     if 'Item' in resp:
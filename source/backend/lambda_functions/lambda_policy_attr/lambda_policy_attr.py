@@ -7,6 +7,7 @@ import json
 from typing import Any
 
 import cmf_boto
+import cmf_counters
 from cmf_logger import logger, log_event_received
 from cmf_utils import cors, default_http_headers
 
@@ -159,6 +160,7 @@ def process_delete(event: dict):
             policy_id = policy['policy_id']
     if policy_id != "":
         delete_resp = policies_table.delete_item(Key={'policy_id': policy_id})
+        cmf_counters.increment_counter(cmf_counters.PERMISSIONS_VERSION_COUNTER)
         if delete_resp['ResponseMetadata']['HTTPStatusCode'] == 200:
             logger.info('%s policy_id: %s  was successfully deleted', event['httpMethod'], policy_id)
             return {
@@ -270,6 +272,7 @@ def process_put(event: dict):
             'entity_access': entity_access
         }
     )
+    cmf_counters.increment_counter(cmf_counters.PERMISSIONS_VERSION_COUNTER)
 
     logger.info('%s SUCCESSFUL', event['httpMethod'])
     return {
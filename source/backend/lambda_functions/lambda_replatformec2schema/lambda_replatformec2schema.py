@@ -5,6 +5,7 @@ import json
 import os
 
 import cmf_boto
+import cmf_counters
 import requests
 from cmf_logger import logger
 
@@ -501,6 +502,7 @@ def load_schema():
             }
 
         )
+    cmf_counters.increment_counter(cmf_counters.SCHEMA_VERSION_COUNTER)
 
 
 def delete_schema():
@@ -519,6 +521,7 @@ def delete_schema():
                 'attributes': attributes
             }
         )
+    cmf_counters.increment_counter(cmf_counters.SCHEMA_VERSION_COUNTER)
 
 
 def lambda_handler(event, context):
@@ -6,6 +6,7 @@ import os
 import json
 
 import cmf_boto
+import cmf_counters
 from cmf_logger import logger, log_event_received
 from cmf_utils import cors, default_http_headers
 
@@ -76,6 +77,7 @@ def process_post(event):
             'groups': body['groups']
         }
     )
+    cmf_counters.increment_counter(cmf_counters.PERMISSIONS_VERSION_COUNTER)
     logger.info('%s SUCCESSFUL', event['httpMethod'])
     return {
         'headers': {**default_http_headers},
@@ -6,6 +6,7 @@ import os
 import json
 
 import cmf_boto
+import cmf_counters
 from cmf_logger import logger, log_event_received
 from cmf_utils import cors, default_http_headers
 
@@ -149,6 +150,7 @@ def process_put(event):
             'groups': body['groups']
         }
     )
+    cmf_counters.increment_counter(cmf_counters.PERMISSIONS_VERSION_COUNTER)
     logger.info('%s SUCCESSFUL', event['httpMethod'])
     return {
         'headers': {**default_http_headers},
@@ -161,6 +163,7 @@ def process_delete(event):
     resp = role_table.get_item(Key={'role_id': event['pathParameters']['role_id']})
     if 'Item' in resp:
         respdel = role_table.delete_item(Key={'role_id': event['pathParameters']['role_id']})
+        cmf_counters.increment_counter(cmf_counters.PERMISSIONS_VERSION_COUNTER)
         if respdel['ResponseMetadata']['HTTPStatusCode'] == 200:
             logger.info('%s SUCCESSFUL', event['httpMethod'])
             return {
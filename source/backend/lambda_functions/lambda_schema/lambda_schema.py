@@ -7,7 +7,9 @@ import simplejson as json
 from datetime import datetime, timezone
 
 import cmf_boto
-from cmf_utils import cors, default_http_headers
+import cmf_counters
+from cmf_utils import cors, default_http_headers, ETAG_HTTP_HEADERS, get_etag, is_etag_matched, \
+    get_not_modified_response
 from cmf_logger import logger, log_event_received
 
 application = os.environ['application']
@@ -28,9 +30,13 @@ def lambda_handler(event, _):
             return {'headers': {**default_http_headers},
                     'statusCode': 400, 'body': 'schema name not provided.'}
         else:
-            # This is a request for the schema list, return array of schemas.
+            # This is a request for the schema list, return array of schemas. The version is read before the
+            # schemas so that a change made during the scan is never hidden behind the returned ETag.
+            etag = get_etag('schema_list', cmf_counters.get_counter(cmf_counters.SCHEMA_VERSION_COUNTER))
+            if is_etag_matched(event, etag):
+                return get_not_modified_response(etag)
             schemas = get_schema_list()
-            return {'headers': {**default_http_headers},
+            return {'headers': {**default_http_headers, **ETAG_HTTP_HEADERS, 'ETag': etag},
                     'body': json.dumps(schemas)}
 
     schema_name = event['pathParameters']['schema_name']
@@ -48,6 +54,11 @@ def lambda_handler(event, _):
         return handle_put(event, schema_name)
 
 
+def bump_schema_version():
+    # Signals to warm item handlers that their cached schema definitions are out of date.
+    cmf_counters.increment_counter(cmf_counters.SCHEMA_VERSION_COUNTER)
+
+
 def get_schema_list():
     response = schema_table.scan(ConsistentRead=True)
     scan_data = response['Items']
@@ -93,6 +104,7 @@ def handle_delete(schema_name: str):
             'lastModifiedTimestamp': datetime.now(timezone.utc).isoformat()
         }
     )
+    bump_schema_version()
     if 'Item' in resp:
         return {'headers': {**default_http_headers},
                 'statusCode': 400, 'body': schema_name + ' schema does not exists.'}
@@ -132,6 +144,7 @@ def handle_post(event: dict):
         }
 
     )
+    bump_schema_version()
     return {'headers': {**default_http_headers},
             'statusCode': 200,
             'body': json.dumps(resp)}
@@ -180,6 +193,7 @@ def handle_put(event: dict, schema_name: str):
             'lastModifiedTimestamp': datetime.now(timezone.utc).isoformat()
         }
     )
+    bump_schema_version()
     return {'headers': {**default_http_headers},
             'body': json.dumps(resp)}
 
@@ -225,6 +239,7 @@ def process_put_update_schema(body: dict, schema_name: str):
                         'statusCode': 400,
                         'body': str(e)}
 
+            bump_schema_version()
             if 'Attributes' in resp:
                 return {'headers': {**default_http_headers},
                         'body': json.dumps(resp)}
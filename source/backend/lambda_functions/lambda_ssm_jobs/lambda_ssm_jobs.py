@@ -8,7 +8,11 @@ import os
 import uuid
 import threading
 
+from boto3.dynamodb.conditions import Attr
+
 import cmf_boto
+import cmf_dynamodb
+import cmf_json
 import cmf_logger
 import cmf_pipeline
 from cmf_utils import get_date_from_string, cors, default_http_headers, CONST_DT_FORMAT
@@ -22,8 +26,8 @@ table = dynamodb.Table(ssm_jobs_table_name)
 job_timeout_seconds = 60 * 720  # 12 hours
 default_maximum_days_logs_returned = 30  # Set to None to return all logs.
 
-HISTORY_DDB_EXPRESSION_NAME = '#_history'
 HISTORY_ATTRIBUTE_NAME = '_history'
+SORT_NONE = 'none'
 
 def logging_filter(record):
     record.task_execution_id = logging_context.task_execution_id
@@ -93,65 +97,46 @@ def process_post(event):
     }
 
 
-def process_get(event):
-    logger.info("Processing GET")
-
-    maximum_days_logs_returned = get_maximum_days_of_logs_to_provide(event)
-
+def get_job_pages(maximum_days_logs_returned):
+    """
+    Yields the jobs created within maximum_days_logs_returned, or all jobs if None, one scan page at a time. Running
+    jobs that have breached the timeout are marked as timed out.
+    """
+    filter_expression = None
     if maximum_days_logs_returned is not None:
         current_time = datetime.now(timezone.utc)
         current_time = current_time + timedelta(days=-maximum_days_logs_returned)
         current_time_str = current_time.isoformat(sep='T')
+        filter_expression = Attr(f'{HISTORY_ATTRIBUTE_NAME}.createdTimestamp').gt(current_time_str)
 
-        response = table.scan(FilterExpression=f"{HISTORY_DDB_EXPRESSION_NAME}.#createdTimestamp > :current_time_30days",
-                              ExpressionAttributeNames={
-                                  HISTORY_DDB_EXPRESSION_NAME: HISTORY_ATTRIBUTE_NAME,
-                                  '#createdTimestamp': 'createdTimestamp',
-                              },
-                              ExpressionAttributeValues={
-                                  ":current_time_30days": current_time_str,
-                              }
-                              )
-    else:
-        response = table.scan()
-
-    if response["Count"] == 0:
-        return {
-            'headers': {**default_http_headers},
-            'body': json.dumps([])
-        }
-
-    ssm_jobs = response['Items']
-    while 'LastEvaluatedKey' in response:
-        if maximum_days_logs_returned is not None:
-            response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'],
-                                  FilterExpression=f"{HISTORY_DDB_EXPRESSION_NAME}.#createdTimestamp > :current_time_30days",
-                                  ExpressionAttributeNames={
-                                      HISTORY_DDB_EXPRESSION_NAME: HISTORY_ATTRIBUTE_NAME,
-                                      '#createdTimestamp': 'createdTimestamp',
-                                  },
-                                  ExpressionAttributeValues={
-                                      ":current_time_30days": current_time_str,
-                                  }
-                                  )
-        else:
-            response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-        ssm_jobs.extend(response['Items'])
+    for ssm_jobs in cmf_dynamodb.scan_pages(table, consistent_read=False, filter_expression=filter_expression):
+        # Scan all jobs with a RUNNING status and check that timeout has not been breached.
+        for ssm_data in ssm_jobs:
+            if ssm_data["status"] == "RUNNING":
+                update_job_status(ssm_data)
+        yield ssm_jobs
 
-    # Scan all jobs with a RUNNING status and check that timeout has not been breached.
-    for ssm_data in ssm_jobs:
-        if ssm_data["status"] == "RUNNING":
-            update_job_status(ssm_data)
 
-    ssm_jobs.sort(key=lambda SSMJob: get_latest_datetimestamp(SSMJob[HISTORY_ATTRIBUTE_NAME]), reverse=True)
+def process_get(event):
+    logger.info("Processing GET")
+
+    maximum_days_logs_returned = get_maximum_days_of_logs_to_provide(event)
+    job_pages = get_job_pages(maximum_days_logs_returned)
+
+    if is_sorted_by_date(event):
+        ssm_jobs = []
+        for page in job_pages:
+            ssm_jobs.extend(page)
+        ssm_jobs.sort(key=lambda SSMJob: get_latest_datetimestamp(SSMJob[HISTORY_ATTRIBUTE_NAME]), reverse=True)
+        job_pages = [ssm_jobs]
 
-    logger.info("Request successful, returning job results list.")
+    body, job_count = cmf_json.encode_pages(job_pages)
 
-    logger.debug(ssm_jobs)
+    logger.info(f"Request successful, returning {job_count} job results.")
 
     return {
         'headers': {**default_http_headers},
-        'body': json.dumps(ssm_jobs)
+        'body': body
     }
 
 
@@ -183,6 +168,14 @@ def get_maximum_days_of_logs_to_provide(event):
         return default_maximum_days_logs_returned
 
 
+def is_sorted_by_date(event):
+    """
+    Jobs are returned latest first, unless the sort query string parameter is none, in which case they are returned
+    in the order they are scanned and encoded one page at a time.
+    """
+    return (event.get("queryStringParameters") or {}).get("sort") != SORT_NONE
+
+
 def process_event(event):
     logger.debug(event)
     if 'payload' in event and event['payload']['httpMethod'] == 'POST':
@@ -4,23 +4,16 @@
 import json
 import os
 import time
-import urllib
 import datetime
 import jwt
-from jwt import PyJWKClient
 
 import cmf_boto
 from cmf_logger import logger, log_event_received
+from policy import jwks_cache
 
 region = os.environ['region']
 userpool_id = os.environ['userpool_id']
 app_client_id = os.environ['app_client_id']
-keys_url = 'https://cognito-idp.{}.amazonaws.com/{}/.well-known/jwks.json'.format(region, userpool_id)
-# instead of re-downloading the public keys every time
-# we download them only on cold start
-# https://aws.amazon.com/blogs/compute/container-reuse-in-lambda/
-response = urllib.request.urlopen(keys_url)  # nosec B310
-keys = json.loads(response.read())['keys']
 
 application = os.environ["application"]
 environment = os.environ["environment"]
@@ -36,11 +29,15 @@ def _get_response(status_code, body):
 
 def verify_token(token):
     verify_url = f"https://cognito-idp.{region}.amazonaws.com/{userpool_id}"
+    claims_cache_key = (verify_url, token, app_client_id, None)
+    claims = jwks_cache.get_claims(claims_cache_key)
+    if claims is not None:
+        logger.info('Token verified.')
+        return claims
 
-    optional_custom_headers = {"User-agent": "custom-user-agent"}
-    jwks_client = PyJWKClient(verify_url + '/.well-known/jwks.json', headers=optional_custom_headers)
+    # the public keys are downloaded once per execution environment, and again only for tokens signed with a new key
     try:
-        signing_key = jwks_client.get_signing_key_from_jwt(token)
+        signing_key = jwks_cache.get_signing_key(verify_url, token)
     except jwt.exceptions.PyJWKClientError as get_keys_error:
         logger.error(get_keys_error)
         logger.error('Invalid Token here')
@@ -66,6 +63,8 @@ def verify_token(token):
         logger.error('Signature verification failed')
         return False
 
+    jwks_cache.put_claims(claims_cache_key, claims)
+
     # now we can use the claims
     logger.debug('Claims: %s', claims)
     logger.info('Token verified.')
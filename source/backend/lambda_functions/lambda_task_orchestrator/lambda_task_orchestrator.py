@@ -3,6 +3,7 @@
 
 import traceback
 import cmf_boto
+import cmf_dynamodb
 from boto3.dynamodb.conditions import Key, Attr
 import botocore
 from datetime import datetime, timezone
@@ -88,18 +89,7 @@ def update_pipeline_status(pipeline_id, pipeline_status: TaskExecutionStatus, cu
             raise e
 
 def query_task_executions(pipeline_id):
-
-    response = task_executions_table.query(
-        IndexName='pipeline_id-index',
-        KeyConditionExpression=Key('pipeline_id').eq(pipeline_id)
-    )
-
-    query_data = response['Items']
-    while 'LastEvaluatedKey' in response:
-        print("Last Evaluated key is " + str(response['LastEvaluatedKey']))
-        response = task_executions_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], ConsistentRead=True)
-        query_data.extend(response['Items'])
-    return query_data
+    return cmf_dynamodb.query_table(task_executions_table, Key('pipeline_id').eq(pipeline_id), 'pipeline_id-index')
 
 
 def get_pipeline_template_id(pipeline_id):
@@ -2,9 +2,15 @@
 #  SPDX-License-Identifier: Apache-2.0
 
 import os
+import botocore
 import cmf_boto
+import cmf_counters
+import cmf_dynamodb
+from cmf_logger import logger
 import functools
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 import query_conditions
 from query_comparator_operations import query_comparator_operations_dictionary
 from boto3.dynamodb.conditions import Key
@@ -34,10 +40,236 @@ DEFAULT_TAG_REGEX = '^[a-zA-Z0-9+-=._:/@ ]+$'
 
 SCHEMA_NO_DDB_TABLE_LOOKUP = ['secret']  # schema names provided here will bypass relationship data validations during record create and update operations.
 
+# Schema definitions are cached for the life of a warm container. After the TTL expires the schema version marker
+# is checked and the definition is only reloaded if a schema has been changed since it was cached.
+SCHEMA_CACHE_TTL_SECONDS = int(os.environ.get('SCHEMA_CACHE_TTL_SECONDS', '15'))
+schema_table_name = '{}-{}-schema'.format(application, environment)
+schema_cache = {}
+
+# Items store a lowercased copy of their name, indexed by NAME_LOWER_INDEX, so that name uniqueness can be checked
+# without reading the whole data table. Tables are only queried through the index once it is active and the existing
+# items have been backfilled with the attribute, otherwise a single projected scan of ids and names is used. The
+# backfill is run by the default schema custom resource after deployment, never in the request path.
+NAME_LOWER_ATTRIBUTE = '_name_lower'
+NAME_LOWER_INDEX = '_name_lower-index'
+NAME_LOWER_BACKFILL_COUNTER_SUFFIX = '_name_lower_backfill'
+NAME_INDEX_MAX_QUERIES = int(os.environ.get('NAME_INDEX_MAX_QUERIES', '25'))
+NAME_LOWER_BACKFILL_MAX_WORKERS = int(os.environ.get('NAME_LOWER_BACKFILL_MAX_WORKERS', '16'))
+NAME_INDEX_SCHEMAS = ['app', 'database', 'server', 'wave', 'pipeline', 'pipeline_template']
+name_index_ready_tables = set()
+
+# Relationship validation only fetches the related records referenced by the payload, using BatchGetItem when the
+# relationship key is the table key, a GSI when one is keyed on it, and a full table scan otherwise.
+RELATED_ITEMS_MAX_WORKERS = int(os.environ.get('RELATED_ITEMS_MAX_WORKERS', '8'))
+
+# Schemas with validations that span the whole item, updates of their items are validated against the merged item.
+FULL_ITEM_VALIDATION_SCHEMAS = ['pipeline', 'task_execution']
+
+# Prepared validators by schema name, rebuilt when a new version of the schema is loaded.
+schema_validators = {}
+
 class UnSupportedOperationTypeException(Exception):
     pass
 
 
+class RelatedItems(dict):
+    """
+    Related records by schema name. The set of values of each related key is built the first time it is needed and
+    reused for every record validated against the same related records.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.key_indexes = {}
+
+    def get_key_index(self, rel_entity, rel_key):
+        if (rel_entity, rel_key) not in self.key_indexes:
+            self.key_indexes[(rel_entity, rel_key)] = get_related_key_index(self[rel_entity], rel_key)
+
+        return self.key_indexes[(rel_entity, rel_key)]
+
+
+class SchemaValidator:
+    """
+    Schema prepared for validating a batch of items. Attributes are indexed by name with their validation regexes
+    compiled, the required and conditionally required attributes are resolved and the comparator functions of the
+    conditions are looked up once.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.attributes = get_attribute_map(schema['attributes'])
+        self.required_attributes = get_required_attributes(schema, True)
+        self.condition_operations = {
+            id(attribute): get_condition_operations(attribute['conditions'])
+            for attribute in self.required_attributes if isinstance(attribute.get('conditions'), dict)
+        }
+
+    def validate(self, item, related_items=None):
+        invalid_attributes = check_required_attributes(item, self.required_attributes, self.condition_operations)
+        if len(invalid_attributes) > 0:
+            return invalid_attributes
+
+        # check that values are correct.
+        validation_errors = validate_item_attribute_values(item, self.attributes, related_items)
+
+        # Add schema-specification validation
+        if self.schema['schema_name'] == 'pipeline':
+            validation_errors.extend(check_valid_pipeline_create(item))
+        elif self.schema['schema_name'] == 'task_execution':
+            validation_errors.extend(check_valid_task_execution_update(item))
+
+        if len(validation_errors) > 0:
+            return validation_errors
+        else:
+            return None
+
+    def get_update_required_attributes(self, attribute_names):
+        # Required attributes that are updated, and conditionally required attributes that are updated or whose
+        # conditions query an updated attribute.
+        update_required_attributes = []
+        for attribute in self.required_attributes:
+            if attribute['name'] in attribute_names or \
+                    get_condition_attribute_names(attribute.get('conditions')) & attribute_names:
+                update_required_attributes.append(attribute)
+        return update_required_attributes
+
+    def get_update_attribute_names(self, attribute_names):
+        """
+        Returns the names of the stored attributes, not in attribute_names, that have to be read to validate an update
+        of attribute_names, or None if the schema can only be validated with the whole item.
+        """
+        if self.schema['schema_name'] in FULL_ITEM_VALIDATION_SCHEMAS:
+            return None
+        dependent_attribute_names = set()
+        for attribute in self.get_update_required_attributes(attribute_names):
+            if 'conditions' in attribute and not attribute.get('required'):
+                dependent_attribute_names.add(attribute['name'])
+                dependent_attribute_names |= get_condition_attribute_names(attribute['conditions'])
+        return dependent_attribute_names - set(attribute_names)
+
+    def validate_update(self, item, attribute_names, related_items=None):
+        """
+        Validates an update of attribute_names without the rest of the item. Only the values of the updated attributes
+        and the required attributes affected by the update are checked.
+
+        Args:
+            item: the updated attributes and the attributes returned by get_update_attribute_names, with their values
+                after the update, removed attributes are omitted
+            attribute_names: names of the attributes that are set or removed by the update
+            related_items: related records for validating relationship attributes
+
+        Returns:
+            List of validation errors, or None if the update is valid
+        """
+        if self.schema['schema_name'] in FULL_ITEM_VALIDATION_SCHEMAS:
+            return self.validate(item, related_items)
+
+        invalid_attributes = check_required_attributes(
+            item, self.get_update_required_attributes(attribute_names), self.condition_operations)
+        if len(invalid_attributes) > 0:
+            return invalid_attributes
+
+        validation_errors = validate_item_attribute_values(
+            {key: value for key, value in item.items() if key in attribute_names}, self.attributes, related_items)
+        return validation_errors if validation_errors else None
+
+
+def get_condition_attribute_names(conditions):
+    if not isinstance(conditions, dict):
+        return set()
+    return {query['attribute'] for query in conditions.get('queries', []) if 'attribute' in query}
+
+
+def get_schema(schema_name):
+    """
+    Returns the schema definition for schema_name from the warm container cache, or from the schema table if
+    the cached entry has expired and the schema version has changed. Returns None if the schema does not exist.
+    """
+    now = time.monotonic()
+    cached_schema = schema_cache.get(schema_name)
+    if cached_schema and cached_schema['expires'] > now:
+        return cached_schema['schema']
+
+    schema_version = cmf_counters.get_counter(cmf_counters.SCHEMA_VERSION_COUNTER)
+    if cached_schema and cached_schema['version'] == schema_version:
+        cached_schema['expires'] = now + SCHEMA_CACHE_TTL_SECONDS
+        return cached_schema['schema']
+
+    schema_table = cmf_boto.resource('dynamodb').Table(schema_table_name)
+    schema = schema_table.get_item(Key={'schema_name': schema_name}).get('Item')
+    if schema:
+        schema_cache[schema_name] = {
+            'schema': schema,
+            'version': schema_version,
+            'expires': now + SCHEMA_CACHE_TTL_SECONDS
+        }
+    else:
+        # Do not cache missing schemas, so that a newly created schema is available immediately.
+        schema_cache.pop(schema_name, None)
+
+    return schema
+
+
+def clear_schema_cache():
+    schema_cache.clear()
+    schema_validators.clear()
+
+
+def get_schema_validator(schema):
+    """
+    Returns the prepared validator for schema. Validators are reused for as long as the same schema definition is
+    returned by the schema cache, and rebuilt when a changed schema is loaded.
+    """
+    schema_name = schema.get('schema_name')
+    validator = schema_validators.get(schema_name)
+    if validator is None or validator.schema is not schema:
+        validator = SchemaValidator(schema)
+        schema_validators[schema_name] = validator
+
+    return validator
+
+
+@functools.lru_cache(maxsize=512)
+def get_compiled_regex(regex_string):
+    return re.compile(regex_string)
+
+
+@functools.lru_cache(maxsize=512)
+def get_list_values(listvalue):
+    return frozenset(listvalue.lower().split(','))
+
+
+def get_attribute_map(attributes):
+    attribute_map = {}
+    for attribute in attributes:
+        # The first attribute defined with a name is used for validation.
+        if attribute['name'] in attribute_map:
+            continue
+        attribute_map[attribute['name']] = attribute
+        prepare_attribute(attribute)
+
+    return attribute_map
+
+
+def prepare_attribute(attribute):
+    # Compile the regex and list values now, validation of every item then reuses them from the cache.
+    if attribute.get('validation_regex') and isinstance(attribute['validation_regex'], str):
+        try:
+            get_compiled_regex(attribute['validation_regex'])
+        except re.error as regex_error:
+            # Invalid regexes are reported when a value of the attribute is validated.
+            logger.warning(f"Invalid validation_regex for attribute {attribute.get('name')}: {regex_error}")
+    if 'listvalue' in attribute and isinstance(attribute['listvalue'], str):
+        get_list_values(attribute['listvalue'])
+
+
+def get_condition_operations(conditions):
+    # Unsupported comparators are left unresolved so that they only fail if the condition is evaluated.
+    return [query_comparator_operations_dictionary.get(query.get('comparator'))
+            for query in conditions.get('queries', [])]
+
+
 def get_function_for_operation(operation):
     try:
         return query_comparator_operations_dictionary[operation]
@@ -83,7 +315,7 @@ def append_conditional_attributes(attribute, required_attributes):
     return required_attributes
 
 
-def check_attribute_required_conditions(item, conditions):
+def check_attribute_required_conditions(item, conditions, operations=None):
     return_required = False
     return_hidden = False
     query_result = None
@@ -92,8 +324,9 @@ def check_attribute_required_conditions(item, conditions):
         # No conditions passed.
         return {'required': return_required, 'hidden': return_hidden}
 
-    for query in conditions['queries']:
-        operation = get_function_for_operation(query['comparator'])
+    for index, query in enumerate(conditions['queries']):
+        operation = operations[index] if operations and operations[index] else \
+            get_function_for_operation(query['comparator'])
         if operation:
             query_result = operation(item, query, query_result)
             if query_result == False:
@@ -110,29 +343,10 @@ def check_attribute_required_conditions(item, conditions):
 
 
 def check_valid_item_create(item, schema, related_items=None):
-    required_attributes = get_required_attributes(schema, True)
-    invalid_attributes = check_required_attributes(item, required_attributes)
-    if len(invalid_attributes) > 0:
-        return invalid_attributes
-
-    # check that values are correct.
-    validation_errors = []
-    validation_errors.extend(validate_item_keys_and_values(item, schema['attributes'], related_items))
-    validation_errors.extend(invalid_attributes)
-
-    # Add schema-specification validation
-    if schema['schema_name'] == 'pipeline':
-        validation_errors.extend(check_valid_pipeline_create(item))
-    elif schema['schema_name'] == 'task_execution':
-        validation_errors.extend(check_valid_task_execution_update(item))
-
-    if len(validation_errors) > 0:
-        return validation_errors
-    else:
-        return None
+    return get_schema_validator(schema).validate(item, related_items)
 
 
-def check_required_attributes(item, required_attributes):
+def check_required_attributes(item, required_attributes, condition_operations=None):
     invalid_attributes = []
     for attribute in required_attributes:
         invalid_attribute_message = f"{ATTRIBUTE_MESSAGE_PREFIX}{attribute['name']} is required and not provided."
@@ -141,7 +355,8 @@ def check_required_attributes(item, required_attributes):
             # Attribute is required.
             is_valid = is_required_attribute_valid(item, attribute)
         elif 'conditions' in attribute:
-            is_valid = is_conditional_attribute_valid(item, attribute)
+            is_valid = is_conditional_attribute_valid(item, attribute,
+                                                      (condition_operations or {}).get(id(attribute)))
 
         if not is_valid:
             invalid_attributes.append(invalid_attribute_message)
@@ -153,8 +368,8 @@ def is_required_attribute_valid(item, attribute):
     return bool(attr_value)
 
 
-def is_conditional_attribute_valid(item, attribute):
-    conditions_check_result = check_attribute_required_conditions(item, attribute['conditions'])
+def is_conditional_attribute_valid(item, attribute, operations=None):
+    conditions_check_result = check_attribute_required_conditions(item, attribute['conditions'], operations)
     if conditions_check_result['required'] and  \
         not (attribute['name'] in item and item[attribute['name']] != '' and item[
             attribute['name']] is not None):
@@ -166,7 +381,7 @@ def is_conditional_attribute_valid(item, attribute):
 def validate_value(attribute, value, regex_string):
     std_error = "Error in validation, please check entered value."
     error = None
-    pattern = re.compile(regex_string)
+    pattern = get_compiled_regex(regex_string)
     if not pattern.match(value):
         # Validation error.
         if 'validation_regex_msg' in attribute and attribute['validation_regex_msg'] != '':
@@ -177,28 +392,6 @@ def validate_value(attribute, value, regex_string):
     return error
 
 
-def get_related_items(related_schema_names):
-    related_items = {}
-
-    for related_schema_name in related_schema_names:
-        # Check that item is set.
-        if not related_schema_name:
-            continue
-
-        if related_schema_name in SCHEMA_NO_DDB_TABLE_LOOKUP:
-            continue  # entity not saved in DDB so no check is possible also options list is provided by external source.
-
-        table_name_suffix = map_schema_to_table_name_suffix(related_schema_name)
-
-        related_table_name = '{}-{}-{}'.format(application, environment, table_name_suffix)
-
-        related_table = cmf_boto.resource('dynamodb').Table(related_table_name)
-        related_table_items = scan_dynamodb_data_table(related_table)  # get all items from related table.
-        related_items[related_schema_name] = related_table_items
-
-    return related_items
-
-
 def get_item_attribute_names(items):
     attribute_names = []
     for item in items:
@@ -235,6 +428,86 @@ def get_relationship_schema_names(relationship_attributes):
     return relationship_schema_names
 
 
+# Returns the values referenced by each relationship attribute, grouped by related schema name and related key.
+def get_relationship_values(items, relationship_attributes):
+    relationship_values = {}
+    for relationship_attribute in relationship_attributes:
+        if 'rel_entity' not in relationship_attribute or 'rel_key' not in relationship_attribute:
+            continue
+
+        values = relationship_values.setdefault(relationship_attribute['rel_entity'], {}).setdefault(
+            relationship_attribute['rel_key'], set())
+        for item in items:
+            value = item.get(relationship_attribute['name'])
+            for related_value in value if isinstance(value, list) else [value]:
+                if related_value is not None and related_value != '':
+                    values.add(str(related_value))
+
+    return relationship_values
+
+
+def get_related_table(related_schema_name, dynamodb=None):
+    table_name_suffix = map_schema_to_table_name_suffix(related_schema_name)
+    related_table_name = '{}-{}-{}'.format(application, environment, table_name_suffix)
+    if not dynamodb:
+        dynamodb = cmf_boto.resource('dynamodb')
+
+    return dynamodb.Table(related_table_name)
+
+
+def batch_get_related_items(dynamodb, related_table, key_name, values, projection_attributes):
+    return cmf_dynamodb.batch_get_items(
+        dynamodb, related_table.name, [{key_name: value} for value in sorted(values)], projection_attributes)
+
+
+def query_related_items(related_table, index_name, key_name, values, projection_attributes):
+    related_items = []
+    for value in values:
+        related_items.extend(cmf_dynamodb.query_table(
+            related_table, Key(key_name).eq(value), index_name, projection_attributes))
+
+    return related_items
+
+
+def get_referenced_related_items(related_schema_name, related_key_values, dynamodb=None):
+    """
+    Returns the records of related_schema_name that match the referenced values.
+
+    Args:
+        related_schema_name: schema name of the related records
+        related_key_values: dict of related key attribute name to the set of values referenced
+        dynamodb: DynamoDB service resource to use, a new one is created if not provided
+
+    Returns:
+        List of related records, projected to the related key attributes unless the table had to be scanned
+    """
+    if not dynamodb:
+        dynamodb = cmf_boto.resource('dynamodb')
+    related_table = get_related_table(related_schema_name, dynamodb)
+    lookup = cmf_dynamodb.get_table_key_lookup(related_table)
+
+    related_items = []
+    for key_name, values in related_key_values.items():
+        if not values:
+            continue
+        if lookup['key_attributes'] == [key_name]:
+            related_items.extend(batch_get_related_items(
+                dynamodb, related_table, key_name, values, related_key_values.keys()))
+        elif key_name in lookup['indexes']:
+            related_items.extend(query_related_items(
+                related_table, lookup['indexes'][key_name], key_name, values, related_key_values.keys()))
+        else:
+            # No key or index on the related key, all items have to be read.
+            return scan_dynamodb_data_table(related_table, parallel=True)
+
+    return related_items
+
+
+def get_referenced_related_items_in_thread(related_schema_name, related_key_values):
+    # cmf_boto resources are shared within a thread, so each worker thread reads with its own resource.
+    return get_referenced_related_items(related_schema_name, related_key_values, cmf_boto.resource('dynamodb'))
+
+
 # Based on the items provided it returns any related data items to be used to validate relationships.
 def get_relationship_data(items, schema):
     # Get duplicated list of attributes being uploaded.
@@ -243,11 +516,29 @@ def get_relationship_data(items, schema):
     # Filter attributes for relationship attributes.
     relationship_attributes = get_relationship_attributes(attribute_names, schema['attributes'])
 
-    # extract schema names from related attributes.
-    relationship_schema_names = get_relationship_schema_names(relationship_attributes)
+    # Get the values referenced in the items for each related schema and key.
+    relationship_values = {
+        related_schema_name: related_key_values
+        for related_schema_name, related_key_values in get_relationship_values(items,
+                                                                               relationship_attributes).items()
+        if related_schema_name and related_schema_name not in SCHEMA_NO_DDB_TABLE_LOOKUP
+    }
 
-    # Get all data for the schema list provided.
-    related_data = get_related_items(relationship_schema_names)
+    # Get only the referenced records for the schema list provided.
+    if len(relationship_values) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(relationship_values), RELATED_ITEMS_MAX_WORKERS)) as executor:
+            futures = {
+                related_schema_name: executor.submit(get_referenced_related_items_in_thread, related_schema_name,
+                                                     related_key_values)
+                for related_schema_name, related_key_values in relationship_values.items()
+            }
+            related_data = RelatedItems(
+                {related_schema_name: future.result() for related_schema_name, future in futures.items()})
+    else:
+        related_data = RelatedItems({
+            related_schema_name: get_referenced_related_items(related_schema_name, related_key_values)
+            for related_schema_name, related_key_values in relationship_values.items()
+        })
 
     return related_data
 
@@ -262,44 +553,41 @@ def validate_item_related_record(attribute, value, preloaded_related_items=None)
         # invalid relationship attribute.
         return [attribute['name'] + ': Invalid relationship attribute schema or key missing.']
     else:
-        if preloaded_related_items:
+        if isinstance(preloaded_related_items, (set, frozenset)):
+            # Preloaded key index provided.
+            related_keys = preloaded_related_items
+        elif preloaded_related_items is not None:
             # Preloaded items provided.
-            related_items = preloaded_related_items
+            related_keys = get_related_key_index(preloaded_related_items, attribute['rel_key'])
         else:
             # No preloaded item provided, load from DDB table.
-            related_items = load_items_from_ddb(attribute)
+            related_keys = get_related_key_index(load_items_from_ddb(attribute, value), attribute['rel_key'])
 
         if 'listMultiSelect' in attribute and attribute['listMultiSelect']:
-            message = validate_list_multi_select(attribute, related_items, value)
+            message = validate_list_multi_select(attribute, related_keys, value)
         else:
-            message = validate_non_list_multi_select(attribute, related_items, value)
+            message = validate_non_list_multi_select(attribute, related_keys, value)
 
         return message
 
 
-def load_items_from_ddb(attribute):
-    # No preloaded item provided, load from DDB table.
-
-    table_name_suffix = map_schema_to_table_name_suffix(attribute['rel_entity'])
-
-    related_table_name = '{}-{}-{}'.format(application, environment, table_name_suffix)
+def get_related_key_index(related_items, rel_key):
+    return frozenset(related_item[rel_key] for related_item in related_items if rel_key in related_item)
 
-    related_table = cmf_boto.resource('dynamodb').Table(related_table_name)
-    related_items = scan_dynamodb_data_table(related_table)  # get all items from related table.
 
-    return related_items
+def load_items_from_ddb(attribute, value=None):
+    # No preloaded item provided, load from DDB table.
+    if value is None:
+        related_table = get_related_table(attribute['rel_entity'])
+        return scan_dynamodb_data_table(related_table, parallel=True)  # get all items from related table.
 
+    # Only load the records referenced by value.
+    relationship_values = get_relationship_values([{attribute['name']: value}], [attribute])
+    return get_referenced_related_items(attribute['rel_entity'], relationship_values[attribute['rel_entity']])
 
-def validate_list_multi_select(attribute, related_items, value):
-    related_records_found = []
-    related_records_not_found = []
-    for related_item in related_items:
-        if related_item[attribute['rel_key']] in value:
-            related_records_found.append(related_item[attribute['rel_key']])
 
-    for record_id in value:
-        if record_id not in related_records_found:
-            related_records_not_found.append(record_id)
+def validate_list_multi_select(attribute, related_keys, value):
+    related_records_not_found = [record_id for record_id in value if record_id not in related_keys]
 
     if len(related_records_not_found) > 0:
         message = attribute['name'] + ': The following related record ids do not exist using key ' + \
@@ -310,13 +598,8 @@ def validate_list_multi_select(attribute, related_items, value):
         return None
 
 
-def validate_non_list_multi_select(attribute, related_items, value):
-    related_record_found = False
-    for related_item in related_items:
-        if related_item[attribute['rel_key']] == str(value):
-            related_record_found = True
-
-    if not related_record_found:
+def validate_non_list_multi_select(attribute, related_keys, value):
+    if str(value) not in related_keys:
         message = attribute['name'] + ':' + value + ' related record does not exist using key ' + \
                     attribute['rel_key']
         return [message]
@@ -345,7 +628,7 @@ def validate_tag_type_attribute(item, attribute, key, errors):
 
 
 def validate_list_type_attribute(item, attribute, key, errors):
-    listvalue = attribute['listvalue'].lower().split(',')
+    listvalue = get_list_values(attribute['listvalue'])
     if 'listMultiSelect' in attribute and attribute['listMultiSelect'] == True:
         for item in item[key]:
             if str(item).lower() not in listvalue:
@@ -363,10 +646,10 @@ def validate_list_type_attribute(item, attribute, key, errors):
 
 
 def validate_relationship_type_attribute(related_items, item, attribute, key, errors):
-    if related_items and attribute['rel_entity'] in related_items.keys():
+    if related_items and attribute.get('rel_entity') in related_items.keys() and 'rel_key' in attribute:
         related_record_validation = validate_item_related_record(
             attribute, item[key],
-            related_items[attribute['rel_entity']])
+            related_items.get_key_index(attribute['rel_entity'], attribute['rel_key']))
     else:
         # relationship items not preloaded, validate will have to fetch them.
         related_record_validation = validate_item_related_record(attribute, item[key])
@@ -424,45 +707,48 @@ def validate_attribute(attribute, item, key, errors, related_items):
 
 
 def validate_item_keys_and_values(item, attributes, related_items=None):
+    return validate_item_attribute_values(item, get_attribute_map(attributes), related_items)
+
+
+def validate_item_attribute_values(item, attribute_map, related_items=None):
     errors = []
+    if related_items and not isinstance(related_items, RelatedItems):
+        related_items = RelatedItems(related_items)
 
     for key in item.keys():
-        check = False
         if key.startswith('_'):
             #  Ignore system keys.
             continue
-        for attribute in attributes:
-            if key == attribute['name']:
-                check = True
-                errors = validate_attribute(attribute, item, key, errors, related_items)
-                break  # Exit loop as key matched to attribute no need to check other attributes.
+        attribute = attribute_map.get(key)
+        if attribute is not None:
+            errors = validate_attribute(attribute, item, key, errors, related_items)
 
-        errors = append_error_message(check, key, errors)
+        errors = append_error_message(attribute is not None, key, errors)
 
     return errors
 
 
-def scan_dynamodb_data_table(data_table):
-    response = data_table.scan(ConsistentRead=True)
-    scan_data = response['Items']
-    while 'LastEvaluatedKey' in response:
-        print("Last Evaluate key is   " + str(response['LastEvaluatedKey']))
-        response = data_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], ConsistentRead=True)
-        scan_data.extend(response['Items'])
-    return scan_data
+def scan_dynamodb_data_table(data_table, projection_attributes=None, parallel=False):
+    """
+    Returns all items in data_table using consistent reads.
+
+    Args:
+        data_table: DynamoDB table resource
+        projection_attributes: attribute names to return, all attributes are returned if not provided
+        parallel: scan the table in segments on a thread pool, the number of segments is chosen from the table size
+    """
+    return cmf_dynamodb.scan_table(data_table, projection_attributes, parallel)
+
+
+def iterate_dynamodb_data_table(data_table, projection_attributes=None, parallel=False):
+    """
+    Yields the items in data_table one page at a time, see scan_dynamodb_data_table for the arguments.
+    """
+    return cmf_dynamodb.scan_pages(data_table, projection_attributes, parallel)
 
 
 def query_dynamodb_index(data_table, index_name, key_condition):
-    response = data_table.query(
-        IndexName=index_name,
-        KeyConditionExpression=key_condition
-    )
-    query_data = response['Items']
-    while 'LastEvaluatedKey' in response:
-        print("Last Evaluated key is " + str(response['LastEvaluatedKey']))
-        response = data_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], ConsistentRead=True)
-        query_data.extend(response['Items'])
-    return query_data
+    return cmf_dynamodb.query_table(data_table, key_condition, index_name)
 
 
 def does_item_exist(new_item_key, new_item_value, current_items):
@@ -475,6 +761,161 @@ def does_item_exist(new_item_key, new_item_value, current_items):
     return False
 
 
+def normalize_item_name(name):
+    return str(name).lower()
+
+
+def set_item_name_lower(item, schema_name):
+    name_key = schema_name + '_name'
+    if name_key in item:
+        item[NAME_LOWER_ATTRIBUTE] = normalize_item_name(item[name_key])
+
+
+def remove_item_name_lower(item):
+    """
+    Removes the internal lowercased name attribute from an item before it is returned to the caller.
+    """
+    item.pop(NAME_LOWER_ATTRIBUTE, None)
+    return item
+
+
+def is_name_index_active(data_table):
+    for index in data_table.global_secondary_indexes or []:
+        if index['IndexName'] == NAME_LOWER_INDEX:
+            return index.get('IndexStatus') == 'ACTIVE'
+
+    return False
+
+
+def get_name_lower_backfill_counter_name(schema_name):
+    return schema_name + NAME_LOWER_BACKFILL_COUNTER_SUFFIX
+
+
+def is_name_index_ready(data_table, schema_name):
+    """
+    Returns True if the name index of data_table is active and all existing items have been backfilled with the
+    lowercased name attribute. Ready tables are remembered for the life of the container.
+    """
+    if data_table.name in name_index_ready_tables:
+        return True
+
+    if not is_name_index_active(data_table) or \
+            cmf_counters.get_counter(get_name_lower_backfill_counter_name(schema_name)) == 0:
+        return False
+
+    name_index_ready_tables.add(data_table.name)
+    return True
+
+
+def query_item_name_ids(data_table, schema_name, lower_names):
+    id_key = schema_name + '_id'
+    name_ids = {}
+    for lower_name in lower_names:
+        for page in cmf_dynamodb.query_pages(data_table, Key(NAME_LOWER_ATTRIBUTE).eq(lower_name), NAME_LOWER_INDEX):
+            for item in page:
+                name_ids.setdefault(lower_name, set()).add(item[id_key])
+
+    return name_ids
+
+
+def backfill_item_name_lower(data_table, schema_name, item):
+    name_key = schema_name + '_name'
+    try:
+        data_table.update_item(
+            Key={schema_name + '_id': item[schema_name + '_id']},
+            UpdateExpression='SET #name_lower = :name_lower',
+            # Skip items that have been renamed or deleted since they were read.
+            ConditionExpression='#name = :name',
+            ExpressionAttributeNames={'#name_lower': NAME_LOWER_ATTRIBUTE, '#name': name_key},
+            ExpressionAttributeValues={':name_lower': normalize_item_name(item[name_key]), ':name': item[name_key]}
+        )
+    except botocore.exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+
+
+def backfill_item_names_lower(data_table, schema_name, should_stop=None):
+    """
+    Adds the lowercased name attribute to the existing items of data_table that are missing it, or have a stale value,
+    and marks the table as backfilled once all items have been read.
+
+    Args:
+        data_table: DynamoDB table resource of the schema
+        schema_name: name of the schema, used to derive the id and name attributes
+        should_stop: optional function called between pages, the backfill is interrupted if it returns True
+
+    Returns:
+        True if the table is backfilled, False if the backfill was interrupted and has to be run again
+    """
+    counter_name = get_name_lower_backfill_counter_name(schema_name)
+    if cmf_counters.get_counter(counter_name) != 0:
+        return True
+
+    id_key = schema_name + '_id'
+    name_key = schema_name + '_name'
+    table_name = data_table.name
+    updated_count = 0
+
+    def backfill_item(item):
+        # resources are not thread safe, each worker uses the table resource of its own thread.
+        backfill_item_name_lower(cmf_boto.resource('dynamodb').Table(table_name), schema_name, item)
+
+    with ThreadPoolExecutor(max_workers=NAME_LOWER_BACKFILL_MAX_WORKERS) as executor:
+        for page in iterate_dynamodb_data_table(data_table, [id_key, name_key, NAME_LOWER_ATTRIBUTE], parallel=True):
+            items = [item for item in page
+                     if name_key in item and item.get(NAME_LOWER_ATTRIBUTE) != normalize_item_name(item[name_key])]
+            list(executor.map(backfill_item, items))
+            updated_count += len(items)
+            if should_stop is not None and should_stop():
+                logger.info(f'Backfill of {NAME_LOWER_ATTRIBUTE} in {table_name} interrupted after {updated_count} '
+                            f'items, it will be restarted')
+                return False
+
+    cmf_counters.seed_counter(counter_name, 1)
+    logger.info(f'Backfill of {NAME_LOWER_ATTRIBUTE} in {table_name} complete, {updated_count} items updated')
+    return True
+
+
+def scan_item_name_ids(data_table, schema_name):
+    """
+    Reads the id and name of every item in data_table and returns a dict of lowercased name to the set of ids with
+    that name.
+    """
+    id_key = schema_name + '_id'
+    name_key = schema_name + '_name'
+
+    name_ids = {}
+    for page in iterate_dynamodb_data_table(data_table, [id_key, name_key], parallel=True):
+        for item in page:
+            if name_key in item:
+                name_ids.setdefault(normalize_item_name(item[name_key]), set()).add(item[id_key])
+
+    return name_ids
+
+
+def get_existing_item_name_ids(data_table, schema_name, names):
+    """
+    Returns the existing items in data_table whose name matches one of names, ignoring case.
+
+    Args:
+        data_table: DynamoDB table resource of the schema
+        schema_name: name of the schema, used to derive the id and name attributes
+        names: names to look up
+
+    Returns:
+        A dict of lowercased name to the set of ids of the items with that name, names with no match are omitted
+    """
+    lower_names = {normalize_item_name(name) for name in names}
+    if not lower_names:
+        return {}
+
+    if len(lower_names) <= NAME_INDEX_MAX_QUERIES and is_name_index_ready(data_table, schema_name):
+        return query_item_name_ids(data_table, schema_name, lower_names)
+
+    name_ids = scan_item_name_ids(data_table, schema_name)
+    return {lower_name: name_ids[lower_name] for lower_name in lower_names if lower_name in name_ids}
+
+
 def get_task(task_id, task_version=0):
     validation_errors = []
     task_table_name = '{}-{}-ssm-scripts'.format(application, environment)
@@ -1,14 +1,19 @@
 #  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 #  SPDX-License-Identifier: Apache-2.0
 import base64
+import copy
 import os
 import boto3
+import botocore
 import re
 import requests
 import simplejson as json
 import jwt
 from jwt import PyJWKClient
 import logging
+import threading
+import time
+from collections import OrderedDict
 
 logging.basicConfig(format='%(asctime)s | %(levelname)s | %(message)s', level=logging.INFO)  # //NOSONAR Basic configuration doesn't pose security risk
 logger = logging.getLogger()
@@ -180,6 +185,250 @@ class AuthPolicy(object):
         return policy
 
 
+class JWKSCache(object):
+    """Caches the signing keys of the Cognito user pools, and the claims of the tokens verified with them, for the
+    lifetime of the Lambda execution environment, so that authorizing a request does not download the key set."""
+
+    min_refresh_seconds = int(os.environ.get('JWKS_MIN_REFRESH_SECONDS', '60'))
+    """A key set is downloaded again when a token is signed with an unknown key, at most once in this interval."""
+    claims_cache_max_size = int(os.environ.get('CLAIMS_CACHE_MAX_SIZE', '256'))
+    """The claims of up to this many tokens are cached, until the tokens expire."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.key_sets = {}
+        self.claims = OrderedDict()
+
+    def clear(self):
+        with self.lock:
+            self.key_sets.clear()
+            self.claims.clear()
+
+    def get_signing_key(self, issuer_url, token):
+        """ Return the signing key of the token from the key set of the user pool at issuer_url, downloading the key
+        set if it has not been downloaded yet or does not contain the token's key.
+        Raises:
+            jwt.exceptions.PyJWKClientError: if the key set does not contain the token's key
+        """
+        kid = jwt.get_unverified_header(token).get('kid')
+        if kid is None:
+            raise jwt.exceptions.PyJWKClientError('Token does not have a key id')
+
+        key_set = self.key_sets.get(issuer_url)
+        if key_set is None or (kid not in key_set['keys'] and
+                               time.monotonic() - key_set['downloaded'] >= self.min_refresh_seconds):
+            key_set = self.download_key_set(issuer_url)
+
+        if kid not in key_set['keys']:
+            raise jwt.exceptions.PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+        return key_set['keys'][kid]
+
+    def download_key_set(self, issuer_url):
+        optional_custom_headers = {"User-agent": "custom-user-agent"}
+        jwks_client = PyJWKClient(issuer_url + '/.well-known/jwks.json', cache_jwk_set=False,
+                                  headers=optional_custom_headers)
+        keys = {key.key_id: key for key in jwks_client.get_signing_keys()}
+        key_set = {'keys': keys, 'downloaded': time.monotonic()}
+        with self.lock:
+            self.key_sets[issuer_url] = key_set
+        logger.info('Downloaded %d signing keys from %s', len(keys), issuer_url)
+        return key_set
+
+    def get_claims(self, cache_key):
+        """ Return the cached claims for cache_key, None if they are not cached or the token has expired.
+        """
+        with self.lock:
+            claims = self.claims.get(cache_key)
+            if claims is None:
+                return None
+            if claims['exp'] <= time.time():
+                del self.claims[cache_key]
+                return None
+            self.claims.move_to_end(cache_key)
+        return dict(claims)
+
+    def put_claims(self, cache_key, claims):
+        """ Cache the claims of a verified token until it expires, claims without an expiry are not cached.
+        """
+        if not isinstance(claims.get('exp'), (int, float)):
+            return
+        with self.lock:
+            self.claims[cache_key] = dict(claims)
+            self.claims.move_to_end(cache_key)
+            while len(self.claims) > self.claims_cache_max_size:
+                self.claims.popitem(last=False)
+
+
+jwks_cache = JWKSCache()
+
+# Counter in the counters table incremented by the role and policy APIs on every change, must match
+# cmf_counters.PERMISSIONS_VERSION_COUNTER in the utils layer.
+PERMISSIONS_VERSION_COUNTER = 'permissions_version'
+
+# Actions of the entity_access entries of a policy, and the action required by each HTTP method.
+SCHEMA_ACTIONS = ['create', 'read', 'update', 'delete']
+METHOD_SCHEMA_ACTIONS = {
+    "PUT": "update",
+    "POST": "create",
+    "DELETE": "delete"}
+
+
+class PermissionMatrixCache(object):
+    """Caches the permissions of each Cognito group compiled from the roles and policies tables, for the lifetime of
+    the Lambda execution environment, so that authorizing a request does not scan the tables.
+
+    The matrix maps a group name to the permissions of the group for each schema, as frozensets:
+        {group_name: {schema_name: {'actions': {'create', 'update'}, 'attributes': {'server_name', ...}}}}
+
+    The matrix is compiled again when the permissions version counter has changed. The counter is read at most once
+    in version_check_seconds, so changes to roles and policies take effect within this interval."""
+
+    version_check_seconds = int(os.environ.get('PERMISSIONS_VERSION_CHECK_SECONDS', '10'))
+    """The permissions version counter is read at most once in this interval."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.matrix = None
+        self.version = None
+        self.version_checked = None
+
+    def clear(self):
+        with self.lock:
+            self.matrix = None
+            self.version = None
+            self.version_checked = None
+
+    def get_matrix(self, role_table, policy_table, counters_table):
+        """ Return the permission matrix, compiling it if the permissions have changed since it was compiled.
+        If the permissions version cannot be read the matrix is compiled for every request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.matrix is not None and self.version is not None and \
+                    now - self.version_checked < self.version_check_seconds:
+                return self.matrix
+
+            version = self.get_version(counters_table)
+            if self.matrix is None or version is None or version != self.version:
+                logger.info('Compiling permission matrix for permissions version %s', version)
+                self.matrix = build_permission_matrix(scan_all(role_table), scan_all(policy_table))
+            self.version = version
+            self.version_checked = now
+            return self.matrix
+
+    @staticmethod
+    def get_version(counters_table):
+        try:
+            response = counters_table.get_item(
+                Key={'counter_name': PERMISSIONS_VERSION_COUNTER},
+                ConsistentRead=True
+            )
+        except botocore.exceptions.ClientError as error:
+            logger.warning('Unable to read the permissions version, permissions will not be cached: %s', error)
+            return None
+        return int(response.get('Item', {}).get('counter_value', 0))
+
+
+def scan_all(table):
+    response = table.scan()
+    items = response['Items']
+    while 'LastEvaluatedKey' in response:
+        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+        items.extend(response['Items'])
+    return items
+
+
+def get_policy_permissions(policy):
+    """ Return the permissions granted by a policy for each schema, only the attributes of the first entity_access
+    entry for a schema with attributes are allowed.
+    """
+    policy_permissions = {}
+    for entity in policy.get('entity_access', []):
+        schema_permissions = policy_permissions.setdefault(
+            entity['schema_name'], {'actions': set(), 'attributes': None})
+        schema_permissions['actions'].update(action for action in SCHEMA_ACTIONS if entity.get(action) == True)
+        if 'attributes' in entity and schema_permissions['attributes'] is None:
+            schema_permissions['attributes'] = {attr['attr_name'] for attr in entity['attributes']}
+    return policy_permissions
+
+
+def build_permission_matrix(roles, policies):
+    """ Compile the permissions of each group from the policies of the roles the group is assigned to.
+    Args:
+        roles (list): items of the roles table
+        policies (list): items of the policies table
+    Returns:
+        dict: the permission matrix, see PermissionMatrixCache
+    """
+    permissions_by_policy = {policy['policy_id']: get_policy_permissions(policy) for policy in policies}
+
+    matrix = {}
+    for role in roles:
+        for group in role.get('groups', []):
+            group_permissions = matrix.setdefault(group['group_name'], {})
+            for role_policy in role.get('policies', []):
+                for schema_name, permissions in permissions_by_policy.get(role_policy['policy_id'], {}).items():
+                    schema_permissions = group_permissions.setdefault(
+                        schema_name, {'actions': set(), 'attributes': set()})
+                    schema_permissions['actions'].update(permissions['actions'])
+                    schema_permissions['attributes'].update(permissions['attributes'] or [])
+
+    for group_permissions in matrix.values():
+        for schema_permissions in group_permissions.values():
+            schema_permissions['actions'] = frozenset(schema_permissions['actions'])
+            schema_permissions['attributes'] = frozenset(schema_permissions['attributes'])
+    return matrix
+
+
+permission_matrix_cache = PermissionMatrixCache()
+
+
+class AuthorizerDecisionCache(object):
+    """Caches the policies returned by the admin and login API authorizer for each user, group membership and API
+    stage, until the user's token expires. The policies allow or deny all the methods of the API, so the same policy
+    is returned for every endpoint. API Gateway authorizer caching is left disabled, as it would keep using a policy
+    after the token expires."""
+
+    max_size = int(os.environ.get('AUTHORIZER_CACHE_MAX_SIZE', '256'))
+    """The policies of up to this many users and API stages are cached."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.decisions = OrderedDict()
+
+    def clear(self):
+        with self.lock:
+            self.decisions.clear()
+
+    def get(self, cache_key):
+        """ Return a copy of the cached policy for cache_key, None if it is not cached or has expired.
+        """
+        with self.lock:
+            decision = self.decisions.get(cache_key)
+            if decision is None:
+                return None
+            expires, auth_response = decision
+            if expires <= time.time():
+                del self.decisions[cache_key]
+                return None
+            self.decisions.move_to_end(cache_key)
+        return copy.deepcopy(auth_response)
+
+    def put(self, cache_key, auth_response, expires):
+        """ Cache the policy until expires, policies without an expiry are not cached.
+        """
+        if not isinstance(expires, (int, float)):
+            return
+        with self.lock:
+            self.decisions[cache_key] = (expires, copy.deepcopy(auth_response))
+            self.decisions.move_to_end(cache_key)
+            while len(self.decisions) > self.max_size:
+                self.decisions.popitem(last=False)
+
+
+authorizer_decision_cache = AuthorizerDecisionCache()
+
+
 class MFAuth(object):
 
     def __init__(self):
@@ -192,6 +441,7 @@ class MFAuth(object):
 
         self.role_table = boto3.resource('dynamodb').Table(roles_table_name)
         self.policy_table = boto3.resource('dynamodb').Table(policy_table_name)
+        self.counters_table = boto3.resource('dynamodb').Table('{}-{}-counters'.format(application, environment))
         self.region = os.environ['region']
 
     def get_claims(self, aws_region, aws_user_pool, token, audience=None, access_token=None):
@@ -200,10 +450,12 @@ class MFAuth(object):
         """
 
         verify_url = self.pool_url(aws_region, aws_user_pool)
+        claims_cache_key = (verify_url, token, audience, access_token)
+        claims = jwks_cache.get_claims(claims_cache_key)
+        if claims is not None:
+            return claims
 
-        optional_custom_headers = {"User-agent": "custom-user-agent"}
-        jwks_client = PyJWKClient(verify_url + '/.well-known/jwks.json', headers=optional_custom_headers)
-        signing_key = jwks_client.get_signing_key_from_jwt(token)
+        signing_key = jwks_cache.get_signing_key(verify_url, token)
 
         kargs = {"issuer": verify_url, "algorithms": ['RS256']}
         if audience is not None:
@@ -232,6 +484,7 @@ class MFAuth(object):
             if not at_hash.startswith(claims['at_hash'].encode()):
                 raise AtHashValidationFailed
 
+        jwks_cache.put_claims(claims_cache_key, claims)
         return claims
 
     def pool_url(self, aws_region, aws_user_pool):
@@ -331,7 +584,6 @@ class MFAuth(object):
         policy.region = arn[3]
         policy.policy = apigateway_arn[1]
 
-        method = apigateway_arn[2]
         apitype = apigateway_arn[3]
 
         try:
@@ -353,87 +605,53 @@ class MFAuth(object):
         logger.info('Cognito User email: %s', email)
         logger.debug('Cognito User principalId: %s', principal_id)
 
-        path = "/" + "/".join(apigateway_arn[3:])
+        decision_cache_key = (principal_id, tuple(group or []), aws_account_id, policy.region, policy.rest_api_id,
+                              policy.policy, apitype)
+        auth_response = authorizer_decision_cache.get(decision_cache_key)
+        if auth_response is not None:
+            logger.info('Using cached API Access decision, %s', email)
+            return auth_response
+
+        # Access is decided for the whole API rather than the method requested, so that the same policy can be
+        # returned for all of its methods.
+        path = "/" + apitype + "/*"
 
         self.add_methods_for_admin_api(
-            apitype, group, email, policy, method, path)
+            apitype, group, email, policy, HttpVerb.ALL, path)
         self.add_methods_for_login_api(
-            apitype, group, email, policy, method, path)
+            apitype, group, email, policy, HttpVerb.ALL, path)
+        if policy.allow_methods:
+            policy.allow_method(HttpVerb.ALL, "/" + apitype)
 
         # Finally, build the policy
         auth_response = policy.build()
 
+        authorizer_decision_cache.put(decision_cache_key, auth_response, claims.get('exp'))
         return auth_response
 
 
-    def get_user_policy(self, event):
+    def get_group_permissions(self, event, schema_name):
+        """ Return the permissions for schema_name of each of the user's Cognito groups from the permission matrix.
+        """
         group_identity = event['requestContext']['authorizer']['claims']['cognito:groups']
-        role_list = self.role_table.scan()
-
-        user_policy_list = []
-        logger.debug(role_list['Items'])
-        logger.debug(group_identity)
-        for item in role_list['Items']:
-            for group in item['groups']:
-                if (group['group_name'] in group_identity):
-                    for policy in item['policies']:
-                        if policy['policy_id'] not in user_policy_list:
-                            user_policy_list.append(policy['policy_id'])
-        user = {
-            'userRef': event['requestContext']['authorizer']['claims']['cognito:username'], #NOSONAR It is fine to repeat cognito:username string as a json key name
-            'email': event['requestContext']['authorizer']['claims']['email']
-        }
+        matrix = permission_matrix_cache.get_matrix(self.role_table, self.policy_table, self.counters_table)
 
-        logger.debug('User policies: %s', user_policy_list)
-        return user_policy_list, user
+        group_permissions = []
+        for group_name, schemas in matrix.items():
+            if group_name in group_identity and schema_name in schemas:
+                group_permissions.append(schemas[schema_name])
+        return group_permissions
 
-    def set_access_level_for_schema(self, schema, schema_name, schema_action, allow_access):
-        is_matching_schema_found = False
-        
-        # Schema is matching, set access level.
-        if schema.get('schema_name') == schema_name:
-            if schema_action and schema.get(schema_action) == True:
-                is_matching_schema_found = True
-                allow_access = True
-            
-        return is_matching_schema_found, allow_access
-
-    def get_access_level_for_schema(self, event, policy, schema_name, allow_access):
-        method_schema_dict ={
-            "PUT": "update",
-            "POST": "create",
-            "DELETE": "delete"}
-        
-        for schema in policy['entity_access']:
-            # Set access level for matching schema, if found.
-            is_matching_schema_found, allow_access = self.set_access_level_for_schema(
-                    schema,
-                    schema_name,
-                    method_schema_dict.get(event['httpMethod']),
-                    allow_access)
-            
-            if is_matching_schema_found == True:
-                break
-
-        return allow_access
-
-    def get_allow_access(self, event, user_policy_list, schema_name):
-        policies = self.policy_table.scan()
-        allow_access = False
-
-        for policy in policies['Items']:
-            for user_policy in user_policy_list:
-                # Found policy match.
-                if policy['policy_id'] == user_policy and 'entity_access' in policy:
-                    allow_access = self.get_access_level_for_schema(
-                        event, policy, schema_name, allow_access)
-                    if allow_access:
-                        break
-            if allow_access:
-                # Policy located, no need to check others, exit loop.
-                break
-
-        return allow_access
+    def get_allow_access(self, event, schema_name):
+        schema_action = METHOD_SCHEMA_ACTIONS.get(event['httpMethod'])
+        return any(schema_action in permissions['actions']
+                   for permissions in self.get_group_permissions(event, schema_name))
+
+    def get_user_allowed_attributes(self, event, schema_name):
+        """ Return the frozenset of the attributes of schema_name the user's groups are allowed to update.
+        """
+        return frozenset().union(*[permissions['attributes']
+                                   for permissions in self.get_group_permissions(event, schema_name)])
 
     def update_access_type_in_return_message(self, event, allow_access, schema_name, user):
         # Update access type string for return message.
@@ -489,62 +707,32 @@ class MFAuth(object):
                 'cause': "User is not assigned to any group. Access denied.",
             }
         
-        user_policy_list, user = self.get_user_policy(event)
+        user = {
+            'userRef': event['requestContext']['authorizer']['claims']['cognito:username'], #NOSONAR It is fine to repeat cognito:username string as a json key name
+            'email': event['requestContext']['authorizer']['claims']['email']
+        }
 
-        allow_access = self.get_allow_access(event, user_policy_list, schema_name)
+        allow_access = self.get_allow_access(event, schema_name)
 
         return_message = self.update_access_type_in_return_message(event, allow_access, schema_name, user)
 
         return return_message
 
-    def get_user_policy_list(self, event):
-        group_identity = event['requestContext']['authorizer']['claims']['cognito:groups']
-        user_policy_list = []
-
-        role_list = self.role_table.scan()
-        logger.debug('Cognito User email: %s', event['requestContext']['authorizer']['claims']['email'])
-        logger.info('Cognito Username: ' + event['requestContext']['authorizer']['claims']['cognito:username'])
-        logger.debug('All Roles: %s', role_list['Items'])
-        for item in role_list['Items']:
-            for group in item['groups']:
-                if (group['group_name'] in group_identity):
-                    for policy in item['policies']:
-                        if policy['policy_id'] not in user_policy_list:
-                            user_policy_list.append(policy['policy_id'])
-
-        return user_policy_list
-
-    def create_user_allowed_attr_list(self, policy, schema_name, user_allowed_attr_list):
-        for entity in policy['entity_access']:
-            if 'attributes' in entity and entity['schema_name'] == schema_name:
-                # Found schema in entity access list.
-                for attr in entity['attributes']:
-                    user_allowed_attr_list.append(attr['attr_name'])
-                break  # No need to look further as found schema.
-
-        return  user_allowed_attr_list
-
-    def get_user_allowed_attr_list(self, policy_list, user_policy_list, schema_name):
-        user_allowed_attr_list = []
-        for policy in policy_list['Items']:
-            if 'entity_access' in policy and policy['policy_id'] in user_policy_list:
-                user_allowed_attr_list = self.create_user_allowed_attr_list(
-                    policy, schema_name, user_allowed_attr_list)
-
-        return user_allowed_attr_list
-    
-    def get_access_allowed_denied_list(self, attr_list, user_allowed_attr_list):
-        access_allowed_attr_list = []
-        access_denied_attr_list = []
-        for attr in attr_list:
-            if (attr in user_allowed_attr_list):
-                access_allowed_attr_list.append(attr)
-            else:
-                access_denied_attr_list.append(attr)
+    def get_access_allowed_denied_list(self, attr_list, user_allowed_attributes):
+        requested_attributes = frozenset(attr_list)
+        return sorted(requested_attributes & user_allowed_attributes), \
+            sorted(requested_attributes - user_allowed_attributes)
 
-        return access_allowed_attr_list, access_denied_attr_list
+    def get_user_attribute_policy(self, event, schema_name, attribute_names=None):
+        """
+        Checks the user has permission to update all the attributes requested for schema_name.
 
-    def get_user_attribute_policy(self, event, schema_name):
+        Args:
+            event: API Gateway event of the request
+            schema_name: name of the schema being updated
+            attribute_names: attributes being updated, defaults to the keys of the request body. Bulk updates pass the
+                set of the attributes of all the records so that the policy is only evaluated once.
+        """
 
         # Fix for change of app to application in schema.
         if schema_name == 'app':
@@ -569,8 +757,11 @@ class MFAuth(object):
                 'cause': "Request is not Authenticated",
             }
 
-        body = json.loads(event['body']) if event.get('body') else {}
-        attr_list = body.keys()
+        if attribute_names is None:
+            body = json.loads(event['body']) if event.get('body') else {}
+            attr_list = body.keys()
+        else:
+            attr_list = attribute_names
         if (len(attr_list) == 0):
             logger.error('%s: There are no attributes to update',
                          event['requestContext']['authorizer']['claims']['cognito:username'])
@@ -606,19 +797,15 @@ class MFAuth(object):
             'email': event['requestContext']['authorizer']['claims']['email']
         }
 
-        user_policy_list =  self.get_user_policy_list(event)
-
-        policy_list = self.policy_table.scan()
-
-        user_allowed_attr_list = self.get_user_allowed_attr_list(policy_list, user_policy_list, schema_name)
+        user_allowed_attributes = self.get_user_allowed_attributes(event, schema_name)
 
         logger.debug('%s Attributes requested: %s', event['requestContext']['authorizer']['claims']['cognito:username'],
                      attr_list)
         logger.debug('%s: Attributes allowed: %s', event['requestContext']['authorizer']['claims']['cognito:username'],
-                     user_allowed_attr_list)
+                     user_allowed_attributes)
 
         access_allowed_attr_list, access_denied_attr_list = \
-            self.get_access_allowed_denied_list(attr_list, user_allowed_attr_list)
+            self.get_access_allowed_denied_list(attr_list, user_allowed_attributes)
 
         if (len(access_denied_attr_list) > 0):
             error_msg = 'You do not have permission to update attributes ' + ': ' + ",".join(access_denied_attr_list)
@@ -1,44 +1,157 @@
 #  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 #  SPDX-License-Identifier: Apache-2.0
 
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import datetime
 from botocore.config import Config
 import boto3
 import os
+import threading
+import time
 
+# Clients and resources are shared by all the calls with the same arguments, region and credentials for the lifetime
+# of the Lambda execution environment. Clients are thread safe and shared by all threads, resources are not and are
+# shared within a thread.
+MAX_POOL_CONNECTIONS = int(os.getenv('BOTO_MAX_POOL_CONNECTIONS', '50'))
+RETRY_MODE = os.getenv('BOTO_RETRY_MODE', 'adaptive')
+MAX_POOLED_CLIENTS = int(os.getenv('BOTO_MAX_POOLED_CLIENTS', '100'))
 
-def client(*args, **kwargs):
+# Clients created with credentials passed as arguments are discarded this many seconds before the credentials expire,
+# or after CREDENTIALS_TTL_SECONDS if the expiry of the credentials is not provided.
+CREDENTIALS_EXPIRY_MARGIN_SECONDS = 60
+CREDENTIALS_TTL_SECONDS = int(os.getenv('BOTO_CREDENTIALS_TTL_SECONDS', '900'))
+
+_clients_lock = threading.Lock()
+_clients = OrderedDict()
+_thread_resources = threading.local()
+
+
+def client(*args, credentials_expiration=None, **kwargs):
+    """
+    returns a shared boto client instrumented with a user agent
+
+    Args:
+        credentials_expiration: expiry of the credentials passed in kwargs, as returned by STS
+    """
+    _add_user_agent(kwargs)
+    return _get_pooled(_clients, _clients_lock, ('client',) + _get_pool_key(None, args, kwargs),
+                       _get_expiry(kwargs, credentials_expiration), lambda: boto3.client(*args, **kwargs))
+
+
+def resource(*args, credentials_expiration=None, **kwargs):
     """
-    returns a boto client instrumented with a user agent
+    returns a boto resource instrumented with a user agent, shared within the current thread
     """
     _add_user_agent(kwargs)
-    return boto3.client(*args, **kwargs)
+    return _get_pooled(_get_thread_resources(), nullcontext(), ('resource',) + _get_pool_key(None, args, kwargs),
+                       _get_expiry(kwargs, credentials_expiration), lambda: boto3.resource(*args, **kwargs))
 
 
-def resource(*args, **kwargs):
+def session_client(session, *args, credentials_expiration=None, **kwargs):
     """
-    returns a boto resource instrumented with a user agent
+    returns a shared boto session_client instrumented with a user agent
     """
     _add_user_agent(kwargs)
-    return boto3.resource(*args, **kwargs)
+    return _get_pooled(_clients, _clients_lock, ('client',) + _get_pool_key(session, args, kwargs),
+                       _get_expiry(kwargs, credentials_expiration), lambda: session.client(*args, **kwargs))
 
 
-def session_client(session, *args, **kwargs):
+def session_resource(session, *args, credentials_expiration=None, **kwargs):
     """
-    returns a boto session_client instrumented with a user agent
+    returns a boto session_resource instrumented with a user agent, shared within the current thread
     """
     _add_user_agent(kwargs)
-    return session.client(*args, **kwargs)
+    return _get_pooled(_get_thread_resources(), nullcontext(), ('resource',) + _get_pool_key(session, args, kwargs),
+                       _get_expiry(kwargs, credentials_expiration), lambda: session.resource(*args, **kwargs))
+
+
+def clear_pool():
+    """
+    discards the shared clients, and the resources of the current thread
+    """
+    with _clients_lock:
+        _clients.clear()
+    _get_thread_resources().clear()
 
 
 def _add_user_agent(kwargs):
     """
-    adds a user agent to the kwargs if there isn't none
+    adds a user agent to the kwargs if there isn't none, with the pool size and retry mode of the shared clients
     """
     solution_id = os.getenv('SOLUTION_ID', 'SO0097')
     solution_version = os.getenv('SOLUTION_VERSION', 'unknown')
     user_agent = f'AwsSolution/{solution_id}/{solution_version}'
+    boto_config = Config(user_agent_extra=user_agent,
+                         max_pool_connections=MAX_POOL_CONNECTIONS,
+                         retries={'mode': RETRY_MODE})
     if 'config' not in kwargs:
-        boto_config = Config(user_agent_extra=user_agent)
         kwargs['config'] = boto_config
     else:
-        kwargs['config'] = kwargs['config'].merge(Config(user_agent_extra=user_agent))
+        kwargs['config'] = boto_config.merge(kwargs['config']).merge(Config(user_agent_extra=user_agent))
+
+
+def _get_thread_resources():
+    if not hasattr(_thread_resources, 'pool'):
+        _thread_resources.pool = OrderedDict()
+    return _thread_resources.pool
+
+
+def _get_pool_key(session, args, kwargs):
+    """
+    returns the arguments, region and credentials identity that a client or resource is shared for
+    """
+    config_options = tuple(sorted((name, repr(value))
+                                  for name, value in kwargs['config']._user_provided_options.items()))
+    arguments = tuple(sorted((name, value) for name, value in kwargs.items() if name not in ['config', 'region_name']))
+    return args, arguments, config_options, _get_region(session, kwargs), _get_credentials_identity(session, kwargs)
+
+
+def _get_region(session, kwargs):
+    if kwargs.get('region_name'):
+        return kwargs['region_name']
+    if session is not None:
+        return session.region_name
+    return os.getenv('AWS_REGION', os.getenv('AWS_DEFAULT_REGION'))
+
+
+def _get_credentials_identity(session, kwargs):
+    if 'aws_access_key_id' in kwargs:
+        return kwargs['aws_access_key_id'], kwargs.get('aws_session_token')
+    if session is not None:
+        credentials = session.get_credentials()
+        if credentials is None:
+            return None
+        frozen_credentials = credentials.get_frozen_credentials()
+        return frozen_credentials.access_key, frozen_credentials.token
+    return os.getenv('AWS_ACCESS_KEY_ID'), os.getenv('AWS_SESSION_TOKEN')
+
+
+def _get_expiry(kwargs, credentials_expiration):
+    """
+    returns the time after which a client or resource is no longer shared, None if it is shared indefinitely
+    """
+    if isinstance(credentials_expiration, datetime):
+        return credentials_expiration.timestamp() - CREDENTIALS_EXPIRY_MARGIN_SECONDS
+    if 'aws_access_key_id' in kwargs:
+        return time.time() + CREDENTIALS_TTL_SECONDS
+    return None
+
+
+def _get_pooled(pool, lock, key, expiry, create):
+    """
+    returns the client or resource for key from pool, calling create if it is missing or has expired
+    """
+    with lock:
+        pooled = pool.get(key)
+        if pooled is not None and (pooled[0] is None or pooled[0] > time.time()):
+            pool.move_to_end(key)
+            return pooled[1]
+
+    created = create()
+    with lock:
+        pool[key] = (expiry, created)
+        pool.move_to_end(key)
+        while len(pool) > MAX_POOLED_CLIENTS:
+            pool.popitem(last=False)
+    return created
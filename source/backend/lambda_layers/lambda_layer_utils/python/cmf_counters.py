@@ -0,0 +1,131 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+import os
+
+import botocore
+
+import cmf_boto
+from cmf_logger import logger
+
+application = os.environ["application"]
+environment = os.environ["environment"]
+counters_table_name = '{}-{}-counters'.format(application, environment)
+dynamodb = cmf_boto.resource("dynamodb")
+counters_table = dynamodb.Table(counters_table_name)
+
+COUNTER_NAME_KEY = 'counter_name'
+COUNTER_VALUE_KEY = 'counter_value'
+
+# Version marker incremented on every schema create, update and delete.
+SCHEMA_VERSION_COUNTER = 'schema_version'
+
+# Version marker incremented on every change to roles and policies, used by the policy layer to compile the permissions
+# of each group again.
+PERMISSIONS_VERSION_COUNTER = 'permissions_version'
+
+# Version markers incremented on every change to the items of the schemas in ITEMS_VERSION_SCHEMAS, used to build the
+# ETags of item listings. Items of other schemas are also updated by automation without passing through the item APIs.
+ITEMS_VERSION_COUNTER_PREFIX = 'items_version_'
+ITEMS_VERSION_SCHEMAS = ['app', 'database', 'server', 'wave']
+
+
+class CounterNotFoundException(Exception):
+    pass
+
+
+def get_counter(counter_name: str) -> int:
+    """
+    Returns the current value of the counter, counters that have never been incremented return 0.
+    """
+    response = counters_table.get_item(
+        Key={COUNTER_NAME_KEY: counter_name},
+        ConsistentRead=True
+    )
+    return int(response.get('Item', {}).get(COUNTER_VALUE_KEY, 0))
+
+
+def increment_counter(counter_name: str, increment: int = 1, require_existing: bool = False) -> int:
+    """
+    Atomically adds increment to the counter and returns the new value.
+
+    Args:
+        counter_name: name of the counter
+        increment: value to add, allows a block of values to be reserved in a single request
+        require_existing: if True the counter is not created when missing and CounterNotFoundException is raised
+
+    Returns:
+        The counter value after the increment
+    """
+    update_args = {
+        'Key': {COUNTER_NAME_KEY: counter_name},
+        'UpdateExpression': 'ADD #counter_value :increment',
+        'ExpressionAttributeNames': {'#counter_value': COUNTER_VALUE_KEY},
+        'ExpressionAttributeValues': {':increment': increment},
+        'ReturnValues': 'UPDATED_NEW'
+    }
+    if require_existing:
+        update_args['ConditionExpression'] = 'attribute_exists(#counter_value)'
+
+    try:
+        response = counters_table.update_item(**update_args)
+    except botocore.exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            raise CounterNotFoundException(f'Counter {counter_name} does not exist') from e
+        raise
+
+    new_value = int(response['Attributes'][COUNTER_VALUE_KEY])
+    logger.debug(f'Counter {counter_name} incremented to {new_value}')
+    return new_value
+
+
+def seed_counter(counter_name: str, value: int) -> bool:
+    """
+    Creates the counter with an initial value, an existing counter is left unchanged.
+
+    Returns:
+        True if the counter was created, False if it already existed
+    """
+    try:
+        counters_table.put_item(
+            Item={COUNTER_NAME_KEY: counter_name, COUNTER_VALUE_KEY: value},
+            ConditionExpression='attribute_not_exists(#counter_name)',
+            ExpressionAttributeNames={'#counter_name': COUNTER_NAME_KEY}
+        )
+    except botocore.exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+    logger.info(f'Counter {counter_name} seeded with {value}')
+    return True
+
+
+def set_counter_minimum(counter_name: str, value: int) -> None:
+    """
+    Raises an existing counter to value if it is currently lower, missing counters are not created.
+    """
+    try:
+        counters_table.update_item(
+            Key={COUNTER_NAME_KEY: counter_name},
+            UpdateExpression='SET #counter_value = :value',
+            ConditionExpression='#counter_value < :value',
+            ExpressionAttributeNames={'#counter_value': COUNTER_VALUE_KEY},
+            ExpressionAttributeValues={':value': value}
+        )
+    except botocore.exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+
+
+def get_items_version_counter(schema_name: str) -> str:
+    return ITEMS_VERSION_COUNTER_PREFIX + schema_name
+
+
+def increment_items_version(schema_name: str) -> None:
+    """
+    Signals that items of the schema have changed, schemas not in ITEMS_VERSION_SCHEMAS are ignored.
+    """
+    if schema_name in ITEMS_VERSION_SCHEMAS:
+        increment_counter(get_items_version_counter(schema_name))
+
@@ -0,0 +1,587 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+import math
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import botocore
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+import cmf_boto
+from cmf_logger import logger
+
+# Parallel scans use one segment for every SCAN_SEGMENT_SIZE_BYTES of table data, up to SCAN_MAX_SEGMENTS.
+SCAN_SEGMENT_SIZE_BYTES = int(os.environ.get('SCAN_SEGMENT_SIZE_BYTES', str(4 * 1024 * 1024)))
+SCAN_MAX_SEGMENTS = int(os.environ.get('SCAN_MAX_SEGMENTS', '16'))
+
+# Time in seconds a segment worker waits for the consumer before checking if the scan has been stopped.
+SCAN_PAGE_PUT_TIMEOUT_SECONDS = 0.5
+
+_SEGMENT_COMPLETE = object()
+
+# Filters are a list of conditions on top level attributes, all of which must match. Each condition is a dict with the
+# attribute, the comparator and, except for exists, the value to compare to.
+FILTER_EQUAL_COMPARATOR = 'eq'
+FILTER_IN_COMPARATOR = 'in'
+FILTER_BEGINS_WITH_COMPARATOR = 'begins_with'
+FILTER_EXISTS_COMPARATOR = 'exists'
+FILTER_IN_MAX_VALUES = 100
+
+# Batch writes are sent in chunks of BATCH_WRITE_MAX_ITEMS requests on a thread pool. Unprocessed requests are retried
+# with exponential backoff and full jitter, up to BATCH_WRITE_MAX_RETRIES times, and then returned to the caller.
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_WRITE_MAX_WORKERS = int(os.environ.get('BATCH_WRITE_MAX_WORKERS', '8'))
+BATCH_WRITE_MAX_RETRIES = int(os.environ.get('BATCH_WRITE_MAX_RETRIES', '8'))
+BATCH_WRITE_BACKOFF_BASE_SECONDS = 0.05
+BATCH_WRITE_BACKOFF_MAX_SECONDS = 5
+BATCH_WRITE_RETRYABLE_ERRORS = ['ProvisionedThroughputExceededException', 'ThrottlingException',
+                                'RequestLimitExceeded', 'InternalServerError']
+
+# Batch reads request up to BATCH_GET_MAX_KEYS keys at a time, unprocessed keys are retried with the same backoff as
+# batch writes and UnprocessedKeysException is raised if any remain after BATCH_GET_MAX_RETRIES retries.
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_RETRIES = 10
+
+# Key attributes and GSI hash keys of tables, cached for the life of the container.
+table_key_lookups = {}
+
+
+class InvalidFilterException(Exception):
+    pass
+
+
+class UnprocessedKeysException(Exception):
+    pass
+
+
+def get_projection_args(attribute_names):
+    """
+    Returns the ProjectionExpression and ExpressionAttributeNames arguments to read only attribute_names.
+    """
+    expression_attribute_names = {f'#attr{i}': name for i, name in enumerate(sorted(attribute_names))}
+    return {
+        'ProjectionExpression': ', '.join(expression_attribute_names.keys()),
+        'ExpressionAttributeNames': expression_attribute_names
+    }
+
+
+def get_table_key_lookup(table):
+    """
+    Returns the key attributes of table, a map of attribute name to the name of an active GSI with that attribute as
+    its hash key, and the types of the key attributes. Table descriptions are cached for the life of the container.
+    """
+    if table.name not in table_key_lookups:
+        indexes = {}
+        for index in table.global_secondary_indexes or []:
+            if index.get('IndexStatus', 'ACTIVE') != 'ACTIVE':
+                continue
+            for key in index['KeySchema']:
+                if key['KeyType'] == 'HASH':
+                    indexes.setdefault(key['AttributeName'], index['IndexName'])
+
+        table_key_lookups[table.name] = {
+            'key_attributes': [key['AttributeName'] for key in table.key_schema],
+            'indexes': indexes,
+            'attribute_types': {
+                attribute['AttributeName']: attribute['AttributeType'] for attribute in table.attribute_definitions
+            }
+        }
+
+    return table_key_lookups[table.name]
+
+
+def get_scan_segment_count(table):
+    """
+    Returns the number of parallel scan segments for table based on its size. The size reported by DynamoDB is
+    updated approximately every six hours, which is accurate enough to size the scan.
+    """
+    table_size_bytes = table.table_size_bytes or 0
+    return max(1, min(SCAN_MAX_SEGMENTS, math.ceil(table_size_bytes / SCAN_SEGMENT_SIZE_BYTES)))
+
+
+def scan_pages(table, projection_attributes=None, parallel=False, total_segments=None, consistent_read=True,
+               filter_expression=None):
+    """
+    Scans table and yields the items one page at a time, so that callers do not need to hold the whole table.
+
+    Args:
+        table: DynamoDB table resource
+        projection_attributes: attribute names to return, all attributes are returned if not provided
+        parallel: if True the table is scanned in segments on a thread pool, pages are then yielded as soon as any
+            segment returns them and are not in table order
+        total_segments: number of segments for a parallel scan, chosen from the table size if not provided
+        consistent_read: use strongly consistent reads
+        filter_expression: boto3 condition the returned items must match, see get_filter_condition
+
+    Returns:
+        Generator of lists of items
+    """
+    scan_args = {'ConsistentRead': consistent_read}
+    if projection_attributes:
+        scan_args.update(get_projection_args(projection_attributes))
+    if filter_expression is not None:
+        scan_args['FilterExpression'] = filter_expression
+
+    if parallel:
+        total_segments = total_segments or get_scan_segment_count(table)
+        if total_segments > 1:
+            yield from scan_segments_pages(table.name, total_segments, scan_args)
+            return
+
+    yield from scan_segment_pages(table, scan_args)
+
+
+def scan_table(table, projection_attributes=None, parallel=False, total_segments=None, consistent_read=True,
+               filter_expression=None):
+    """
+    Scans table and returns all items as a list, see scan_pages for the arguments.
+    """
+    items = []
+    for page in scan_pages(table, projection_attributes, parallel, total_segments, consistent_read,
+                           filter_expression):
+        items.extend(page)
+
+    return items
+
+
+def query_pages(table, key_condition, index_name=None, projection_attributes=None, limit=None,
+                consistent_read=False, filter_expression=None):
+    """
+    Queries table, or one of its indexes, and yields the matching items one page at a time. Each further page is
+    read with query and ExclusiveStartKey, so only the items matching key_condition are ever read.
+
+    Args:
+        table: DynamoDB table resource
+        key_condition: boto3 key condition, for example Key('pipeline_id').eq(pipeline_id)
+        index_name: name of the index to query, the table is queried if not provided
+        projection_attributes: attribute names to return, all attributes are returned if not provided
+        limit: maximum number of items to return in total, all matching items are returned if not provided
+        consistent_read: use strongly consistent reads, not supported on global secondary indexes
+        filter_expression: boto3 condition the returned items must match, see get_filter_condition
+
+    Returns:
+        Generator of lists of items
+    """
+    query_args = {'KeyConditionExpression': key_condition}
+    if index_name:
+        query_args['IndexName'] = index_name
+    if projection_attributes:
+        query_args.update(get_projection_args(projection_attributes))
+    if consistent_read:
+        query_args['ConsistentRead'] = True
+    if filter_expression is not None:
+        query_args['FilterExpression'] = filter_expression
+
+    remaining = limit
+    while remaining is None or remaining > 0:
+        if remaining is not None:
+            query_args['Limit'] = remaining
+        response = table.query(**query_args)
+        items = response['Items']
+        if remaining is not None:
+            remaining -= len(items)
+        yield items
+        if 'LastEvaluatedKey' not in response:
+            return
+        logger.debug(f'Query of {table.name} continuing from {response["LastEvaluatedKey"]}')
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def query_table(table, key_condition, index_name=None, projection_attributes=None, limit=None,
+                consistent_read=False, filter_expression=None):
+    """
+    Queries table and returns all matching items as a list, see query_pages for the arguments.
+    """
+    items = []
+    for page in query_pages(table, key_condition, index_name, projection_attributes, limit, consistent_read,
+                            filter_expression):
+        items.extend(page)
+
+    return items
+
+
+def read_page(table, limit, exclusive_start_key=None, key_condition=None, index_name=None,
+              projection_attributes=None, filter_expression=None, consistent_read=False):
+    """
+    Reads a single page of up to limit items from table, for APIs that return results to the caller in pages.
+    DynamoDB stops each request at 1 MB, so further requests are made until limit items have been read or there are
+    no more items.
+
+    Args:
+        table: DynamoDB table resource
+        limit: maximum number of items to return
+        exclusive_start_key: key returned with the previous page, the first page is read if not provided
+        key_condition: boto3 key condition to query with, the table or index is scanned if not provided
+        index_name: name of the index to read, the table is read if not provided
+        projection_attributes: attribute names to return, all attributes are returned if not provided
+        filter_expression: boto3 condition the returned items must match, see get_filter_condition
+        consistent_read: use strongly consistent reads, not supported on global secondary indexes
+
+    Returns:
+        Tuple of the list of items and the key to read the next page from, or None if there are no more items
+    """
+    read_args = {}
+    if consistent_read:
+        read_args['ConsistentRead'] = True
+    if key_condition is not None:
+        read_args['KeyConditionExpression'] = key_condition
+    if index_name:
+        read_args['IndexName'] = index_name
+    if projection_attributes:
+        read_args.update(get_projection_args(projection_attributes))
+    if filter_expression is not None:
+        read_args['FilterExpression'] = filter_expression
+    read = table.query if key_condition is not None else table.scan
+
+    items = []
+    last_evaluated_key = exclusive_start_key
+    while True:
+        if last_evaluated_key:
+            read_args['ExclusiveStartKey'] = last_evaluated_key
+        response = read(Limit=limit - len(items), **read_args)
+        items.extend(response['Items'])
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key or len(items) >= limit:
+            return items, last_evaluated_key
+
+
+def is_valid_exclusive_start_key(table, exclusive_start_key, index_name=None):
+    """
+    Returns True if exclusive_start_key holds exactly the key attributes of table, and of index_name if provided, as
+    strings. Keys passed back by API callers are checked so that a modified key is not sent to DynamoDB.
+    """
+    key_attributes = {key['AttributeName'] for key in table.key_schema}
+    if index_name:
+        for index in table.global_secondary_indexes or []:
+            if index['IndexName'] == index_name:
+                key_attributes.update(key['AttributeName'] for key in index['KeySchema'])
+
+    return isinstance(exclusive_start_key, dict) and set(exclusive_start_key.keys()) == key_attributes and \
+        all(isinstance(value, str) for value in exclusive_start_key.values())
+
+
+def validate_filter(item_filter):
+    if not isinstance(item_filter, dict):
+        raise InvalidFilterException(f'Filter must be an object with attribute, comparator and value: {item_filter}')
+
+    attribute = item_filter.get('attribute')
+    if not isinstance(attribute, str) or not attribute or '.' in attribute or '[' in attribute:
+        raise InvalidFilterException(f'Filter attribute must be the name of a top level attribute: {item_filter}')
+
+    comparator = item_filter.get('comparator')
+    value = item_filter.get('value')
+    if comparator == FILTER_EQUAL_COMPARATOR:
+        if value is None or isinstance(value, (list, dict)):
+            raise InvalidFilterException(f'Filter value for {comparator} must be a single value: {item_filter}')
+    elif comparator == FILTER_IN_COMPARATOR:
+        if not isinstance(value, list) or not value or len(value) > FILTER_IN_MAX_VALUES or \
+                any(v is None or isinstance(v, (list, dict)) for v in value):
+            raise InvalidFilterException(f'Filter value for {comparator} must be a list of 1 to '
+                                         f'{FILTER_IN_MAX_VALUES} values: {item_filter}')
+    elif comparator == FILTER_BEGINS_WITH_COMPARATOR:
+        if not isinstance(value, str) or not value:
+            raise InvalidFilterException(f'Filter value for {comparator} must be a string: {item_filter}')
+    elif comparator == FILTER_EXISTS_COMPARATOR:
+        if value is not None and not isinstance(value, bool):
+            raise InvalidFilterException(f'Filter value for {comparator} must be true or false: {item_filter}')
+    else:
+        raise InvalidFilterException(f'Filter comparator {comparator} is not supported, supported comparators are '
+                                     f'{FILTER_EQUAL_COMPARATOR}, {FILTER_IN_COMPARATOR}, '
+                                     f'{FILTER_BEGINS_WITH_COMPARATOR} and {FILTER_EXISTS_COMPARATOR}')
+
+
+def validate_filters(filters):
+    """
+    Raises InvalidFilterException if filters is not a list of valid filter conditions.
+    """
+    if not isinstance(filters, list):
+        raise InvalidFilterException('Filters must be a list of conditions')
+    for item_filter in filters:
+        validate_filter(item_filter)
+
+
+def get_filter_condition(filters):
+    """
+    Compiles filters to a boto3 condition for a FilterExpression, or returns None if there are no filters.
+    """
+    condition = None
+    for item_filter in filters:
+        attribute = Attr(item_filter['attribute'])
+        comparator = item_filter['comparator']
+        if comparator == FILTER_EQUAL_COMPARATOR:
+            attribute_condition = attribute.eq(item_filter['value'])
+        elif comparator == FILTER_IN_COMPARATOR:
+            attribute_condition = attribute.is_in(item_filter['value'])
+        elif comparator == FILTER_BEGINS_WITH_COMPARATOR:
+            attribute_condition = attribute.begins_with(item_filter['value'])
+        elif item_filter.get('value', True):
+            attribute_condition = attribute.exists()
+        else:
+            attribute_condition = attribute.not_exists()
+        condition = attribute_condition if condition is None else condition & attribute_condition
+
+    return condition
+
+
+def is_key_value_type(value, attribute_type):
+    if attribute_type == 'S':
+        return isinstance(value, str)
+    if attribute_type == 'N':
+        return isinstance(value, (int, Decimal)) and not isinstance(value, bool)
+    return False
+
+
+def get_filter_key_conditions(table, filters, multiple_values=True):
+    """
+    Finds the first eq, or in if multiple_values is True, filter on the table key or the hash key of a GSI, so that
+    the matching items can be queried rather than the table scanned.
+
+    Args:
+        table: DynamoDB table resource
+        filters: validated list of filter conditions
+        multiple_values: allow in filters, which need one query per value
+
+    Returns:
+        Tuple of the index name, None for the table, the list of key conditions to query and the remaining filters,
+        or None if no filter matches a key
+    """
+    lookup = get_table_key_lookup(table)
+    for i, item_filter in enumerate(filters):
+        attribute = item_filter['attribute']
+        if item_filter['comparator'] == FILTER_EQUAL_COMPARATOR:
+            values = [item_filter['value']]
+        elif item_filter['comparator'] == FILTER_IN_COMPARATOR and multiple_values:
+            values = list(dict.fromkeys(item_filter['value']))
+        else:
+            continue
+
+        if lookup['key_attributes'] == [attribute]:
+            index_name = None
+        elif attribute in lookup['indexes']:
+            index_name = lookup['indexes'][attribute]
+        else:
+            continue
+
+        # Values of a different type to the key can never match, the filter is applied as a FilterExpression instead.
+        if not all(is_key_value_type(value, lookup['attribute_types'].get(attribute)) for value in values):
+            continue
+
+        return index_name, [Key(attribute).eq(value) for value in values], filters[:i] + filters[i + 1:]
+
+    return None
+
+
+def get_filtered_item_pages(table, filters, projection_attributes=None):
+    """
+    Yields the items in table that match all filters one page at a time. If a filter matches the table key or a GSI
+    hash key, only the matching items are queried, otherwise the table is scanned in parallel with a FilterExpression.
+
+    Args:
+        table: DynamoDB table resource
+        filters: validated list of filter conditions
+        projection_attributes: attribute names to return, all attributes are returned if not provided
+
+    Returns:
+        Generator of lists of items
+    """
+    filter_key_conditions = get_filter_key_conditions(table, filters)
+    if not filter_key_conditions:
+        yield from scan_pages(table, projection_attributes, parallel=True,
+                              filter_expression=get_filter_condition(filters))
+        return
+
+    index_name, key_conditions, remaining_filters = filter_key_conditions
+    filter_expression = get_filter_condition(remaining_filters)
+    for key_condition in key_conditions:
+        yield from query_pages(table, key_condition, index_name, projection_attributes,
+                               filter_expression=filter_expression)
+
+
+def get_filtered_items(table, filters, projection_attributes=None):
+    """
+    Returns the items in table that match all filters as a list, see get_filtered_item_pages for the arguments.
+    """
+    items = []
+    for page in get_filtered_item_pages(table, filters, projection_attributes):
+        items.extend(page)
+
+    return items
+
+
+def get_backoff_seconds(retry):
+    return random.uniform(0, min(BATCH_WRITE_BACKOFF_MAX_SECONDS, BATCH_WRITE_BACKOFF_BASE_SECONDS * 2 ** retry))
+
+
+def serialize_write_request(write_request, serializer):
+    if 'PutRequest' in write_request:
+        return {'PutRequest': {'Item': serializer.serialize(write_request['PutRequest']['Item'])['M']}}
+    return {'DeleteRequest': {'Key': serializer.serialize(write_request['DeleteRequest']['Key'])['M']}}
+
+
+def deserialize_write_request(write_request, deserializer):
+    if 'PutRequest' in write_request:
+        return {'PutRequest': {'Item': deserializer.deserialize({'M': write_request['PutRequest']['Item']})}}
+    return {'DeleteRequest': {'Key': deserializer.deserialize({'M': write_request['DeleteRequest']['Key']})}}
+
+
+def batch_write_chunk(client, table_name, write_requests, max_retries):
+    retries = 0
+    while True:
+        try:
+            response = client.batch_write_item(RequestItems={table_name: write_requests})
+            write_requests = (response.get('UnprocessedItems') or {}).get(table_name, [])
+        except botocore.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in BATCH_WRITE_RETRYABLE_ERRORS:
+                raise
+            logger.warning(f'Batch write to {table_name} failed, {str(e)}')
+
+        if not write_requests:
+            return []
+        if retries >= max_retries:
+            logger.error(f'Batch write to {table_name} has {len(write_requests)} unprocessed requests '
+                         f'after {retries} retries')
+            return write_requests
+
+        backoff_seconds = get_backoff_seconds(retries)
+        logger.info(f'Batch write to {table_name} has {len(write_requests)} unprocessed requests, retrying in '
+                    f'{backoff_seconds:.2f} seconds')
+        time.sleep(backoff_seconds)
+        retries += 1
+
+
+def batch_write(client, table_name, write_requests, max_workers=BATCH_WRITE_MAX_WORKERS,
+                max_retries=BATCH_WRITE_MAX_RETRIES):
+    """
+    Writes the requests to table_name with BatchWriteItem, sending the chunks concurrently and retrying unprocessed
+    requests with exponential backoff and jitter.
+
+    Args:
+        client: DynamoDB client, boto3 clients can be shared between threads
+        table_name: name of the table to write to
+        write_requests: list of {'PutRequest': {'Item': item}} or {'DeleteRequest': {'Key': key}} with python values
+        max_workers: maximum number of chunks written concurrently
+        max_retries: number of times unprocessed requests are retried before they are returned
+
+    Returns:
+        List of the write requests that could not be processed, with python values
+    """
+    serializer = TypeSerializer()
+    serialized_requests = [serialize_write_request(write_request, serializer) for write_request in write_requests]
+    chunks = [serialized_requests[i:i + BATCH_WRITE_MAX_ITEMS]
+              for i in range(0, len(serialized_requests), BATCH_WRITE_MAX_ITEMS)]
+
+    if len(chunks) <= 1 or max_workers <= 1:
+        unprocessed_chunks = [batch_write_chunk(client, table_name, chunk, max_retries) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            unprocessed_chunks = list(executor.map(
+                lambda chunk: batch_write_chunk(client, table_name, chunk, max_retries), chunks))
+
+    deserializer = TypeDeserializer()
+    return [deserialize_write_request(write_request, deserializer)
+            for unprocessed_requests in unprocessed_chunks for write_request in unprocessed_requests]
+
+
+def batch_put_items(client, table_name, items, max_workers=BATCH_WRITE_MAX_WORKERS,
+                    max_retries=BATCH_WRITE_MAX_RETRIES):
+    """
+    Puts items to table_name using batch_write and returns the items that could not be written.
+    """
+    unprocessed_requests = batch_write(client, table_name, [{'PutRequest': {'Item': item}} for item in items],
+                                       max_workers, max_retries)
+    return [write_request['PutRequest']['Item'] for write_request in unprocessed_requests]
+
+
+def batch_get_items(dynamodb, table_name, keys, projection_attributes=None):
+    """
+    Reads the items with the keys provided using BatchGetItem, keys that do not exist are omitted from the result.
+
+    Args:
+        dynamodb: DynamoDB service resource
+        table_name: name of the table to read from
+        keys: list of key dicts with python values
+        projection_attributes: optional list of attribute names to return
+
+    Returns:
+        List of the items found, in no particular order
+    """
+    projection_args = get_projection_args(projection_attributes) if projection_attributes else {}
+    items = []
+    for i in range(0, len(keys), BATCH_GET_MAX_KEYS):
+        request_items = {table_name: {'Keys': keys[i:i + BATCH_GET_MAX_KEYS], **projection_args}}
+        retries = 0
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            items.extend(response['Responses'].get(table_name, []))
+            request_items = response.get('UnprocessedKeys')
+            if request_items:
+                if retries >= BATCH_GET_MAX_RETRIES:
+                    raise UnprocessedKeysException(f'Unable to read records from {table_name}, keys remain '
+                                                   f'unprocessed after {retries} retries.')
+                time.sleep(get_backoff_seconds(retries))
+                retries += 1
+
+    return items
+
+
+def scan_segment_pages(table, scan_args):
+    while True:
+        response = table.scan(**scan_args)
+        yield response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        logger.debug(f'Scan of {table.name} continuing from {response["LastEvaluatedKey"]}')
+        scan_args = {**scan_args, 'ExclusiveStartKey': response['LastEvaluatedKey']}
+
+
+def scan_segments_pages(table_name, total_segments, scan_args):
+    # The queue is bounded so that segment workers cannot read far ahead of the consumer.
+    pages = queue.Queue(maxsize=total_segments * 2)
+    stopped = threading.Event()
+
+    def put_page(page):
+        while not stopped.is_set():
+            try:
+                pages.put(page, timeout=SCAN_PAGE_PUT_TIMEOUT_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_segment(segment):
+        try:
+            segment_table = cmf_boto.resource('dynamodb').Table(table_name)
+            segment_scan_args = {**scan_args, 'Segment': segment, 'TotalSegments': total_segments}
+            for page in scan_segment_pages(segment_table, segment_scan_args):
+                if not put_page(page):
+                    return
+        except Exception as e:
+            put_page(e)
+        finally:
+            put_page(_SEGMENT_COMPLETE)
+
+    logger.debug(f'Scanning {table_name} in {total_segments} parallel segments')
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        for segment in range(total_segments):
+            executor.submit(scan_segment, segment)
+
+        try:
+            segments_complete = 0
+            while segments_complete < total_segments:
+                page = pages.get()
+                if page is _SEGMENT_COMPLETE:
+                    segments_complete += 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield page
+        finally:
+            # Release any workers still scanning if the consumer stopped early or a segment failed.
+            stopped.set()
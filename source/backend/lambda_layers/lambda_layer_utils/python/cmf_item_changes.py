@@ -0,0 +1,144 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+import os
+from datetime import datetime, timedelta, timezone
+
+from boto3.dynamodb.conditions import Key
+
+import cmf_boto
+import cmf_counters
+import cmf_dynamodb
+from cmf_logger import logger
+
+application = os.environ["application"]
+environment = os.environ["environment"]
+item_changes_table_name = '{}-{}-item_changes'.format(application, environment)
+
+# Changes to the items of the schemas in CHANGE_LOG_SCHEMAS are recorded from the DynamoDB streams of their tables, so
+# that clients can fetch the items modified or deleted since they last synchronised instead of the whole table.
+# Changes expire after CHANGE_RETENTION_DAYS, clients that last synchronised before then have to reload all items.
+CHANGE_LOG_SCHEMAS = ['server', 'wave']
+CHANGE_RETENTION_DAYS = int(os.environ.get('CHANGE_RETENTION_DAYS', '7'))
+
+# Changes are timestamped when they are recorded, the sync timestamp returned to clients is moved back by this margin
+# so that changes recorded at the same time by a stream lambda with a slightly different clock are not missed.
+SYNC_TIMESTAMP_MARGIN_SECONDS = 5
+
+SCHEMA_NAME_KEY = 'schema_name'
+CHANGE_ID_KEY = 'change_id'
+CHANGE_MODIFIED = 'modified'
+CHANGE_DELETED = 'deleted'
+STREAM_EVENT_CHANGES = {
+    'INSERT': CHANGE_MODIFIED,
+    'MODIFY': CHANGE_MODIFIED,
+    'REMOVE': CHANGE_DELETED
+}
+
+
+class ChangesExpiredException(Exception):
+    pass
+
+
+def format_timestamp(timestamp: datetime) -> str:
+    # Always includes microseconds and the UTC offset so that change ids sort in time order.
+    return timestamp.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parses an ISO 8601 timestamp, timestamps without a timezone are UTC. Raises ValueError if value is not valid.
+    """
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def record_stream_changes(schema_name: str, records: list) -> int:
+    """
+    Records the item changes in a batch of DynamoDB stream records of the schema's table and increments the schema's
+    items version. The version is incremented even if the changes could not be written, in which case an exception is
+    raised after the increment.
+
+    Returns:
+        The number of changes recorded
+    """
+    now = datetime.now(timezone.utc)
+    expires = int((now + timedelta(days=CHANGE_RETENTION_DAYS)).timestamp())
+    write_requests = []
+    for index, record in enumerate(records):
+        change = STREAM_EVENT_CHANGES.get(record.get('eventName'))
+        item_id = record.get('dynamodb', {}).get('Keys', {}).get(schema_name + '_id', {}).get('S')
+        if not change or not item_id:
+            continue
+        write_requests.append({'PutRequest': {'Item': {
+            SCHEMA_NAME_KEY: schema_name,
+            CHANGE_ID_KEY: f'{format_timestamp(now)}#{record.get("eventID", index)}',
+            'item_id': item_id,
+            'change': change,
+            'expires': expires
+        }}})
+
+    if not write_requests:
+        return 0
+
+    try:
+        unprocessed_requests = cmf_dynamodb.batch_write(cmf_boto.client('dynamodb'), item_changes_table_name,
+                                                        write_requests)
+    finally:
+        # Items of these tables are also written outside the item APIs, which do not increment the version
+        # themselves.
+        cmf_counters.increment_items_version(schema_name)
+    if unprocessed_requests:
+        raise Exception(f'Unable to record {len(unprocessed_requests)} changes to {schema_name} items.')
+
+    logger.info(f'Recorded {len(write_requests)} changes to {schema_name} items.')
+    return len(write_requests)
+
+
+def increment_items_version_after_write(schema_name: str) -> None:
+    """
+    Increments the items version after the item APIs wrote items of the schema, so that a listing requested after the
+    write response is never answered as not modified. Schemas in CHANGE_LOG_SCHEMAS are incremented again by
+    record_stream_changes once the write reaches the stream. Errors are logged and not raised, as the items have
+    already been written.
+    """
+    try:
+        cmf_counters.increment_items_version(schema_name)
+    except Exception as e:
+        logger.error(f'Unable to increment the items version of {schema_name}, listing ETags are not invalidated: '
+                     f'{str(e)}')
+
+
+def get_changes(schema_name: str, modified_since: datetime):
+    """
+    Returns the items of schema_name that were changed after modified_since.
+
+    Args:
+        schema_name: name of the schema, one of CHANGE_LOG_SCHEMAS
+        modified_since: timezone aware timestamp of the last synchronisation
+
+    Returns:
+        A tuple of the timestamp to synchronise from next time, the ids of the items modified, and the ids of the
+        items deleted. Ids are only returned once, with their latest change.
+
+    Raises:
+        ChangesExpiredException: if changes since modified_since may have already expired
+    """
+    now = datetime.now(timezone.utc)
+    if modified_since < now - timedelta(days=CHANGE_RETENTION_DAYS):
+        raise ChangesExpiredException(f'Changes are only kept for {CHANGE_RETENTION_DAYS} days.')
+    sync_timestamp = format_timestamp(now - timedelta(seconds=SYNC_TIMESTAMP_MARGIN_SECONDS))
+
+    item_changes_table = cmf_boto.resource('dynamodb').Table(item_changes_table_name)
+    key_condition = Key(SCHEMA_NAME_KEY).eq(schema_name) & Key(CHANGE_ID_KEY).gt(format_timestamp(modified_since))
+    latest_changes = {}
+    for change in cmf_dynamodb.query_table(item_changes_table, key_condition,
+                                           projection_attributes=[CHANGE_ID_KEY, 'item_id', 'change']):
+        # Changes are returned in the order they were recorded.
+        latest_changes[change['item_id']] = change['change']
+
+    modified_ids = [item_id for item_id, change in latest_changes.items() if change == CHANGE_MODIFIED]
+    deleted_ids = [item_id for item_id, change in latest_changes.items() if change == CHANGE_DELETED]
+    return sync_timestamp, modified_ids, deleted_ids
@@ -0,0 +1,87 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+import io
+import json
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+
+class JsonEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        elif isinstance(obj, bytes):
+            return str(obj, encoding='utf-8')
+        return json.JSONEncoder.default(self, obj)
+
+
+# Shared encoder, so that each response does not create a new encoder. Values are converted by to_json_types before
+# they are encoded, so the encoder's default() is not called for every DynamoDB number.
+json_encoder = JsonEncoder()
+
+_JSON_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def to_json_types(obj):
+    """
+    Returns obj with the DynamoDB types the json module cannot encode converted in a single pass. Numbers are returned
+    as strings, as they have always been by the item APIs, and binary values as UTF-8 strings.
+    """
+    if isinstance(obj, _JSON_SCALAR_TYPES):
+        return obj
+    if isinstance(obj, dict):
+        return {key: value if isinstance(value, _JSON_SCALAR_TYPES) else to_json_types(value)
+                for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [value if isinstance(value, _JSON_SCALAR_TYPES) else to_json_types(value) for value in obj]
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return str(obj, encoding='utf-8')
+    return obj
+
+
+def dumps(obj) -> str:
+    return json_encoder.encode(to_json_types(obj))
+
+
+def iter_encode_pages(pages: Iterable[list]) -> Iterator[str]:
+    """
+    Yields the JSON array of the items in pages in parts, converting and encoding one page at a time, so that pages read
+    from DynamoDB can be released as soon as they are encoded.
+    """
+    yield '['
+    first = True
+    for page in pages:
+        if not page:
+            continue
+        encoded_page = json_encoder.encode(to_json_types(page))
+        yield encoded_page[1:-1] if first else ', ' + encoded_page[1:-1]
+        first = False
+    yield ']'
+
+
+def encode_pages(pages: Iterable[list]):
+    """
+    Encodes the items in pages as a JSON array, encoding one page at a time without building the list of all items.
+    The returned body is a single string holding the whole array.
+
+    Args:
+        pages: iterable of lists of items, for example the pages of a DynamoDB scan or query
+
+    Returns:
+        A tuple of the body and the number of items encoded
+    """
+    item_count = 0
+
+    def count_items():
+        nonlocal item_count
+        for page in pages:
+            item_count += len(page)
+            yield page
+
+    buffer = io.StringIO()
+    for part in iter_encode_pages(count_items()):
+        buffer.write(part)
+    return buffer.getvalue(), item_count
@@ -1,6 +1,7 @@
 #  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 #  SPDX-License-Identifier: Apache-2.0
 from datetime import datetime, timezone
+import hashlib
 import os
 import requests
 import json
@@ -35,6 +36,14 @@ if region == 'unknown':
     region = os.environ.get('REGION', 'unknown')
 anonymous_usage_data_url = 'https://metrics.awssolutionsbuilder.com/generic'
 solution_id = os.getenv('SOLUTION_ID', 'SO0097')
+solution_version = os.getenv('SOLUTION_VERSION', '')
+
+# Listings that are polled by the UI return an ETag built from a version counter, requests with a matching
+# If-None-Match header are answered with 304 without reading the listing. Browsers can only read the ETag of a CORS
+# response when it is exposed. API Gateway compresses large responses for clients that accept gzip or deflate, so the
+# ETags are weak, as the same listing is sent with different encodings, and caches have to vary on Accept-Encoding.
+ETAG_HTTP_HEADERS = {'Access-Control-Expose-Headers': 'ETag', 'Vary': 'Accept-Encoding'}
+WEAK_ETAG_PREFIX = 'W/'
 
 
 def send_anonymous_usage_data(status):
@@ -104,4 +113,45 @@ def publish_event(notification: NotificationType, events_client: boto3.client, e
             )
 
     except botocore.exceptions.ClientError as e:
-        logger.error(f"EventBridge error occurred while publishing event: {str(e)}")
\ No newline at end of file
+        logger.error(f"EventBridge error occurred while publishing event: {str(e)}")
+
+
+def get_request_header(event: dict, header_name: str):
+    """
+    Returns the value of the request header, header names are matched case-insensitively. Returns None if missing.
+    """
+    header_name = header_name.lower()
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == header_name:
+            return value
+    return None
+
+
+def get_etag(*version_parts) -> str:
+    """
+    Returns a weak ETag for a response that only changes when one of version_parts changes. The solution version is
+    included so that cached responses are not reused after an upgrade changes the response format.
+    """
+    version = '|'.join(str(version_part) for version_part in (solution_version, *version_parts))
+    return WEAK_ETAG_PREFIX + '"' + hashlib.sha256(version.encode('utf-8')).hexdigest()[:32] + '"'
+
+
+def is_etag_matched(event: dict, etag: str) -> bool:
+    """
+    Returns True if the If-None-Match header of the request matches etag, using the weak comparison of RFC 9110.
+    """
+    if_none_match = get_request_header(event, 'If-None-Match')
+    if not if_none_match:
+        return False
+    opaque_tag = etag.removeprefix(WEAK_ETAG_PREFIX)
+    for request_etag in if_none_match.split(','):
+        request_etag = request_etag.strip()
+        if request_etag == '*' or request_etag.removeprefix(WEAK_ETAG_PREFIX) == opaque_tag:
+            return True
+    return False
+
+
+def get_not_modified_response(etag: str) -> dict:
+    return {'headers': {**default_http_headers, **ETAG_HTTP_HEADERS, 'ETag': etag},
+            'statusCode': 304,
+            'body': ''}
@@ -0,0 +1,81 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase, mock
+
+import boto3
+
+import test_common_utils  # noqa: F401, adds the layers to the path
+import cmf_boto
+
+loglevel = logging.INFO
+logging.basicConfig(level=loglevel)
+log = logging.getLogger(__name__)
+
+
+@mock.patch.dict('os.environ', test_common_utils.default_mock_os_environ)
+class CMFBotoTest(TestCase):
+
+    def setUp(self):
+        cmf_boto.clear_pool()
+
+    def tearDown(self):
+        cmf_boto.clear_pool()
+
+    def test_client_shared(self):
+        log.info("Testing cmf_boto: test_client_shared")
+        client = cmf_boto.client('dynamodb')
+
+        self.assertIs(client, cmf_boto.client('dynamodb'))
+        self.assertIs(client, cmf_boto.client('dynamodb', region_name='us-east-1'))
+        self.assertIsNot(client, cmf_boto.client('dynamodb', region_name='us-west-2'))
+        self.assertIsNot(client, cmf_boto.client('s3'))
+
+    def test_client_config(self):
+        log.info("Testing cmf_boto: test_client_config")
+        client = cmf_boto.client('dynamodb')
+        custom_client = cmf_boto.client('dynamodb', config=cmf_boto.Config(max_pool_connections=5))
+
+        self.assertIn('AwsSolution/SO0097/', client.meta.config.user_agent_extra)
+        self.assertEqual(cmf_boto.MAX_POOL_CONNECTIONS, client.meta.config.max_pool_connections)
+        self.assertEqual(cmf_boto.RETRY_MODE, client.meta.config.retries['mode'])
+        self.assertIsNot(client, custom_client)
+        self.assertEqual(5, custom_client.meta.config.max_pool_connections)
+        self.assertIn('AwsSolution/SO0097/', custom_client.meta.config.user_agent_extra)
+
+    def test_client_credentials(self):
+        log.info("Testing cmf_boto: test_client_credentials")
+        expiration = datetime.now(timezone.utc) + timedelta(hours=1)
+        client = cmf_boto.client('cloudformation', aws_access_key_id='key1', aws_secret_access_key='secret',
+                                 aws_session_token='token1', credentials_expiration=expiration)
+
+        self.assertIs(client, cmf_boto.client('cloudformation', aws_access_key_id='key1',
+                                              aws_secret_access_key='secret', aws_session_token='token1',
+                                              credentials_expiration=expiration))
+        self.assertIsNot(client, cmf_boto.client('cloudformation', aws_access_key_id='key2',
+                                                 aws_secret_access_key='secret', aws_session_token='token2'))
+        self.assertIsNot(client, cmf_boto.client('cloudformation'))
+
+    def test_client_credentials_expired(self):
+        log.info("Testing cmf_boto: test_client_credentials_expired")
+        expiration = datetime.now(timezone.utc) + timedelta(seconds=cmf_boto.CREDENTIALS_EXPIRY_MARGIN_SECONDS - 1)
+        client = cmf_boto.client('cloudformation', aws_access_key_id='key1', aws_secret_access_key='secret',
+                                 aws_session_token='token1', credentials_expiration=expiration)
+
+        self.assertIsNot(client, cmf_boto.client('cloudformation', aws_access_key_id='key1',
+                                                 aws_secret_access_key='secret', aws_session_token='token1'))
+
+    def test_resource_shared_within_thread(self):
+        log.info("Testing cmf_boto: test_resource_shared_within_thread")
+        resource = cmf_boto.resource('dynamodb')
+        thread_resources = []
+        thread = threading.Thread(target=lambda: thread_resources.append(cmf_boto.resource('dynamodb')))
+        thread.start()
+        thread.join()
+
+        self.assertIs(resource, cmf_boto.resource('dynamodb'))
+        self.assertIs(resource, cmf_boto.session_resource(boto3.session.Session(), 'dynamodb'))
+        self.assertIsNot(resource, thread_resources[0])
@@ -0,0 +1,273 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+import boto3
+import logging
+import os
+import test_common_utils
+
+from boto3.dynamodb.conditions import Key
+from moto import mock_aws
+from unittest import TestCase, mock
+
+loglevel = logging.INFO
+logging.basicConfig(level=loglevel)
+log = logging.getLogger(__name__)
+
+mock_os_environ = {
+    **test_common_utils.default_mock_os_environ
+}
+
+
+@mock.patch.dict('os.environ', mock_os_environ)
+@mock_aws
+class CMFDynamoDBTest(TestCase):
+    @mock.patch.dict('os.environ', mock_os_environ)
+    def setUp(self):
+        import cmf_dynamodb
+        boto3.setup_default_session()
+        self.servers_table_name = '{}-{}-'.format('cmf', 'unittest') + 'servers'
+        self.client = boto3.client("dynamodb", region_name='us-east-1')
+        test_common_utils.create_and_populate_servers(self.client, self.servers_table_name)
+        self.servers_table = boto3.resource('dynamodb').Table(self.servers_table_name)
+        cmf_dynamodb.table_key_lookups.clear()
+        self.server_ids = sorted(item['server_id'] for item in self.servers_table.scan()['Items'])
+
+    def test_scan_table(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_scan_table")
+        items = cmf_dynamodb.scan_table(self.servers_table)
+        self.assertEqual(self.server_ids, sorted(item['server_id'] for item in items))
+
+    def test_scan_table_projection(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_scan_table_projection")
+        items = cmf_dynamodb.scan_table(self.servers_table, ['server_id', 'app_id'])
+        self.assertEqual(self.server_ids, sorted(item['server_id'] for item in items))
+        for item in items:
+            self.assertTrue(set(item.keys()) <= {'server_id', 'app_id'})
+
+    def test_scan_pages_parallel(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_scan_pages_parallel")
+        pages = list(cmf_dynamodb.scan_pages(self.servers_table, parallel=True, total_segments=3))
+        self.assertEqual(self.server_ids, sorted(item['server_id'] for page in pages for item in page))
+        self.assertTrue(len(pages) >= 3)
+
+    def test_scan_pages_parallel_consumer_stops_early(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_scan_pages_parallel_consumer_stops_early")
+        pages = cmf_dynamodb.scan_pages(self.servers_table, parallel=True, total_segments=4)
+        self.assertTrue(isinstance(next(pages), list))
+        pages.close()
+
+    def test_scan_pages_parallel_error(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_scan_pages_parallel_error")
+        missing_table = boto3.resource('dynamodb').Table('cmf-unittest-missing')
+        with self.assertRaises(Exception):
+            list(cmf_dynamodb.scan_pages(missing_table, parallel=True, total_segments=2))
+
+    def test_get_scan_segment_count(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_get_scan_segment_count")
+        table = mock.Mock(table_size_bytes=0)
+        self.assertEqual(1, cmf_dynamodb.get_scan_segment_count(table))
+        table.table_size_bytes = cmf_dynamodb.SCAN_SEGMENT_SIZE_BYTES * 3 + 1
+        self.assertEqual(4, cmf_dynamodb.get_scan_segment_count(table))
+        table.table_size_bytes = cmf_dynamodb.SCAN_SEGMENT_SIZE_BYTES * 1000
+        self.assertEqual(cmf_dynamodb.SCAN_MAX_SEGMENTS, cmf_dynamodb.get_scan_segment_count(table))
+
+    def test_query_table_index(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_query_table_index")
+        app_id = self.servers_table.scan()['Items'][0]['app_id']
+        expected = sorted(item['server_id'] for item in self.servers_table.scan()['Items'] if item['app_id'] == app_id)
+        items = cmf_dynamodb.query_table(self.servers_table, Key('app_id').eq(app_id), 'app_id-index',
+                                         ['server_id', 'app_id'])
+        self.assertEqual(expected, sorted(item['server_id'] for item in items))
+        for item in items:
+            self.assertTrue(set(item.keys()) <= {'server_id', 'app_id'})
+
+    def test_query_table_limit(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_query_table_limit")
+        app_id = self.servers_table.scan()['Items'][0]['app_id']
+        items = cmf_dynamodb.query_table(self.servers_table, Key('app_id').eq(app_id), 'app_id-index', limit=1)
+        self.assertEqual(1, len(items))
+
+    def test_query_pages_follows_last_evaluated_key(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_query_pages_follows_last_evaluated_key")
+        table = mock.Mock()
+        table.query.side_effect = [
+            {'Items': [{'server_id': '1'}], 'LastEvaluatedKey': {'server_id': '1'}},
+            {'Items': [{'server_id': '2'}]}
+        ]
+        key_condition = Key('app_id').eq('1')
+        pages = list(cmf_dynamodb.query_pages(table, key_condition, 'app_id-index'))
+        self.assertEqual([[{'server_id': '1'}], [{'server_id': '2'}]], pages)
+        table.scan.assert_not_called()
+        table.query.assert_called_with(IndexName='app_id-index', KeyConditionExpression=key_condition,
+                                       ExclusiveStartKey={'server_id': '1'})
+
+    def test_read_page(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_read_page")
+        items, last_evaluated_key = cmf_dynamodb.read_page(self.servers_table, 2)
+        self.assertEqual(2, len(items))
+        self.assertIsNotNone(last_evaluated_key)
+        remaining_items, last_evaluated_key = cmf_dynamodb.read_page(self.servers_table, 1000, last_evaluated_key)
+        self.assertIsNone(last_evaluated_key)
+        self.assertEqual(self.server_ids, sorted(item['server_id'] for item in items + remaining_items))
+
+    def test_is_valid_exclusive_start_key(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_is_valid_exclusive_start_key")
+        self.assertTrue(cmf_dynamodb.is_valid_exclusive_start_key(self.servers_table, {'server_id': '1'}))
+        self.assertTrue(cmf_dynamodb.is_valid_exclusive_start_key(
+            self.servers_table, {'server_id': '1', 'app_id': '1'}, 'app_id-index'))
+        self.assertFalse(cmf_dynamodb.is_valid_exclusive_start_key(self.servers_table, {'server_id': 1}))
+        self.assertFalse(cmf_dynamodb.is_valid_exclusive_start_key(self.servers_table, {'app_id': '1'}))
+        self.assertFalse(cmf_dynamodb.is_valid_exclusive_start_key(
+            self.servers_table, {'server_id': '1', 'app_id': '1'}))
+        self.assertFalse(cmf_dynamodb.is_valid_exclusive_start_key(self.servers_table, ['1']))
+
+    def test_validate_filters(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_validate_filters")
+        cmf_dynamodb.validate_filters([
+            {'attribute': 'app_id', 'comparator': 'eq', 'value': '1'},
+            {'attribute': 'server_id', 'comparator': 'in', 'value': ['1', '2']},
+            {'attribute': 'server_name', 'comparator': 'begins_with', 'value': 'server'},
+            {'attribute': 'server_fqdn', 'comparator': 'exists', 'value': False},
+            {'attribute': 'server_fqdn', 'comparator': 'exists'}
+        ])
+        invalid_filters = [
+            {'attribute': 'app_id', 'comparator': 'eq', 'value': '1'},
+            [{'attribute': 'app.id', 'comparator': 'eq', 'value': '1'}],
+            [{'attribute': 'app_id', 'comparator': 'ne', 'value': '1'}],
+            [{'attribute': 'app_id', 'comparator': 'eq'}],
+            [{'attribute': 'app_id', 'comparator': 'in', 'value': []}],
+            [{'attribute': 'app_id', 'comparator': 'in', 'value': [str(i) for i in range(101)]}],
+            [{'attribute': 'app_id', 'comparator': 'begins_with', 'value': 1}],
+            [{'attribute': 'app_id', 'comparator': 'exists', 'value': 'yes'}],
+            ['app_id']
+        ]
+        for filters in invalid_filters:
+            with self.assertRaises(cmf_dynamodb.InvalidFilterException):
+                cmf_dynamodb.validate_filters(filters)
+
+    def test_get_filter_key_conditions(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_get_filter_key_conditions")
+        name_filter = {'attribute': 'server_name', 'comparator': 'begins_with', 'value': 'server'}
+        app_filter = {'attribute': 'app_id', 'comparator': 'in', 'value': ['1', '2', '1']}
+        index_name, key_conditions, remaining_filters = cmf_dynamodb.get_filter_key_conditions(
+            self.servers_table, [name_filter, app_filter])
+        self.assertEqual('app_id-index', index_name)
+        self.assertEqual(2, len(key_conditions))
+        self.assertEqual([name_filter], remaining_filters)
+
+        self.assertIsNone(cmf_dynamodb.get_filter_key_conditions(
+            self.servers_table, [name_filter, app_filter], multiple_values=False))
+        self.assertIsNone(cmf_dynamodb.get_filter_key_conditions(
+            self.servers_table, [{'attribute': 'app_id', 'comparator': 'eq', 'value': 1}]))
+
+        index_name, key_conditions, remaining_filters = cmf_dynamodb.get_filter_key_conditions(
+            self.servers_table, [{'attribute': 'server_id', 'comparator': 'eq', 'value': '1'}])
+        self.assertIsNone(index_name)
+        self.assertEqual([], remaining_filters)
+
+    def test_get_filtered_items(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_get_filtered_items")
+        servers = self.servers_table.scan()['Items']
+        app_id = servers[0]['app_id']
+        expected = sorted(server['server_id'] for server in servers if server['app_id'] == app_id)
+
+        with mock.patch.object(self.servers_table, 'scan') as mock_scan:
+            items = cmf_dynamodb.get_filtered_items(
+                self.servers_table, [{'attribute': 'app_id', 'comparator': 'in', 'value': [app_id, 'missing']}])
+            mock_scan.assert_not_called()
+        self.assertEqual(expected, sorted(item['server_id'] for item in items))
+
+        items = cmf_dynamodb.get_filtered_items(
+            self.servers_table, [{'attribute': 'server_id', 'comparator': 'in', 'value': expected},
+                                 {'attribute': 'server_fqdn', 'comparator': 'exists', 'value': False}],
+            ['server_id'])
+        self.assertEqual(sorted(server['server_id'] for server in servers
+                                if server['app_id'] == app_id and 'server_fqdn' not in server),
+                         sorted(item['server_id'] for item in items))
+
+        items = cmf_dynamodb.get_filtered_items(
+            self.servers_table, [{'attribute': 'app_id', 'comparator': 'eq', 'value': app_id}])
+        self.assertEqual(expected, sorted(item['server_id'] for item in items))
+
+        items = cmf_dynamodb.get_filtered_items(
+            self.servers_table, [{'attribute': 'server_name', 'comparator': 'begins_with', 'value': 'zzz'}])
+        self.assertEqual([], items)
+
+    def test_batch_put_items(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_batch_put_items")
+        items = [{'server_id': str(1000 + i), 'server_name': f'batch{i}', 'app_id': '1'} for i in range(60)]
+        unprocessed_items = cmf_dynamodb.batch_put_items(self.client, self.servers_table_name, items, max_workers=3)
+        self.assertEqual([], unprocessed_items)
+        server_ids = [item['server_id'] for item in self.servers_table.scan()['Items']]
+        self.assertEqual(sorted(self.server_ids + [item['server_id'] for item in items]), sorted(server_ids))
+
+    @mock.patch('cmf_dynamodb.time.sleep')
+    def test_batch_write_retries_unprocessed(self, mock_sleep):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_batch_write_retries_unprocessed")
+        client = mock.Mock()
+        client.batch_write_item.side_effect = lambda RequestItems: {'UnprocessedItems': RequestItems}
+        write_requests = [{'DeleteRequest': {'Key': {'server_id': '1'}}},
+                          {'PutRequest': {'Item': {'server_id': '2', 'server_name': 'server2'}}}]
+        unprocessed_requests = cmf_dynamodb.batch_write(client, self.servers_table_name, write_requests,
+                                                        max_retries=2)
+        self.assertEqual(write_requests, unprocessed_requests)
+        self.assertEqual(3, client.batch_write_item.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
+
+    @mock.patch('cmf_dynamodb.time.sleep')
+    def test_batch_write_retries_throttling(self, mock_sleep):
+        import botocore
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_batch_write_retries_throttling")
+        client = mock.Mock()
+        client.batch_write_item.side_effect = [
+            botocore.exceptions.ClientError({'Error': {'Code': 'ThrottlingException'}}, 'BatchWriteItem'),
+            {'UnprocessedItems': {}}
+        ]
+        unprocessed_requests = cmf_dynamodb.batch_write(client, self.servers_table_name,
+                                                        [{'DeleteRequest': {'Key': {'server_id': '1'}}}])
+        self.assertEqual([], unprocessed_requests)
+        self.assertEqual(1, mock_sleep.call_count)
+
+        client.batch_write_item.side_effect = botocore.exceptions.ClientError(
+            {'Error': {'Code': 'ValidationException'}}, 'BatchWriteItem')
+        with self.assertRaises(botocore.exceptions.ClientError):
+            cmf_dynamodb.batch_write(client, self.servers_table_name, [{'DeleteRequest': {'Key': {'server_id': '1'}}}])
+
+    def test_batch_get_items(self):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_batch_get_items")
+        keys = [{'server_id': server_id} for server_id in self.server_ids + ['missing']]
+        items = cmf_dynamodb.batch_get_items(boto3.resource('dynamodb'), self.servers_table_name, keys,
+                                             ['server_id'])
+        self.assertEqual(self.server_ids, sorted(item['server_id'] for item in items))
+        for item in items:
+            self.assertEqual(['server_id'], list(item.keys()))
+
+    @mock.patch('cmf_dynamodb.time.sleep')
+    def test_batch_get_items_unprocessed_keys(self, mock_sleep):
+        import cmf_dynamodb
+        log.info("Testing cmf_dynamodb: test_batch_get_items_unprocessed_keys")
+        dynamodb = mock.Mock()
+        dynamodb.batch_get_item.side_effect = lambda RequestItems: {'Responses': {}, 'UnprocessedKeys': RequestItems}
+        with self.assertRaises(cmf_dynamodb.UnprocessedKeysException):
+            cmf_dynamodb.batch_get_items(dynamodb, self.servers_table_name, [{'server_id': '1'}])
+        self.assertEqual(cmf_dynamodb.BATCH_GET_MAX_RETRIES + 1, dynamodb.batch_get_item.call_count)
+        self.assertEqual(cmf_dynamodb.BATCH_GET_MAX_RETRIES, mock_sleep.call_count)
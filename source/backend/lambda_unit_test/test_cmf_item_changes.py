@@ -0,0 +1,129 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+import boto3
+import logging
+import test_common_utils
+
+from datetime import datetime, timedelta, timezone
+from moto import mock_aws
+from unittest import TestCase, mock
+
+loglevel = logging.INFO
+logging.basicConfig(level=loglevel)
+log = logging.getLogger(__name__)
+
+mock_os_environ = {
+    **test_common_utils.default_mock_os_environ
+}
+
+
+def get_stream_record(event_id, event_name, server_id):
+    return {'eventID': event_id, 'eventName': event_name, 'eventSource': 'aws:dynamodb',
+            'dynamodb': {'Keys': {'server_id': {'S': server_id}}}}
+
+
+@mock.patch.dict('os.environ', mock_os_environ)
+@mock_aws
+class CMFItemChangesTest(TestCase):
+    @mock.patch.dict('os.environ', mock_os_environ)
+    def setUp(self):
+        boto3.setup_default_session()
+        self.item_changes_table_name = '{}-{}-'.format('cmf', 'unittest') + 'item_changes'
+        self.ddb_client = boto3.client('dynamodb', region_name='us-east-1')
+        test_common_utils.create_item_changes_table(self.ddb_client, self.item_changes_table_name)
+        test_common_utils.create_counters_table(self.ddb_client, '{}-{}-'.format('cmf', 'unittest') + 'counters')
+        self.item_changes_table = boto3.resource('dynamodb').Table(self.item_changes_table_name)
+
+    def test_record_stream_changes(self):
+        import cmf_item_changes
+        log.info("Testing cmf_item_changes: test_record_stream_changes")
+        records = [
+            get_stream_record('1', 'INSERT', '1'),
+            get_stream_record('2', 'MODIFY', '2'),
+            get_stream_record('3', 'REMOVE', '3'),
+            {'eventID': '4', 'eventName': 'MODIFY', 'dynamodb': {}}
+        ]
+        recorded = cmf_item_changes.record_stream_changes('server', records)
+
+        self.assertEqual(3, recorded)
+        changes = sorted(self.item_changes_table.scan()['Items'], key=lambda change: change['item_id'])
+        self.assertEqual(['1', '2', '3'], [change['item_id'] for change in changes])
+        self.assertEqual(['modified', 'modified', 'deleted'], [change['change'] for change in changes])
+        for change in changes:
+            self.assertEqual('server', change['schema_name'])
+            self.assertIn('expires', change)
+        self.assertEqual(1, cmf_item_changes.cmf_counters.get_counter('items_version_server'))
+
+    def test_record_stream_changes_no_changes(self):
+        import cmf_item_changes
+        log.info("Testing cmf_item_changes: test_record_stream_changes_no_changes")
+        recorded = cmf_item_changes.record_stream_changes('server', [{'eventID': '1', 'eventName': 'MODIFY'}])
+
+        self.assertEqual(0, recorded)
+        self.assertEqual([], self.item_changes_table.scan()['Items'])
+
+    def test_record_stream_changes_unprocessed(self):
+        import cmf_item_changes
+        log.info("Testing cmf_item_changes: test_record_stream_changes_unprocessed")
+        with mock.patch('cmf_item_changes.cmf_dynamodb.batch_write', return_value=[{'PutRequest': {}}]):
+            self.assertRaises(Exception, cmf_item_changes.record_stream_changes, 'server',
+                              [get_stream_record('1', 'INSERT', '1')])
+
+        # the listing ETags are invalidated even though the changes could not be recorded.
+        self.assertEqual(1, cmf_item_changes.cmf_counters.get_counter('items_version_server'))
+
+    def test_increment_items_version_after_write(self):
+        import cmf_item_changes
+        log.info("Testing cmf_item_changes: test_increment_items_version_after_write")
+        cmf_item_changes.increment_items_version_after_write('app')
+        cmf_item_changes.increment_items_version_after_write('server')
+
+        self.assertEqual(1, cmf_item_changes.cmf_counters.get_counter('items_version_app'))
+        # server items are also versioned by their stream, but the API write must not wait for it.
+        self.assertEqual(1, cmf_item_changes.cmf_counters.get_counter('items_version_server'))
+
+    def test_get_changes(self):
+        import cmf_item_changes
+        log.info("Testing cmf_item_changes: test_get_changes")
+        modified_since = datetime.now(timezone.utc) - timedelta(minutes=1)
+        cmf_item_changes.record_stream_changes('server', [get_stream_record('1', 'INSERT', '1'),
+                                                          get_stream_record('2', 'INSERT', '2')])
+        cmf_item_changes.record_stream_changes('server', [get_stream_record('3', 'REMOVE', '1')])
+        cmf_item_changes.record_stream_changes('wave', [{'eventID': '4', 'eventName': 'INSERT',
+                                                         'dynamodb': {'Keys': {'wave_id': {'S': '1'}}}}])
+
+        sync_timestamp, modified_ids, deleted_ids = cmf_item_changes.get_changes('server', modified_since)
+
+        self.assertEqual(['2'], modified_ids)
+        self.assertEqual(['1'], deleted_ids)
+        self.assertGreater(cmf_item_changes.parse_timestamp(sync_timestamp), modified_since)
+
+    def test_get_changes_none_since_timestamp(self):
+        import cmf_item_changes
+        log.info("Testing cmf_item_changes: test_get_changes_none_since_timestamp")
+        cmf_item_changes.record_stream_changes('server', [get_stream_record('1', 'INSERT', '1')])
+
+        _, modified_ids, deleted_ids = cmf_item_changes.get_changes(
+            'server', datetime.now(timezone.utc) + timedelta(minutes=1))
+
+        self.assertEqual([], modified_ids)
+        self.assertEqual([], deleted_ids)
+
+    def test_get_changes_expired(self):
+        import cmf_item_changes
+        log.info("Testing cmf_item_changes: test_get_changes_expired")
+        modified_since = datetime.now(timezone.utc) - timedelta(days=cmf_item_changes.CHANGE_RETENTION_DAYS + 1)
+
+        self.assertRaises(cmf_item_changes.ChangesExpiredException,
+                          cmf_item_changes.get_changes, 'server', modified_since)
+
+    def test_parse_timestamp(self):
+        import cmf_item_changes
+        log.info("Testing cmf_item_changes: test_parse_timestamp")
+        self.assertEqual(datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+                         cmf_item_changes.parse_timestamp('2024-01-02T03:04:05'))
+        self.assertEqual('2024-01-02T03:04:05.000000+00:00',
+                         cmf_item_changes.format_timestamp(
+                             cmf_item_changes.parse_timestamp('2024-01-02T04:04:05+01:00')))
+        self.assertRaises(ValueError, cmf_item_changes.parse_timestamp, 'yesterday')
@@ -0,0 +1,46 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+import json
+import logging
+from decimal import Decimal
+from unittest import TestCase, mock
+
+import test_common_utils  # noqa: F401, adds the layers to the path
+import cmf_json
+
+loglevel = logging.INFO
+logging.basicConfig(level=loglevel)
+log = logging.getLogger(__name__)
+
+
+class CMFJsonTest(TestCase):
+
+    def test_dumps(self):
+        log.info("Testing cmf_json: test_dumps")
+        self.assertEqual({'count': '5', 'ratio': '0.5', 'data': 'abc', 'name': 'x'},
+                         json.loads(cmf_json.dumps({'count': Decimal('5'), 'ratio': Decimal('0.5'), 'data': b'abc',
+                                                    'name': 'x'})))
+
+    def test_encode_pages(self):
+        log.info("Testing cmf_json: test_encode_pages")
+        pages = iter([[{'id': Decimal('1')}, {'id': Decimal('2')}], [], [{'id': Decimal('3')}]])
+
+        body, item_count = cmf_json.encode_pages(pages)
+
+        self.assertEqual([{'id': '1'}, {'id': '2'}, {'id': '3'}], json.loads(body))
+        self.assertEqual(3, item_count)
+
+    def test_encode_pages_empty(self):
+        log.info("Testing cmf_json: test_encode_pages_empty")
+        self.assertEqual(('[]', 0), cmf_json.encode_pages([]))
+        self.assertEqual(('[]', 0), cmf_json.encode_pages([[], []]))
+
+    def test_encode_pages_converts_before_encoding(self):
+        log.info("Testing cmf_json: test_encode_pages_converts_before_encoding")
+        pages = [[{'id': Decimal('1'), 'tags': [Decimal('2'), {'size': Decimal('1.5')}], 'name': None}]]
+
+        with mock.patch.object(cmf_json.JsonEncoder, 'default', side_effect=TypeError) as mock_default:
+            body, _ = cmf_json.encode_pages(pages)
+            mock_default.assert_not_called()
+        self.assertEqual([{'id': '1', 'tags': ['2', {'size': '1.5'}], 'name': None}], json.loads(body))
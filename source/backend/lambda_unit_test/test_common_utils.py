@@ -205,6 +205,47 @@ def create_and_populate_schemas(ddb_client, schemas_table_name, data_file_name='
     populate_table(ddb_client, schemas_table_name, data_file_name)
 
 
+def create_counters_table(ddb_client, counters_table_name):
+    ddb_client.create_table(
+        TableName=counters_table_name,
+        BillingMode='PAY_PER_REQUEST',
+        KeySchema=[
+            {'AttributeName': 'counter_name', 'KeyType': 'HASH'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'counter_name', 'AttributeType': 'S'},
+        ]
+    )
+
+
+def create_item_changes_table(ddb_client, item_changes_table_name):
+    ddb_client.create_table(
+        TableName=item_changes_table_name,
+        BillingMode='PAY_PER_REQUEST',
+        KeySchema=[
+            {'AttributeName': 'schema_name', 'KeyType': 'HASH'},
+            {'AttributeName': 'change_id', 'KeyType': 'RANGE'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'schema_name', 'AttributeType': 'S'},
+            {'AttributeName': 'change_id', 'AttributeType': 'S'},
+        ]
+    )
+
+
+def create_import_jobs_table(ddb_client, import_jobs_table_name):
+    ddb_client.create_table(
+        TableName=import_jobs_table_name,
+        BillingMode='PAY_PER_REQUEST',
+        KeySchema=[
+            {'AttributeName': 'job_id', 'KeyType': 'HASH'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'job_id', 'AttributeType': 'S'},
+        ]
+    )
+
+
 def create_and_populate_policies(ddb_client, policies_table_name, data_file_name='policies.json'):
     ddb_client.create_table(
         TableName=policies_table_name,
@@ -988,6 +988,158 @@ class ItemValidationTestCase(TestCase):
         expected_response = {}
         self.assertEqual(response, expected_response)
 
+    def test_get_relationship_data_fetches_referenced_keys_only(self):
+        from lambda_layers.lambda_layer_items.python import item_validation
+        log.info("Testing item_validation: get_relationship_data fetches referenced related records by key")
+        item_validation.cmf_dynamodb.table_key_lookups.clear()
+        items = [{"app_id": "3"}, {"app_id": "NO_EXIST"}]
+        schema = {
+            "schema_name": "server",
+            "attributes": [{
+                "name": "app_id",
+                "type": "relationship",
+                "rel_entity": "application",
+                "rel_key": "app_id"
+            }]
+        }
+        with mock.patch.object(item_validation, 'scan_dynamodb_data_table',
+                               side_effect=Exception('Simulated Error')):
+            response = item_validation.get_relationship_data(items, schema)
+        self.assertEqual({"application": [{"app_id": "3"}]}, response)
+        self.assertIsNone(item_validation.check_valid_item_create(items[0], schema, response))
+        self.assertEqual([["app_id:NO_EXIST related record does not exist using key app_id"]],
+                         item_validation.check_valid_item_create(items[1], schema, response))
+
+    def test_get_relationship_data_multiple_related_schemas(self):
+        from lambda_layers.lambda_layer_items.python import item_validation
+        log.info("Testing item_validation: get_relationship_data fetches related schemas concurrently")
+        item_validation.cmf_dynamodb.table_key_lookups.clear()
+        items = [{"app_id": "3", "app_ids": ["3", "4"]}]
+        schema = {
+            "schema_name": "server",
+            "attributes": [{
+                "name": "app_id",
+                "type": "relationship",
+                "rel_entity": "application",
+                "rel_key": "app_id"
+            }, {
+                "name": "app_ids",
+                "type": "relationship",
+                "listMultiSelect": True,
+                "rel_entity": "app",
+                "rel_key": "app_id"
+            }]
+        }
+        response = item_validation.get_relationship_data(items, schema)
+        self.assertEqual({"application": [{"app_id": "3"}], "app": [{"app_id": "3"}]}, response)
+
+    def test_relationship_key_index_reused_across_records(self):
+        from lambda_layers.lambda_layer_items.python import item_validation
+        log.info("Testing item_validation: relationship key index is built once per batch")
+        schema = {
+            "schema_name": "server",
+            "attributes": [{
+                "name": "app_id",
+                "type": "relationship",
+                "rel_entity": "application",
+                "rel_key": "app_id"
+            }, {
+                "name": "app_ids",
+                "type": "relationship",
+                "listMultiSelect": True,
+                "rel_entity": "application",
+                "rel_key": "app_id"
+            }]
+        }
+        related_items = item_validation.RelatedItems({"application": [{"app_id": "1"}, {"app_id": "2"}]})
+        with mock.patch.object(item_validation, 'get_related_key_index',
+                               wraps=item_validation.get_related_key_index) as mock_get_related_key_index:
+            self.assertIsNone(item_validation.check_valid_item_create(
+                {"app_id": "1", "app_ids": ["1", "2"]}, schema, related_items))
+            self.assertEqual(
+                [["app_id:3 related record does not exist using key app_id"],
+                 ["app_ids: The following related record ids do not exist using key app_id - 3, 4"]],
+                item_validation.check_valid_item_create({"app_id": "3", "app_ids": ["2", "3", "4"]}, schema,
+                                                        related_items))
+            mock_get_related_key_index.assert_called_once()
+
+    def test_schema_validator_reused_for_schema(self):
+        from lambda_layers.lambda_layer_items.python import item_validation
+        log.info("Testing item_validation: prepared schema validator is reused for the same schema")
+        schema = {
+            "schema_name": "server",
+            "attributes": [{
+                "name": "server_name",
+                "type": "string",
+                "required": True,
+                "validation_regex": "^[a-z]+$",
+                "validation_regex_msg": "Lower case letters only."
+            }, {
+                "name": "server_fqdn",
+                "type": "string",
+                "conditions": {
+                    "queries": [{"attribute": "server_name", "comparator": "!empty"}],
+                    "outcomes": {"true": ["required"]}
+                }
+            }]
+        }
+        validator = item_validation.get_schema_validator(schema)
+        self.assertIs(validator, item_validation.get_schema_validator(schema))
+        self.assertIsNot(validator, item_validation.get_schema_validator({**schema}))
+
+        with mock.patch.object(item_validation.re, 'compile') as mock_compile:
+            self.assertIsNone(item_validation.check_valid_item_create(
+                {"server_name": "web", "server_fqdn": "web.example.com"}, schema))
+            self.assertEqual(["Attribute server_name, Lower case letters only."],
+                             item_validation.check_valid_item_create(
+                                 {"server_name": "WEB", "server_fqdn": "web.example.com"}, schema))
+            self.assertEqual(["Attribute server_fqdn is required and not provided."],
+                             item_validation.check_valid_item_create({"server_name": "web"}, schema))
+            mock_compile.assert_not_called()
+
+    def test_schema_validator_validate_update(self):
+        from lambda_layers.lambda_layer_items.python import item_validation
+        log.info("Testing item_validation: updates are validated without the rest of the item")
+        schema = {
+            "schema_name": "server",
+            "attributes": [{
+                "name": "server_name",
+                "type": "string",
+                "required": True
+            }, {
+                "name": "tenancy",
+                "type": "string"
+            }, {
+                "name": "server_environment",
+                "type": "string"
+            }, {
+                "name": "dedicated_host_id",
+                "type": "string",
+                "conditions": {
+                    "queries": [{"attribute": "tenancy", "comparator": "=", "value": "Dedicated host"}],
+                    "outcomes": {"true": ["required"], "false": ["not_required"]}
+                }
+            }]
+        }
+        validator = item_validation.get_schema_validator(schema)
+        self.assertEqual(set(), validator.get_update_attribute_names({'server_environment'}))
+        self.assertEqual({'dedicated_host_id'}, validator.get_update_attribute_names({'tenancy'}))
+        self.assertEqual({'tenancy'}, validator.get_update_attribute_names({'dedicated_host_id'}))
+
+        # Required attributes that are not updated are not checked.
+        self.assertIsNone(validator.validate_update({'server_environment': 'prod'}, {'server_environment'}))
+        self.assertEqual(["Attribute server_name is required and not provided."],
+                         validator.validate_update({}, {'server_name'}))
+        self.assertEqual(["Attribute dedicated_host_id is required and not provided."],
+                         validator.validate_update({'tenancy': 'Dedicated host'}, {'tenancy'}))
+        self.assertIsNone(validator.validate_update({'tenancy': 'Dedicated host', 'dedicated_host_id': 'h-1'},
+                                                    {'tenancy'}))
+        self.assertEqual(["Attribute unknown is not defined in the schema."],
+                         validator.validate_update({'unknown': 'x', 'tenancy': 'Shared'}, {'unknown'}))
+
+        pipeline_validator = item_validation.get_schema_validator({"schema_name": "pipeline", "attributes": []})
+        self.assertIsNone(pipeline_validator.get_update_attribute_names({'pipeline_name'}))
+
     def test_is_valid_id_number(self):
         from lambda_layers.lambda_layer_items.python import item_validation
         log.info("Testing item_validation: is_valid_id number")
@@ -12,7 +12,7 @@ import boto3
 from moto import mock_aws
 
 from test_common_utils import LambdaContextLogStream, RequestsResponse, SerializedDictMatcher, logger, \
-    default_mock_os_environ
+    default_mock_os_environ, create_counters_table
 
 mock_os_environ = {
     **default_mock_os_environ,
@@ -24,6 +24,16 @@ mock_os_environ = {
     'PipelineTemplateTaskDynamoDBTable': 'PipelineTemplateTaskDynamoDBTable'
 }
 
+class LambdaContextBackfill(LambdaContextLogStream):
+    def __init__(self, log_stream_name, remaining_time_in_millis=900000):
+        super().__init__(log_stream_name)
+        self._function_name = 'cmf-unittest-default-schema'
+        self._remaining_time_in_millis = remaining_time_in_millis
+
+    def get_remaining_time_in_millis(self):
+        return self._remaining_time_in_millis
+
+
 @mock.patch.dict('os.environ', mock_os_environ)
 @mock_aws
 class LambdaDefaultSchemaTest(unittest.TestCase):
@@ -82,6 +92,7 @@ class LambdaDefaultSchemaTest(unittest.TestCase):
 
         # create the dynamodb tables
         self.ddb_client = boto3.client('dynamodb')
+        create_counters_table(self.ddb_client, 'cmf-unittest-counters')
         self.ddb_client.create_table(
             TableName=self.table_role,
             BillingMode='PAY_PER_REQUEST',
@@ -175,7 +186,7 @@ class LambdaDefaultSchemaTest(unittest.TestCase):
             'LogicalResourceId': 'RESOURCEABC',
             'ResponseURL': self.test_url,
         }
-        self.lambda_context = LambdaContextLogStream('testing')
+        self.lambda_context = LambdaContextBackfill('testing')
 
     def mock_file_open(*args, **kwargs):
         logger.debug(f'mock_file_open : {args}, {kwargs}')
@@ -248,6 +259,11 @@ class LambdaDefaultSchemaTest(unittest.TestCase):
             'Response': 'SUCCESS'
         }, response)
         self.assert_table_contents()
+        mock_lambda_client.invoke.assert_called_with(
+            FunctionName='cmf-unittest-default-schema',
+            InvocationType='Event',
+            Payload=json.dumps({'backfill_item_names': ['app', 'database', 'server', 'wave', 'pipeline',
+                                                        'pipeline_template']}))
 
     @patch('lambda_defaultschema.requests')
     @patch('lambda_defaultschema.lambda_client')
@@ -357,3 +373,48 @@ class LambdaDefaultSchemaTest(unittest.TestCase):
             'Response': 'SUCCESS'
         }, response)
         self.assert_table_contents_empty()
+
+    def create_apps_table(self):
+        self.ddb_client.create_table(
+            TableName='cmf-unittest-apps',
+            BillingMode='PAY_PER_REQUEST',
+            KeySchema=[
+                {"AttributeName": "app_id", "KeyType": "HASH"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "app_id", "AttributeType": "S"},
+            ],
+        )
+        self.ddb_client.put_item(TableName='cmf-unittest-apps',
+                                 Item={'app_id': {'S': '1'}, 'app_name': {'S': 'WordPress'}})
+
+    @patch('lambda_defaultschema.lambda_client')
+    @patch('builtins.open', new=mock_file_open)
+    def test_lambda_handler_backfill_item_names(self, mock_lambda_client):
+        import lambda_defaultschema
+        import cmf_counters
+        self.create_apps_table()
+
+        # the tables of the other schemas do not exist, which does not stop the backfill of the apps.
+        response = lambda_defaultschema.lambda_handler({'backfill_item_names': ['database', 'app']},
+                                                       self.lambda_context)
+        self.assertIsNone(response)
+        self.assertEqual(1, cmf_counters.get_counter('app_name_lower_backfill'))
+        self.assertEqual('wordpress', self.ddb_client.get_item(
+            TableName='cmf-unittest-apps', Key={'app_id': {'S': '1'}})['Item']['_name_lower']['S'])
+        mock_lambda_client.invoke.assert_not_called()
+
+    @patch('lambda_defaultschema.lambda_client')
+    @patch('builtins.open', new=mock_file_open)
+    def test_lambda_handler_backfill_item_names_hand_over(self, mock_lambda_client):
+        import lambda_defaultschema
+        import cmf_counters
+        self.create_apps_table()
+
+        lambda_defaultschema.lambda_handler({'backfill_item_names': ['app', 'wave']},
+                                            LambdaContextBackfill('testing', remaining_time_in_millis=1000))
+        self.assertEqual(0, cmf_counters.get_counter('app_name_lower_backfill'))
+        mock_lambda_client.invoke.assert_called_once_with(
+            FunctionName='cmf-unittest-default-schema',
+            InvocationType='Event',
+            Payload=json.dumps({'backfill_item_names': ['app', 'wave']}))
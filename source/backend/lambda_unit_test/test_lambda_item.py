@@ -311,6 +311,19 @@ class LambdaItemTest(LambdaItemCommonTest):
         self.assertEqual({'errors': ['app_name: OFBiz already exist']},
                          json.loads(response['body']))
 
+    @mock.patch('lambda_item.MFAuth.get_user_attribute_policy',
+                new=mock_get_mf_auth_policy_allow)
+    @mock.patch('lambda_item.item_validation.check_valid_item_create',
+                new=mock_item_check_valid_item_create_valid)
+    def test_lambda_handler_put_same_name_different_case(self):
+        import lambda_item
+        event = {**self.event_put_dup, 'body': json.dumps({'app_name': 'WORDPRESS'})}
+        response = lambda_item.lambda_handler(event, None)
+        self.assertTrue('statusCode' not in response)
+        updated_item = self.apps_table.get_item(Key={'app_id': '1'})['Item']
+        self.assertEqual('WORDPRESS', updated_item['app_name'])
+        self.assertEqual('wordpress', updated_item['_name_lower'])
+
     @mock.patch('lambda_item.MFAuth.get_user_resource_creation_policy',
                 new=mock_get_mf_auth_policy_default_deny)
     def test_lambda_handler_delete_not_authorized(self):
@@ -354,3 +367,65 @@ class LambdaItemTest(LambdaItemCommonTest):
         self.assertEqual(400, response['statusCode'])
         self.assertEqual({'errors': ['app Id: NO_EXIST does not exist']},
                          json.loads(response['body']))
+
+    def get_patch_event(self, body, item_id='1'):
+        return {
+            'httpMethod': 'PATCH',
+            'pathParameters': {
+                'schema': 'app',
+                'id': item_id
+            },
+            'body': json.dumps(body)
+        }
+
+    @mock.patch('lambda_item.MFAuth.get_user_attribute_policy',
+                new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_patch_success(self):
+        import lambda_item
+        response = lambda_item.lambda_handler(self.get_patch_event({'app_name': 'Renamed', 'description': ''}), None)
+        self.assertTrue('statusCode' not in response)
+        self.assertEqual('Renamed', json.loads(response['body'])['Attributes']['app_name'])
+        updated_item = self.apps_table.get_item(Key={'app_id': '1'})['Item']
+        self.assertEqual('Renamed', updated_item['app_name'])
+        self.assertEqual('renamed', updated_item['_name_lower'])
+        self.assertTrue('description' not in updated_item)
+        self.assertEqual(['tag1', 'tag2'], updated_item['tags'])
+        self.assertEqual('testuser@example.com', updated_item['_history']['lastModifiedBy'])
+
+        # the next update is conditional on the timestamp written by the previous one.
+        response = lambda_item.lambda_handler(self.get_patch_event({'app_name': 'Renamed again'}), None)
+        self.assertTrue('statusCode' not in response)
+        updated_item = self.apps_table.get_item(Key={'app_id': '1'})['Item']
+        self.assertEqual('Renamed again', updated_item['app_name'])
+        self.assertEqual('renamed again', updated_item['_name_lower'])
+
+    @mock.patch('lambda_item.MFAuth.get_user_attribute_policy',
+                new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_patch_modified_concurrently(self):
+        import lambda_item
+
+        def modify_item(items, schema):
+            self.apps_table.update_item(Key={'app_id': '1'}, UpdateExpression='SET #history = :history',
+                                        ExpressionAttributeNames={'#history': '_history'},
+                                        ExpressionAttributeValues={':history': {'lastModifiedTimestamp': 'now'}})
+            return {}
+
+        with mock.patch('lambda_item.item_validation.get_relationship_data', side_effect=modify_item):
+            response = lambda_item.lambda_handler(self.get_patch_event({'app_name': 'Renamed'}), None)
+        self.assertEqual(409, response['statusCode'])
+        self.assertEqual('Wordpress', self.apps_table.get_item(Key={'app_id': '1'})['Item']['app_name'])
+
+    @mock.patch('lambda_item.MFAuth.get_user_attribute_policy',
+                new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_patch_invalid(self):
+        import lambda_item
+        for body in [{'app_id': '2'}, {'_history': {}}, ['app_name']]:
+            response = lambda_item.lambda_handler(self.get_patch_event(body), None)
+            self.assertEqual(400, response['statusCode'])
+        response = lambda_item.lambda_handler(self.get_patch_event({'app_name': 'OFBiz'}), None)
+        self.assertEqual({'errors': ['app_name: OFBiz already exist']}, json.loads(response['body']))
+        response = lambda_item.lambda_handler(self.get_patch_event({'app_name': 'x'}, 'NO_EXIST'), None)
+        self.assertEqual({'errors': ['app Id: NO_EXIST does not exist']}, json.loads(response['body']))
+        response = lambda_item.lambda_handler(self.get_patch_event({'aws_region': 'us-west-2'}), None)
+        self.assertEqual({'errors': [['Attribute aws_region is not defined in the schema.']]},
+                         json.loads(response['body']))
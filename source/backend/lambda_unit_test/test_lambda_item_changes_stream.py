@@ -0,0 +1,57 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+import boto3
+import logging
+import test_common_utils
+
+from moto import mock_aws
+from unittest import TestCase, mock
+
+loglevel = logging.INFO
+logging.basicConfig(level=loglevel)
+log = logging.getLogger(__name__)
+
+mock_os_environ = {
+    **test_common_utils.default_mock_os_environ
+}
+
+
+def get_stream_record(event_id, table_name, key_name, item_id):
+    return {'eventID': event_id, 'eventName': 'MODIFY', 'eventSource': 'aws:dynamodb',
+            'eventSourceARN': f'arn:aws:dynamodb:us-east-1:111111111111:table/{table_name}/stream/2024-01-01T00:00:00',
+            'dynamodb': {'Keys': {key_name: {'S': item_id}}}}
+
+
+@mock.patch.dict('os.environ', mock_os_environ)
+@mock_aws
+class LambdaItemChangesStreamTest(TestCase):
+    @mock.patch.dict('os.environ', mock_os_environ)
+    def setUp(self):
+        boto3.setup_default_session()
+        self.ddb_client = boto3.client('dynamodb', region_name='us-east-1')
+        test_common_utils.create_item_changes_table(self.ddb_client, 'cmf-unittest-item_changes')
+        test_common_utils.create_counters_table(self.ddb_client, 'cmf-unittest-counters')
+        self.item_changes_table = boto3.resource('dynamodb').Table('cmf-unittest-item_changes')
+
+    def test_lambda_handler_records_changes(self):
+        log.info("Testing lambda_item_changes_stream: test_lambda_handler_records_changes")
+        from lambda_item_changes_stream import lambda_handler
+
+        lambda_handler({'Records': [get_stream_record('1', 'cmf-unittest-servers', 'server_id', '1'),
+                                    get_stream_record('2', 'cmf-unittest-waves', 'wave_id', '2'),
+                                    get_stream_record('3', 'cmf-unittest-apps', 'app_id', '3')]}, None)
+
+        changes = sorted(self.item_changes_table.scan()['Items'], key=lambda change: change['schema_name'])
+        self.assertEqual([('server', '1'), ('wave', '2')],
+                         [(change['schema_name'], change['item_id']) for change in changes])
+
+    def test_lambda_handler_raises_when_changes_not_recorded(self):
+        log.info("Testing lambda_item_changes_stream: test_lambda_handler_raises_when_changes_not_recorded")
+        from lambda_item_changes_stream import lambda_handler
+
+        # the error is raised so that the stream retries the batch instead of dropping the changes.
+        with mock.patch('lambda_item_changes_stream.cmf_item_changes.cmf_dynamodb.batch_write',
+                        return_value=[{'PutRequest': {}}]):
+            self.assertRaises(Exception, lambda_handler,
+                              {'Records': [get_stream_record('1', 'cmf-unittest-servers', 'server_id', '1')]}, None)
@@ -36,7 +36,13 @@ class LambdaItemCommonTest(unittest.TestCase):
             f'{os.environ["application"]}-{os.environ["environment"]}-pipeline_templates'
         self.pipeline_template_tasks_table_name = \
             f'{os.environ["application"]}-{os.environ["environment"]}-pipeline_template_tasks'
+        self.counters_table_name = f'{os.environ["application"]}-{os.environ["environment"]}-counters'
         test_common_utils.create_and_populate_schemas(self.ddb_client, self.schema_table_name)
+        test_common_utils.create_counters_table(self.ddb_client, self.counters_table_name)
+        import item_validation
+        item_validation.clear_schema_cache()
+        item_validation.name_index_ready_tables.clear()
+        item_validation.cmf_dynamodb.table_key_lookups.clear()
         test_common_utils.create_and_populate_apps(self.ddb_client, self.apps_table_name)
         self.apps_table = boto3.resource('dynamodb').Table(self.apps_table_name)
         self.pipeline_templates_table: Table = boto3.resource('dynamodb').Table(self.pipeline_templates_table_name)
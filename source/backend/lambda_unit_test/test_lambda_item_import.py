@@ -0,0 +1,397 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: Apache-2.0
+
+
+import io
+import json
+import unittest
+from importlib import reload
+from unittest import mock
+
+import boto3
+from moto import mock_aws
+
+import test_common_utils
+from test_common_utils import default_mock_os_environ, mock_get_mf_auth_policy_allow, \
+    mock_get_mf_auth_policy_default_deny
+
+mock_os_environ = {
+    **default_mock_os_environ,
+    'import_bucket': 'cmf-unittest-item-imports'
+}
+
+
+class MockContext:
+    def __init__(self, aws_request_id='worker-1', remaining_time_in_millis=900000):
+        self.aws_request_id = aws_request_id
+        self.function_name = 'cmf-unittest-item-import'
+        self.remaining_time_in_millis = remaining_time_in_millis
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_time_in_millis
+
+
+def get_items_response(body, status_code=None):
+    response = {'body': json.dumps(body)}
+    if status_code:
+        response['statusCode'] = status_code
+    return {'Payload': io.BytesIO(json.dumps(response).encode('utf-8'))}
+
+
+@mock.patch.dict('os.environ', mock_os_environ)
+@mock_aws
+class LambdaItemImportTest(unittest.TestCase):
+
+    @mock.patch.dict('os.environ', mock_os_environ)
+    def setUp(self) -> None:
+        self.ddb_client = boto3.client('dynamodb')
+        test_common_utils.create_and_populate_schemas(self.ddb_client, 'cmf-unittest-schema')
+        test_common_utils.create_counters_table(self.ddb_client, 'cmf-unittest-counters')
+        test_common_utils.create_import_jobs_table(self.ddb_client, 'cmf-unittest-import_jobs')
+        self.s3_client = boto3.client('s3')
+        self.s3_client.create_bucket(Bucket=mock_os_environ['import_bucket'])
+        import item_validation
+        item_validation.clear_schema_cache()
+        import lambda_item_import
+        reload(lambda_item_import)
+        self.lambda_item_import = lambda_item_import
+        self.import_jobs_table = boto3.resource('dynamodb').Table('cmf-unittest-import_jobs')
+        self.request_context = {'authorizer': {'claims': {'email': 'testuser@example.com'}}}
+        self.event_post = {
+            'httpMethod': 'POST',
+            'pathParameters': {'schema': 'app'},
+            'requestContext': self.request_context
+        }
+
+    def create_job(self, records, job_id='job-1', import_format='json'):
+        payload_key = f'imports/{job_id}.{import_format}'
+        self.import_jobs_table.put_item(Item={
+            'job_id': job_id,
+            'schema_name': 'app',
+            'status': 'awaiting_upload',
+            'format': import_format,
+            'payload_key': payload_key,
+            'records_processed': 0,
+            'records_created': 0,
+            'records_failed': 0,
+            'errors': [],
+            'request_context': self.request_context
+        })
+        self.s3_client.put_object(Bucket=mock_os_environ['import_bucket'], Key=payload_key,
+                                  Body=records if isinstance(records, str) else json.dumps(records))
+        return {'Records': [{'s3': {'object': {'key': payload_key}}}]}
+
+    @mock.patch('lambda_item_import.MFAuth.get_user_resource_creation_policy', new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_post(self):
+        response = self.lambda_item_import.lambda_handler(self.event_post, None)
+
+        body = json.loads(response['body'])
+        self.assertNotIn('statusCode', response)
+        self.assertIn('upload_url', body)
+        self.assertEqual('awaiting_upload', body['job']['status'])
+        self.assertEqual('testuser@example.com', body['job']['createdBy'])
+        self.assertNotIn('request_context', body['job'])
+        job = self.import_jobs_table.get_item(Key={'job_id': body['job']['job_id']})['Item']
+        self.assertEqual(f'imports/{job["job_id"]}.json', job['payload_key'])
+        self.assertEqual(self.request_context, job['request_context'])
+
+    @mock.patch('lambda_item_import.MFAuth.get_user_resource_creation_policy', new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_post_csv(self):
+        response = self.lambda_item_import.lambda_handler({**self.event_post, 'body': json.dumps({'format': 'csv'})},
+                                                          None)
+
+        job = json.loads(response['body'])['job']
+        self.assertEqual('csv', job['format'])
+        self.assertEqual(f'imports/{job["job_id"]}.csv', job['payload_key'])
+
+    @mock.patch('lambda_item_import.MFAuth.get_user_resource_creation_policy', new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_post_invalid_format(self):
+        response = self.lambda_item_import.lambda_handler({**self.event_post, 'body': json.dumps({'format': 'xml'})},
+                                                          None)
+
+        self.assertEqual(400, response['statusCode'])
+        self.assertEqual([], self.import_jobs_table.scan()['Items'])
+
+    @mock.patch('lambda_item_import.MFAuth.get_user_resource_creation_policy', new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_post_malformed_body(self):
+        response = self.lambda_item_import.lambda_handler({**self.event_post, 'body': 'INVALID JSON'}, None)
+
+        self.assertEqual(400, response['statusCode'])
+        self.assertEqual({'errors': ['malformed json input']}, json.loads(response['body']))
+        self.assertEqual([], self.import_jobs_table.scan()['Items'])
+
+    @mock.patch('lambda_item_import.MFAuth.get_user_resource_creation_policy',
+                new=mock_get_mf_auth_policy_default_deny)
+    def test_lambda_handler_post_not_authorized(self):
+        response = self.lambda_item_import.lambda_handler(self.event_post, None)
+
+        self.assertEqual(401, response['statusCode'])
+        self.assertEqual([], self.import_jobs_table.scan()['Items'])
+
+    def test_lambda_handler_invalid_schema(self):
+        response = self.lambda_item_import.lambda_handler({**self.event_post, 'pathParameters': {'schema': 'none'}},
+                                                          None)
+
+        self.assertEqual(400, response['statusCode'])
+
+    def test_lambda_handler_method_not_supported(self):
+        response = self.lambda_item_import.lambda_handler({**self.event_post, 'httpMethod': 'DELETE'}, None)
+
+        self.assertEqual(405, response['statusCode'])
+
+    def test_lambda_handler_get(self):
+        self.create_job([])
+        response = self.lambda_item_import.lambda_handler(
+            {'httpMethod': 'GET', 'pathParameters': {'schema': 'app', 'job_id': 'job-1'}}, None)
+
+        body = json.loads(response['body'])
+        self.assertEqual('job-1', body['job_id'])
+        self.assertNotIn('request_context', body)
+
+    def test_lambda_handler_get_not_found(self):
+        response = self.lambda_item_import.lambda_handler(
+            {'httpMethod': 'GET', 'pathParameters': {'schema': 'app', 'job_id': 'job-1'}}, None)
+
+        self.assertEqual(404, response['statusCode'])
+
+    def test_lambda_handler_upload_processes_job(self):
+        records = [{'app_name': f'app {index}'} for index in range(5)]
+        event = self.create_job(records)
+        items_responses = [
+            get_items_response({'newItems': records[0:2]}),
+            get_items_response({'newItems': records[2:3], 'errors': {'existing_name': ['app 3']}}),
+            get_items_response({'errors': ['Simulated error']}, 500)
+        ]
+
+        with mock.patch.object(self.lambda_item_import, 'IMPORT_CHUNK_SIZE', 2), \
+                mock.patch.object(self.lambda_item_import.lambda_client, 'invoke',
+                                  side_effect=items_responses) as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext())
+
+        self.assertEqual(3, mock_invoke.call_count)
+        items_event = json.loads(mock_invoke.call_args_list[0].kwargs['Payload'])
+        self.assertEqual('cmf-unittest-items', mock_invoke.call_args_list[0].kwargs['FunctionName'])
+        self.assertEqual(records[0:2], json.loads(items_event['body']))
+        self.assertEqual(self.request_context, items_event['requestContext'])
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('completed', job['status'])
+        self.assertEqual(5, job['records_total'])
+        self.assertEqual(5, job['records_processed'])
+        self.assertEqual(3, job['records_created'])
+        self.assertEqual(2, job['records_failed'])
+        self.assertEqual([{'records': '3-4', 'errors': {'existing_name': ['app 3']}},
+                          {'records': '5-5', 'errors': ['Simulated error']}], job['errors'])
+        self.assertIn('records_per_second', job)
+
+    def test_lambda_handler_upload_hands_over(self):
+        event = self.create_job([{'app_name': 'app 1'}])
+
+        with mock.patch.object(self.lambda_item_import.lambda_client, 'invoke') as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext(remaining_time_in_millis=1000))
+
+        mock_invoke.assert_called_once_with(FunctionName='cmf-unittest-item-import', InvocationType='Event',
+                                            Payload=json.dumps({'import_job_id': 'job-1', 'worker_id': 'worker-1'}))
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('in_progress', job['status'])
+        self.assertEqual(0, job['records_processed'])
+
+        with mock.patch.object(self.lambda_item_import.lambda_client, 'invoke',
+                               return_value=get_items_response({'newItems': [{'app_name': 'app 1'}]})):
+            self.lambda_item_import.lambda_handler({'import_job_id': 'job-1', 'worker_id': 'worker-1'},
+                                                   MockContext('worker-2'))
+
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('completed', job['status'])
+        self.assertEqual('worker-2', job['worker_id'])
+        self.assertEqual(1, job['records_created'])
+
+    def test_lambda_handler_upload_already_claimed(self):
+        event = self.create_job([{'app_name': 'app 1'}])
+        self.import_jobs_table.update_item(Key={'job_id': 'job-1'},
+                                           UpdateExpression='SET #status = :status, worker_id = :worker_id',
+                                           ExpressionAttributeNames={'#status': 'status'},
+                                           ExpressionAttributeValues={':status': 'in_progress',
+                                                                      ':worker_id': 'worker-1'})
+
+        with mock.patch.object(self.lambda_item_import.lambda_client, 'invoke') as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext('worker-2'))
+
+        mock_invoke.assert_not_called()
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('worker-1', job['worker_id'])
+
+    def test_lambda_handler_upload_invalid_payload(self):
+        event = self.create_job('"not a list"')
+
+        with mock.patch.object(self.lambda_item_import.lambda_client, 'invoke') as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext())
+
+        mock_invoke.assert_not_called()
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('failed', job['status'])
+        self.assertEqual([{'errors': ['The import payload must be a JSON list of items.']}], job['errors'])
+
+    def test_lambda_handler_upload_csv(self):
+        event = self.create_job('\ufeff[app]app_name,unknown,app_id\r\napp 1,x,\r\n"app\n2",y,2\r\n,z,\r\napp 3,,\r\n',
+                                import_format='csv')
+
+        with mock.patch.object(self.lambda_item_import, 'IMPORT_CHUNK_SIZE', 2), \
+                mock.patch.object(self.lambda_item_import.lambda_client, 'invoke',
+                                  side_effect=[get_items_response({'newItems': [{}, {}]}),
+                                               get_items_response({'newItems': [{}]})]) as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext())
+
+        chunks = [json.loads(json.loads(call.kwargs['Payload'])['body']) for call in mock_invoke.call_args_list]
+        self.assertEqual([[{'app_name': 'app 1'}, {'app_name': 'app\n2', 'app_id': '2'}], [{'app_name': 'app 3'}]],
+                         chunks)
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('completed', job['status'])
+        self.assertEqual(3, job['records_total'])
+
+    def test_lambda_handler_upload_csv_no_attributes(self):
+        event = self.create_job('name,description\r\napp 1,x\r\n', import_format='csv')
+
+        with mock.patch.object(self.lambda_item_import.lambda_client, 'invoke') as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext())
+
+        mock_invoke.assert_not_called()
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('failed', job['status'])
+
+    def test_lambda_handler_upload_ndjson_resumes(self):
+        event = self.create_job('{"app_name": "app 1"}\n\n{"app_name": "app 2"}\n{"app_name": "app 3"}\n',
+                                import_format='ndjson')
+        self.import_jobs_table.update_item(Key={'job_id': 'job-1'}, UpdateExpression='SET records_processed = :one',
+                                           ExpressionAttributeValues={':one': 1})
+
+        with mock.patch.object(self.lambda_item_import.lambda_client, 'invoke',
+                               return_value=get_items_response({'newItems': [{}, {}]})) as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext())
+
+        items_event = json.loads(mock_invoke.call_args.kwargs['Payload'])
+        self.assertEqual([{'app_name': 'app 2'}, {'app_name': 'app 3'}], json.loads(items_event['body']))
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual(3, job['records_processed'])
+        self.assertEqual(2, job['records_created'])
+
+    def test_lambda_handler_upload_skips_interrupted_chunk(self):
+        records = [{'app_name': f'app {index}'} for index in range(5)]
+        event = self.create_job(records)
+
+        # the worker stops while the second chunk is being imported.
+        with mock.patch.object(self.lambda_item_import, 'IMPORT_CHUNK_SIZE', 2), \
+                mock.patch.object(self.lambda_item_import.lambda_client, 'invoke',
+                                  side_effect=[get_items_response({'newItems': records[0:2]}),
+                                               SystemExit('Lambda timed out')]):
+            with self.assertRaises(SystemExit):
+                self.lambda_item_import.lambda_handler(event, MockContext())
+
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual(2, job['records_processed'])
+        self.assertEqual(2, job['records_in_progress'])
+
+        # the retry of the invocation skips the interrupted chunk instead of creating its records twice.
+        with mock.patch.object(self.lambda_item_import, 'IMPORT_CHUNK_SIZE', 2), \
+                mock.patch.object(self.lambda_item_import.lambda_client, 'invoke',
+                                  return_value=get_items_response({'newItems': records[4:5]})) as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext())
+
+        mock_invoke.assert_called_once()
+        self.assertEqual(records[4:5], json.loads(json.loads(mock_invoke.call_args.kwargs['Payload'])['body']))
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('completed', job['status'])
+        self.assertEqual(5, job['records_processed'])
+        self.assertEqual(3, job['records_created'])
+        self.assertEqual(2, job['records_failed'])
+        self.assertNotIn('records_in_progress', job)
+        self.assertEqual([{'records': '3-4', 'errors': [self.lambda_item_import.INTERRUPTED_CHUNK_MESSAGE]}],
+                         job['errors'])
+
+    def test_lambda_handler_upload_csv_resumes_from_offset(self):
+        header = '\ufeff[app]app_name,app_id\r\n'
+        rows = ['app 1,1\r\n', '"app\n2",2\r\n', 'app 3,3\r\n', 'app 4,4\r\n', 'app 5,5\r\n']
+        event = self.create_job(header + ''.join(rows), import_format='csv')
+
+        # the worker stops while the second chunk is being imported.
+        with mock.patch.object(self.lambda_item_import, 'IMPORT_CHUNK_SIZE', 2), \
+                mock.patch.object(self.lambda_item_import.lambda_client, 'invoke',
+                                  side_effect=[get_items_response({'newItems': [{}, {}]}),
+                                               SystemExit('Lambda timed out')]):
+            with self.assertRaises(SystemExit):
+                self.lambda_item_import.lambda_handler(event, MockContext())
+
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        payload_offset = len((header + rows[0] + rows[1]).encode('utf-8'))
+        self.assertEqual(payload_offset, job['payload_offset'])
+        self.assertEqual(4, job['payload_line'])
+
+        # the retry reads the payload from the end of the first chunk only, after reading its header line.
+        with mock.patch.object(self.lambda_item_import, 'IMPORT_CHUNK_SIZE', 2), \
+                mock.patch.object(self.lambda_item_import.lambda_client, 'invoke',
+                                  return_value=get_items_response({'newItems': [{}]})) as mock_invoke, \
+                mock.patch.object(self.lambda_item_import.s3_client, 'get_object',
+                                  wraps=self.lambda_item_import.s3_client.get_object) as mock_get_object:
+            self.lambda_item_import.lambda_handler(event, MockContext())
+
+        self.assertEqual([{'app_name': 'app 5', 'app_id': '5'}],
+                         json.loads(json.loads(mock_invoke.call_args.kwargs['Payload'])['body']))
+        self.assertEqual([f'bytes={payload_offset}-'],
+                         [call.kwargs['Range'] for call in mock_get_object.call_args_list if 'Range' in call.kwargs])
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('completed', job['status'])
+        self.assertEqual(5, job['records_total'])
+        self.assertEqual(len((header + ''.join(rows)).encode('utf-8')), job['payload_offset'])
+        self.assertEqual(7, job['payload_line'])
+
+    def test_lambda_handler_upload_ndjson_resumes_at_end(self):
+        payload = '{"app_name": "app 1"}\n{"app_name": "app 2"}\n'
+        event = self.create_job(payload, import_format='ndjson')
+        # the previous worker stopped after recording the progress of the last chunk.
+        self.import_jobs_table.update_item(
+            Key={'job_id': 'job-1'}, UpdateExpression='SET records_processed = :two, payload_offset = :offset',
+            ExpressionAttributeValues={':two': 2, ':offset': len(payload)})
+
+        with mock.patch.object(self.lambda_item_import.lambda_client, 'invoke') as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext())
+
+        mock_invoke.assert_not_called()
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('completed', job['status'])
+        self.assertEqual(2, job['records_total'])
+
+    def test_lambda_handler_upload_json_too_large(self):
+        event = self.create_job([{'app_name': 'app 1'}])
+
+        with mock.patch.object(self.lambda_item_import, 'IMPORT_MAX_JSON_PAYLOAD_BYTES', 10), \
+                mock.patch.object(self.lambda_item_import.lambda_client, 'invoke') as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext())
+
+        mock_invoke.assert_not_called()
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('failed', job['status'])
+        self.assertEqual([{'errors': ['JSON import payloads are limited to 10 bytes, import larger payloads in the '
+                                      'ndjson format.']}], job['errors'])
+
+    def test_lambda_handler_upload_ndjson_invalid_line(self):
+        event = self.create_job('{"app_name": "app 1"}\n["app 2"]\n', import_format='ndjson')
+
+        with mock.patch.object(self.lambda_item_import.lambda_client, 'invoke') as mock_invoke:
+            self.lambda_item_import.lambda_handler(event, MockContext())
+
+        mock_invoke.assert_not_called()
+        job = self.import_jobs_table.get_item(Key={'job_id': 'job-1'})['Item']
+        self.assertEqual('failed', job['status'])
+        self.assertEqual([{'errors': ['Line 2 of the import payload is not a JSON object.']}], job['errors'])
+
+    def test_convert_csv_value(self):
+        convert_csv_value = self.lambda_item_import.convert_csv_value
+        self.assertEqual('a;b', convert_csv_value({'type': 'string'}, 'a;b'))
+        self.assertEqual(['a', 'b'], convert_csv_value({'type': 'multivalue-string'}, 'a;b'))
+        self.assertEqual(['a', 'b'], convert_csv_value({'type': 'list', 'listMultiSelect': True}, 'a;b'))
+        self.assertEqual('a', convert_csv_value({'type': 'list'}, 'a'))
+        self.assertEqual(['1', '2'], convert_csv_value({'type': 'relationship', 'listMultiSelect': True}, '1;2'))
+        self.assertEqual([{'key': 'a', 'value': '1'}, {'key': 'b', 'value': ''}],
+                         convert_csv_value({'type': 'tag'}, 'a=1;b=;'))
+        self.assertEqual([], convert_csv_value({'type': 'tag'}, ';'))
+        self.assertTrue(convert_csv_value({'type': 'checkbox'}, ' TRUE '))
+        self.assertFalse(convert_csv_value({'type': 'checkbox'}, 'no'))
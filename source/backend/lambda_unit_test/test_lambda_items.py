@@ -3,7 +3,6 @@
 
 
 import json
-from time import sleep
 from unittest import mock
 
 from moto import mock_aws
@@ -17,7 +16,7 @@ def mock_scan_dynamodb_data_table(table):
     return table.scan(Limit=5)['Items']
 
 
-def mock_scan_dynamodb_data_table_error(table):
+def mock_get_existing_item_name_ids_error(data_table, schema_name, names):
     raise Exception('Simulated Error')
 
 
@@ -26,6 +25,23 @@ def mock_get_relationship_data(attribute_names, attributes):
     return []
 
 
+def mock_batch_write_item_unprocessed(RequestItems):
+    return {
+        'UnprocessedItems': RequestItems,
+        'ResponseMetadata': {'HTTPStatusCode': 200}
+    }
+
+
+def mock_get_user_attribute_policy_allow(obj, event, schema, attribute_names=None):
+    logger.debug(f'mock_get_user_attribute_policy_allow({obj}, {event}, {schema}, {attribute_names})')
+    return {'action': 'allow', 'user': 'testuser@example.com'}
+
+
+def mock_get_user_attribute_policy_deny(obj, event, schema, attribute_names=None):
+    logger.debug(f'mock_get_user_attribute_policy_deny({obj}, {event}, {schema}, {attribute_names})')
+    return {'action': 'deny', 'cause': 'You do not have permission to update attributes : app_name'}
+
+
 @mock.patch.dict('os.environ', mock_os_environ)
 @mock_aws
 class LambdaItemsTest(LambdaItemCommonTest):
@@ -173,6 +189,8 @@ class LambdaItemsTest(LambdaItemCommonTest):
         self.assertTrue('errors' not in response)
         new_item_response = json.loads(response['body'])['newItems'][0]
         updated_item_db = self.apps_table.get_item(Key={'app_id': '3'})['Item']
+        # the lowercased name is stored but not returned.
+        self.assertEqual('app number 3', updated_item_db.pop('_name_lower'))
         self.assertEqual(new_item_response, updated_item_db)
         self.assertEqual('App Number 3', updated_item_db['app_name'])
         self.assertEqual('new test attribute', updated_item_db['new_attr'])
@@ -203,7 +221,8 @@ class LambdaItemsTest(LambdaItemCommonTest):
     def test_lambda_handler_get_success(self):
         import lambda_items
         response = lambda_items.lambda_handler(self.event_get, None)
-        self.assertEqual(lambda_items.default_http_headers, response['headers'])
+        self.assertEqual({**lambda_items.default_http_headers, **lambda_items.ETAG_HTTP_HEADERS,
+                          'ETag': mock.ANY}, response['headers'])
         self.assertTrue('statusCode' not in response)
         items = json.loads(response['body'])
         print(items)
@@ -211,6 +230,237 @@ class LambdaItemsTest(LambdaItemCommonTest):
         self.assertEqual(['OFBiz', 'Wordpress'], [item['app_name'] for item in items])
         self.assert_no_new_items_added()
 
+    def get_items_event(self, query_parameters):
+        return {**self.event_get, 'queryStringParameters': query_parameters}
+
+    def test_lambda_handler_get_pages(self):
+        import lambda_items
+        response = lambda_items.lambda_handler(self.get_items_event({'limit': '1'}), None)
+        body = json.loads(response['body'])
+        self.assertEqual(1, len(body['items']))
+        self.assertIsNotNone(body['nextCursor'])
+
+        response = lambda_items.lambda_handler(
+            self.get_items_event({'limit': '5', 'cursor': body['nextCursor']}), None)
+        next_body = json.loads(response['body'])
+        self.assertEqual(1, len(next_body['items']))
+        self.assertIsNone(next_body['nextCursor'])
+        self.assertEqual({'OFBiz', 'Wordpress'},
+                         {item['app_name'] for item in body['items'] + next_body['items']})
+
+    def test_lambda_handler_get_fields(self):
+        import lambda_items
+        response = lambda_items.lambda_handler(self.get_items_event({'fields': 'app_name'}), None)
+        items = json.loads(response['body'])
+        self.assertEqual(['OFBiz', 'Wordpress'], [item['app_name'] for item in items])
+        for item in items:
+            self.assertEqual({'app_id', 'app_name'}, set(item.keys()))
+
+    def test_lambda_handler_get_unsorted_pages(self):
+        import lambda_items
+        pages = [[{'app_id': '2', 'app_name': 'Wordpress'}], [{'app_id': '1', 'app_name': 'OFBiz'}]]
+        with mock.patch('lambda_items.item_validation.iterate_dynamodb_data_table',
+                        return_value=iter(pages)) as mock_iterate:
+            response = lambda_items.lambda_handler(self.get_items_event({'sort': 'none'}), None)
+            mock_iterate.assert_called_once()
+        # the pages are encoded in the order they are read.
+        self.assertEqual(['Wordpress', 'OFBiz'], [item['app_name'] for item in json.loads(response['body'])])
+
+        name_filter = [{'attribute': 'app_id', 'comparator': 'in', 'value': ['1', '2']}]
+        response = lambda_items.lambda_handler(
+            self.get_items_event({'sort': 'none', 'filter': json.dumps(name_filter)}), None)
+        self.assertEqual({'OFBiz', 'Wordpress'}, {item['app_name'] for item in json.loads(response['body'])})
+
+    def test_lambda_handler_get_removes_internal_attributes(self):
+        import lambda_items
+        self.apps_table.update_item(Key={'app_id': '1'}, UpdateExpression='SET #name_lower = :name_lower',
+                                    ExpressionAttributeNames={'#name_lower': '_name_lower'},
+                                    ExpressionAttributeValues={':name_lower': 'wordpress'})
+
+        items = json.loads(lambda_items.lambda_handler(self.event_get, None)['body'])
+        self.assertEqual(['OFBiz', 'Wordpress'], [item['app_name'] for item in items])
+        body = json.loads(lambda_items.lambda_handler(self.get_items_event({'limit': '10'}), None)['body'])
+        for item in items + body['items']:
+            self.assertNotIn('_name_lower', item)
+
+    def test_lambda_handler_get_filter(self):
+        import lambda_items
+        app_filter = [{'attribute': 'app_id', 'comparator': 'in', 'value': ['1', '2']},
+                      {'attribute': 'app_name', 'comparator': 'begins_with', 'value': 'Word'}]
+        response = lambda_items.lambda_handler(self.get_items_event({'filter': json.dumps(app_filter)}), None)
+        self.assertEqual(['Wordpress'], [item['app_name'] for item in json.loads(response['body'])])
+
+        name_filter = [{'attribute': 'app_name', 'comparator': 'eq', 'value': 'OFBiz'}]
+        response = lambda_items.lambda_handler(
+            self.get_items_event({'filter': json.dumps(name_filter), 'limit': '10'}), None)
+        self.assertEqual(['OFBiz'], [item['app_name'] for item in json.loads(response['body'])['items']])
+
+        id_filter = [{'attribute': 'app_id', 'comparator': 'eq', 'value': '1'}]
+        response = lambda_items.lambda_handler(
+            self.get_items_event({'filter': json.dumps(id_filter), 'limit': '10'}), None)
+        self.assertEqual(['1'], [item['app_id'] for item in json.loads(response['body'])['items']])
+
+    @mock.patch('lambda_items.item_validation.check_valid_item_create',
+                new=mock_item_check_valid_item_create_valid)
+    @mock.patch('lambda_item.item_validation.get_relationship_data',
+                new=mock_get_relationship_data)
+    @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
+                new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_get_not_modified(self):
+        import lambda_items
+        response = lambda_items.lambda_handler(self.get_items_event({'fields': 'app_name'}), None)
+        etag = response['headers']['ETag']
+        event_if_none_match = {**self.get_items_event({'fields': 'app_name'}), 'headers': {'If-None-Match': etag}}
+
+        with mock.patch.object(lambda_items, 'get_all_item_pages') as mock_get_all_item_pages:
+            response = lambda_items.lambda_handler(event_if_none_match, None)
+            mock_get_all_item_pages.assert_not_called()
+        self.assertEqual(304, response['statusCode'])
+        self.assertEqual(etag, response['headers']['ETag'])
+
+        # listings can be sent compressed, so the ETag is weak and also matches when sent as a strong ETag.
+        self.assertTrue(etag.startswith('W/"'))
+        response = lambda_items.lambda_handler(
+            {**event_if_none_match, 'headers': {'If-None-Match': etag.removeprefix('W/')}}, None)
+        self.assertEqual(304, response['statusCode'])
+
+        # the ETag depends on the query string parameters.
+        response = lambda_items.lambda_handler({**event_if_none_match, 'queryStringParameters': None}, None)
+        self.assertNotIn('statusCode', response)
+        self.assertNotEqual(etag, response['headers']['ETag'])
+
+        # writes invalidate the ETag.
+        lambda_items.lambda_handler({**self.event_post, 'body': json.dumps({'app_name': 'App Number 3'})}, None)
+        response = lambda_items.lambda_handler(event_if_none_match, None)
+        self.assertNotIn('statusCode', response)
+        self.assertEqual(3, len(json.loads(response['body'])))
+
+    @mock.patch('lambda_items.item_validation.check_valid_item_create',
+                new=mock_item_check_valid_item_create_valid)
+    @mock.patch('lambda_item.item_validation.get_relationship_data',
+                new=mock_get_relationship_data)
+    @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
+                new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_items_version(self):
+        import lambda_items
+        import cmf_counters
+
+        # rejected requests do not change the items version.
+        lambda_items.lambda_handler({**self.event_post, 'body': 'not json'}, None)
+        lambda_items.lambda_handler({**self.event_post, 'body': json.dumps({'app_name': 'Wordpress'})}, None)
+        self.assertEqual(0, cmf_counters.get_counter('items_version_app'))
+
+        lambda_items.lambda_handler({**self.event_post, 'body': json.dumps({'app_name': 'App Number 3'})}, None)
+        self.assertEqual(1, cmf_counters.get_counter('items_version_app'))
+
+        # the items have been written when the version is incremented, so a failure is only logged.
+        with mock.patch('lambda_items.cmf_counters.increment_items_version', side_effect=Exception('throttled')):
+            response = lambda_items.lambda_handler(
+                {**self.event_post, 'body': json.dumps({'app_name': 'App Number 4'})}, None)
+        self.assertNotIn('statusCode', response)
+        self.assertEqual(1, len(json.loads(response['body'])['newItems']))
+
+    @mock.patch('lambda_items.item_validation.check_valid_item_create',
+                new=mock_item_check_valid_item_create_valid)
+    @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
+                new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_get_after_write_change_log_schema(self):
+        import lambda_items
+        import test_common_utils
+        servers_table_name = f'{mock_os_environ["application"]}-{mock_os_environ["environment"]}-servers'
+        test_common_utils.create_and_populate_servers(self.ddb_client, servers_table_name)
+        event_get = {**self.event_get, 'pathParameters': {'schema': 'server'}}
+        response = lambda_items.lambda_handler(event_get, None)
+        etag = response['headers']['ETag']
+        server_count = len(json.loads(response['body']))
+
+        # server items are also versioned by their stream, but a listing requested right after the write response
+        # must not be answered as not modified.
+        lambda_items.lambda_handler({**self.event_post, 'pathParameters': {'schema': 'server'},
+                                     'body': json.dumps({'server_name': 'server99', 'app_id': '1'})}, None)
+        response = lambda_items.lambda_handler({**event_get, 'headers': {'If-None-Match': etag}}, None)
+        self.assertNotIn('statusCode', response)
+        self.assertNotEqual(etag, response['headers']['ETag'])
+        self.assertEqual(server_count + 1, len(json.loads(response['body'])))
+
+    def test_lambda_handler_get_filter_without_etag(self):
+        import lambda_items
+        name_filter = [{'attribute': 'app_name', 'comparator': 'eq', 'value': 'OFBiz'}]
+        response = lambda_items.lambda_handler(self.get_items_event({'filter': json.dumps(name_filter)}), None)
+        self.assertEqual(lambda_items.default_http_headers, response['headers'])
+
+    def test_lambda_handler_get_invalid_parameters(self):
+        import lambda_items
+        for query_parameters in [{'limit': 'ten'}, {'limit': '0'}, {'limit': '100000'}, {'cursor': 'not a cursor'},
+                                 {'cursor': lambda_items.encode_cursor({'app_id': 1})},
+                                 {'cursor': lambda_items.encode_cursor({'app_id': '1', 'app_name': 'Wordpress'})},
+                                 {'filter': 'app_id=1'}, {'filter': json.dumps([{'attribute': 'app_id'}])},
+                                 {'sort': 'app_id'}]:
+            response = lambda_items.lambda_handler(self.get_items_event(query_parameters), None)
+            self.assertEqual(400, response['statusCode'])
+            self.assertEqual(1, len(json.loads(response['body'])['errors']))
+
+    def test_lambda_handler_get_modified_since(self):
+        import lambda_items
+        import test_common_utils
+        item_changes_table_name = f'{mock_os_environ["application"]}-{mock_os_environ["environment"]}-item_changes'
+        test_common_utils.create_item_changes_table(self.ddb_client, item_changes_table_name)
+        with mock.patch('lambda_items.cmf_item_changes.CHANGE_LOG_SCHEMAS', ['app']):
+            response = lambda_items.lambda_handler(self.get_items_event({'modifiedSince': '2100-01-01T00:00:00Z'}),
+                                                   None)
+            body = json.loads(response['body'])
+            self.assertEqual([], body['items'])
+            self.assertEqual([], body['deleted'])
+            sync_timestamp = body['syncTimestamp']
+
+            # app 3 was modified, then deleted before the sync, and is reported as deleted.
+            lambda_items.cmf_item_changes.record_stream_changes('app', [
+                {'eventID': str(index), 'eventName': event_name, 'dynamodb': {'Keys': {'app_id': {'S': app_id}}}}
+                for index, (event_name, app_id) in enumerate([('MODIFY', '1'), ('REMOVE', '4'), ('INSERT', '3')])])
+            response = lambda_items.lambda_handler(
+                self.get_items_event({'modifiedSince': sync_timestamp, 'fields': 'app_name'}), None)
+            body = json.loads(response['body'])
+            self.assertEqual([{'app_id': '1', 'app_name': 'Wordpress'}], body['items'])
+            self.assertEqual(['3', '4'], body['deleted'])
+            self.assertGreater(body['syncTimestamp'], sync_timestamp)
+
+    def test_lambda_handler_get_modified_since_invalid(self):
+        import lambda_items
+        response = lambda_items.lambda_handler(self.get_items_event({'modifiedSince': '2024-01-01T00:00:00Z'}), None)
+        self.assertEqual(400, response['statusCode'])
+        self.assertEqual(['modifiedSince is not supported for app items'], json.loads(response['body'])['errors'])
+
+        with mock.patch('lambda_items.cmf_item_changes.CHANGE_LOG_SCHEMAS', ['app']):
+            for query_parameters in [{'modifiedSince': 'yesterday'},
+                                     {'modifiedSince': '2000-01-01T00:00:00Z'},
+                                     {'modifiedSince': '2100-01-01T00:00:00Z', 'limit': '10'}]:
+                response = lambda_items.lambda_handler(self.get_items_event(query_parameters), None)
+                self.assertEqual(400, response['statusCode'])
+                self.assertEqual(1, len(json.loads(response['body'])['errors']))
+
+    def test_get_schema_cached_until_schema_version_changes(self):
+        import item_validation
+        import cmf_counters
+        schema = item_validation.get_schema('app')
+        self.assertEqual('app', schema['schema_name'])
+
+        # update the stored schema without bumping the version, cached copy is still served.
+        self.ddb_client.put_item(TableName=self.schema_table_name,
+                                 Item={'schema_name': {'S': 'app'}, 'schema_type': {'S': 'user'},
+                                       'attributes': {'L': []}})
+        with mock.patch('item_validation.cmf_counters.get_counter') as mock_get_counter:
+            self.assertEqual(schema, item_validation.get_schema('app'))
+            mock_get_counter.assert_not_called()
+
+        # expired entry with unchanged version is extended without reloading the schema.
+        item_validation.schema_cache['app']['expires'] = 0
+        self.assertEqual(schema, item_validation.get_schema('app'))
+
+        # expired entry with a new version is reloaded.
+        cmf_counters.increment_counter(cmf_counters.SCHEMA_VERSION_COUNTER)
+        item_validation.schema_cache['app']['expires'] = 0
+        self.assertEqual([], item_validation.get_schema('app')['attributes'])
+
     @mock.patch('lambda_item.MFAuth.get_user_resource_creation_policy',
                 new=mock_get_mf_auth_policy_default_deny)
     def test_lambda_handler_post_not_authorized(self):
@@ -274,6 +524,8 @@ class LambdaItemsTest(LambdaItemCommonTest):
         new_items_response = sorted(json.loads(response['body'])['newItems'], key=lambda item: item['app_id'])
         updated_item1_db = self.apps_table.get_item(Key={'app_id': '3'})['Item']
         updated_item2_db = self.apps_table.get_item(Key={'app_id': '4'})['Item']
+        self.assertEqual('app number 3', updated_item1_db.pop('_name_lower'))
+        self.assertEqual('app number 4', updated_item2_db.pop('_name_lower'))
         self.assertEqual(new_items_response, [updated_item1_db, updated_item2_db])
         self.assertEqual('App Number 3', updated_item1_db['app_name'])
         self.assertEqual('App Number 4', updated_item2_db['app_name'])
@@ -368,35 +620,24 @@ class LambdaItemsTest(LambdaItemCommonTest):
                 new=mock_scan_dynamodb_data_table)
     @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
                 new=mock_get_mf_auth_policy_allow)
-    @mock.patch('lambda_items.sleep',
-                new=lambda x: sleep(0))
+    @mock.patch('cmf_dynamodb.time.sleep')
     @mock.patch('lambda_items.client_ddb.batch_write_item')
-    def test_lambda_handler_put_batch_write_2errors_then_success(self, mock_batch_write_item):
+    def test_lambda_handler_put_batch_write_2errors_then_success(self, mock_batch_write_item, mock_sleep):
         import lambda_items
-        mock_batch_write_item.side_effect = [
-            {
-                'UnprocessedItems': [{'PutRequest': {'Item': {'id': 'item1'}}}],
-                'ResponseMetadata': {'HTTPStatusCode': 200}
-            },
-            {
-                'UnprocessedItems': [{'PutRequest': {'Item': {'id': 'item1'}}}],
-                'ResponseMetadata': {'HTTPStatusCode': 200}
-            },
-            {
-                'UnprocessedItems': [],
-                'ResponseMetadata': {'HTTPStatusCode': 200}
-            }
-        ]
+        mock_batch_write_item.side_effect = lambda RequestItems: mock_batch_write_item_unprocessed(
+            RequestItems if mock_batch_write_item.call_count <= 2 else {})
         response = lambda_items.lambda_handler(self.event_post, None)
         self.assertEqual(lambda_items.default_http_headers, response['headers'])
         self.assertTrue('statusCode' not in response)
+        self.assertTrue('errors' not in json.loads(response['body']))
         new_item_response = json.loads(response['body'])['newItems'][0]
-        self.assertEqual(new_item_response, new_item_response)
         self.assertEqual('App Number 3', new_item_response['app_name'])
         self.assertEqual('new test attribute', new_item_response['new_attr'])
         self.assertEqual('', new_item_response['description'])
         self.assertEqual([''], new_item_response['tags'])
         self.assertEqual(2, len(new_item_response['_history'].keys()))
+        self.assertEqual(3, mock_batch_write_item.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
         self.assert_no_new_items_added()
 
     @mock.patch('lambda_items.item_validation.check_valid_item_create',
@@ -407,46 +648,28 @@ class LambdaItemsTest(LambdaItemCommonTest):
                 new=mock_scan_dynamodb_data_table)
     @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
                 new=mock_get_mf_auth_policy_allow)
-    @mock.patch('lambda_items.sleep',
-                new=lambda x: sleep(0))
+    @mock.patch('cmf_dynamodb.time.sleep')
     @mock.patch('lambda_items.client_ddb.batch_write_item')
-    def test_lambda_handler_put_batch_write_http_status_500(self, mock_batch_write_item):
+    def test_lambda_handler_put_batch_write_unprocessed_after_retries(self, mock_batch_write_item, mock_sleep):
         import lambda_items
-        mock_batch_write_item.side_effect = [
-            {
-                'UnprocessedItems': [{'PutRequest': {'Item': {'id': 'item1'}}}],
-                'ResponseMetadata': {'HTTPStatusCode': 500}
-            },
-            {
-                'UnprocessedItems': [{'PutRequest': {'Item': {'id': 'item1'}}}],
-                'ResponseMetadata': {'HTTPStatusCode': 500}
-            },
-            {
-                'UnprocessedItems': [],
-                'ResponseMetadata': {'HTTPStatusCode': 500}
-            }
-        ]
-        # even if you return 500, the loop doesn't exit unless UnprocessedItems is empty, so the code for list of
-        # unprocessed items is never executed
+        import cmf_dynamodb
+        mock_batch_write_item.side_effect = mock_batch_write_item_unprocessed
         response = lambda_items.lambda_handler(self.event_post, None)
-        print(response)
         self.assertEqual(lambda_items.default_http_headers, response['headers'])
         self.assertTrue('statusCode' not in response)
-        new_item_response = json.loads(response['body'])['newItems'][0]
-        self.assertEqual(new_item_response, new_item_response)
-        self.assertEqual('App Number 3', new_item_response['app_name'])
-        self.assertEqual('new test attribute', new_item_response['new_attr'])
-        self.assertEqual('', new_item_response['description'])
-        self.assertEqual([''], new_item_response['tags'])
-        self.assertEqual(2, len(new_item_response['_history'].keys()))
+        body = json.loads(response['body'])
+        self.assertEqual([], body['newItems'])
+        self.assertEqual({'unprocessed_items': ['App Number 3']}, body['errors'])
+        self.assertEqual(cmf_dynamodb.BATCH_WRITE_MAX_RETRIES + 1, mock_batch_write_item.call_count)
+        self.assertEqual(cmf_dynamodb.BATCH_WRITE_MAX_RETRIES, mock_sleep.call_count)
         self.assert_no_new_items_added()
 
     @mock.patch('lambda_items.item_validation.check_valid_item_create',
                 new=mock_item_check_valid_item_create_valid)
     @mock.patch('lambda_item.item_validation.get_relationship_data',
                 new=mock_get_relationship_data)
-    @mock.patch('lambda_item.item_validation.scan_dynamodb_data_table',
-                new=mock_scan_dynamodb_data_table_error)
+    @mock.patch('lambda_item.item_validation.get_existing_item_name_ids',
+                new=mock_get_existing_item_name_ids_error)
     @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
                 new=mock_get_mf_auth_policy_allow_no_user)
     def test_lambda_handler_put_unhandled_exception(self):
@@ -487,3 +710,304 @@ class LambdaItemsTest(LambdaItemCommonTest):
 
         self.assertEqual({"validation_errors": [{"App Number 3": ["Invalid Id format: notanumber"]}]},
                          response_errors)
+
+    def test_reserve_item_ids_seeds_counter_from_existing_ids(self):
+        import lambda_items
+        self.assertEqual(3, lambda_items.reserve_item_ids(self.apps_table, 'app', 2))
+        # counter is seeded once, subsequent reservations continue from the end of the previous block.
+        with mock.patch('lambda_items.seed_item_id_counter') as mock_seed:
+            self.assertEqual(5, lambda_items.reserve_item_ids(self.apps_table, 'app', 1))
+            mock_seed.assert_not_called()
+
+    @mock.patch('lambda_items.item_validation.check_valid_item_create',
+                new=mock_item_check_valid_item_create_valid)
+    @mock.patch('lambda_item.item_validation.get_relationship_data',
+                new=mock_get_relationship_data)
+    @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
+                new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_post_provided_id_raises_counter(self):
+        import lambda_items
+        import cmf_counters
+        cmf_counters.seed_counter('app_id', 2)
+        event = {**self.event_post_app_id_provided_valid}
+        event['body'] = json.dumps({**json.loads(event['body']), '__app_id': '10'})
+        lambda_items.lambda_handler(event, None)
+        self.assertEqual(10, cmf_counters.get_counter('app_id'))
+        event['body'] = json.dumps([{'app_name': 'App Number 5'}, {'app_name': 'App Number 6'}])
+        response = lambda_items.lambda_handler(event, None)
+        new_item_ids = sorted(item['app_id'] for item in json.loads(response['body'])['newItems'])
+        self.assertEqual(['11', '12'], new_item_ids)
+
+    def add_apps_name_index(self):
+        self.ddb_client.update_table(
+            TableName=self.apps_table_name,
+            AttributeDefinitions=[{'AttributeName': '_name_lower', 'AttributeType': 'S'}],
+            GlobalSecondaryIndexUpdates=[{
+                'Create': {
+                    'IndexName': '_name_lower-index',
+                    'KeySchema': [{'AttributeName': '_name_lower', 'KeyType': 'HASH'}],
+                    'Projection': {'ProjectionType': 'KEYS_ONLY'}
+                }
+            }]
+        )
+
+    def test_get_existing_item_name_ids_without_index(self):
+        import item_validation
+        self.assertEqual({'wordpress': {'1'}},
+                         item_validation.get_existing_item_name_ids(self.apps_table, 'app', ['WORDPRESS', 'new app']))
+        self.assertEqual({}, item_validation.get_existing_item_name_ids(self.apps_table, 'app', []))
+
+    def test_get_existing_item_name_ids_backfills_and_queries_index(self):
+        import item_validation
+        import cmf_counters
+        self.add_apps_name_index()
+
+        # lookups scan the table until it has been backfilled, without writing to it.
+        self.assertEqual({'ofbiz': {'2'}},
+                         item_validation.get_existing_item_name_ids(self.apps_table, 'app', ['OFBiz']))
+        self.assertEqual(0, cmf_counters.get_counter('app_name_lower_backfill'))
+        self.assertNotIn('_name_lower', self.apps_table.get_item(Key={'app_id': '1'})['Item'])
+
+        self.assertTrue(item_validation.backfill_item_names_lower(self.apps_table, 'app'))
+        self.assertEqual(1, cmf_counters.get_counter('app_name_lower_backfill'))
+        self.assertEqual('wordpress', self.apps_table.get_item(Key={'app_id': '1'})['Item']['_name_lower'])
+
+        # subsequent lookups query the index instead of scanning the table.
+        with mock.patch.object(self.apps_table, 'scan') as mock_scan:
+            self.assertEqual({'wordpress': {'1'}, 'ofbiz': {'2'}},
+                             item_validation.get_existing_item_name_ids(self.apps_table, 'app',
+                                                                        ['wordPress', 'ofbiz', 'new app']))
+            mock_scan.assert_not_called()
+
+    def test_backfill_item_names_lower_interrupted(self):
+        import item_validation
+        import cmf_counters
+        self.add_apps_name_index()
+
+        self.assertFalse(item_validation.backfill_item_names_lower(self.apps_table, 'app', should_stop=lambda: True))
+        self.assertEqual(0, cmf_counters.get_counter('app_name_lower_backfill'))
+
+        # a completed backfill is not run again.
+        cmf_counters.seed_counter('app_name_lower_backfill', 1)
+        with mock.patch.object(item_validation, 'iterate_dynamodb_data_table') as mock_iterate:
+            self.assertTrue(item_validation.backfill_item_names_lower(self.apps_table, 'app'))
+            mock_iterate.assert_not_called()
+
+    @mock.patch('lambda_items.item_validation.check_valid_item_create',
+                new=mock_item_check_valid_item_create_valid)
+    @mock.patch('lambda_item.item_validation.get_relationship_data',
+                new=mock_get_relationship_data)
+    @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
+                new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_post_with_name_index(self):
+        import lambda_items
+        self.add_apps_name_index()
+        event = {**self.event_post_app_name_exists}
+        event['body'] = json.dumps([{'app_name': 'WordPress'}, {'app_name': 'App Number 5'}])
+        body = json.loads(lambda_items.lambda_handler(event, None)['body'])
+        self.assertEqual({'existing_name': ['WordPress']}, body['errors'])
+        self.assertNotIn('_name_lower', body['newItems'][0])
+        self.assertEqual('app number 5', self.apps_table.get_item(
+            Key={'app_id': body['newItems'][0]['app_id']})['Item']['_name_lower'])
+
+        event['body'] = json.dumps({'app_name': 'APP NUMBER 5'})
+        body = json.loads(lambda_items.lambda_handler(event, None)['body'])
+        self.assertEqual({'existing_name': ['APP NUMBER 5']}, body['errors'])
+
+    def get_bulk_put_event(self, updates):
+        return {
+            'httpMethod': 'PUT',
+            'pathParameters': {
+                'schema': 'app'
+            },
+            'body': json.dumps(updates)
+        }
+
+    @mock.patch('lambda_items.item_validation.check_valid_item_create',
+                new=mock_item_check_valid_item_create_valid)
+    @mock.patch('lambda_items.item_validation.get_relationship_data',
+                new=mock_get_relationship_data)
+    def test_lambda_handler_bulk_put(self):
+        import lambda_items
+        event = self.get_bulk_put_event([
+            {'id': '1', 'attributes': {'description': 'updated', 'tags': ['']}},
+            {'id': 2, 'attributes': {'aws_region': 'us-west-2'}},
+            {'id': '99', 'attributes': {'aws_region': 'us-west-2'}}
+        ])
+        with mock.patch('lambda_items.MFAuth.get_user_attribute_policy', autospec=True,
+                        side_effect=mock_get_user_attribute_policy_allow) as mock_policy:
+            response = lambda_items.lambda_handler(event, None)
+            # The policy is evaluated once for all the attributes in the request.
+            mock_policy.assert_called_once_with(mock.ANY, event, 'app', {'aws_region', 'description', 'tags'})
+
+        self.assertTrue('statusCode' not in response)
+        self.assertEqual([
+            {'id': '1', 'status': 'updated'},
+            {'id': '2', 'status': 'updated'},
+            {'id': '99', 'status': 'not_found', 'errors': ['app Id: 99 does not exist']}
+        ], json.loads(response['body'])['results'])
+
+        app_1 = self.apps_table.get_item(Key={'app_id': '1'})['Item']
+        self.assertEqual('updated', app_1['description'])
+        self.assertTrue('tags' not in app_1)
+        self.assertEqual('Wordpress', app_1['app_name'])
+        self.assertEqual('wordpress', app_1['_name_lower'])
+        self.assertEqual('testuser@example.com', app_1['_history']['lastModifiedBy'])
+        self.assertEqual('us-west-2', self.apps_table.get_item(Key={'app_id': '2'})['Item']['aws_region'])
+        self.assert_no_new_items_added()
+
+    @mock.patch('lambda_items.item_validation.get_relationship_data',
+                new=mock_get_relationship_data)
+    @mock.patch('lambda_items.MFAuth.get_user_attribute_policy',
+                new=mock_get_user_attribute_policy_allow)
+    def test_lambda_handler_bulk_put_invalid_items(self):
+        import lambda_items
+        event = self.get_bulk_put_event([
+            {'id': '1', 'attributes': {'app_name': 'WORDPRESS'}},
+            {'id': '2', 'attributes': {'app_name': 'wordpress'}}
+        ])
+        with mock.patch('lambda_items.item_validation.check_valid_item_create',
+                        new=mock_item_check_valid_item_create_valid):
+            results = json.loads(lambda_items.lambda_handler(event, None)['body'])['results']
+        self.assertEqual([
+            {'id': '1', 'status': 'updated'},
+            {'id': '2', 'status': 'invalid', 'errors': ['app_name: wordpress already exist']}
+        ], results)
+        self.assertEqual('WORDPRESS', self.apps_table.get_item(Key={'app_id': '1'})['Item']['app_name'])
+        self.assertEqual('OFBiz', self.apps_table.get_item(Key={'app_id': '2'})['Item']['app_name'])
+
+        event = self.get_bulk_put_event({'id': '2', 'attributes': {'aws_region': 'us-west-2'}})
+        with mock.patch('lambda_items.item_validation.check_valid_item_create',
+                        new=mock_item_check_valid_item_create_in_valid):
+            results = json.loads(lambda_items.lambda_handler(event, None)['body'])['results']
+        self.assertEqual([{'id': '2', 'status': 'invalid', 'errors': ['Simulated error, attribute x is required']}],
+                         results)
+        self.assertEqual('us-east-1', self.apps_table.get_item(Key={'app_id': '2'})['Item']['aws_region'])
+
+    @mock.patch('lambda_items.item_validation.check_valid_item_create',
+                new=mock_item_check_valid_item_create_valid)
+    @mock.patch('lambda_items.item_validation.get_relationship_data',
+                new=mock_get_relationship_data)
+    @mock.patch('lambda_items.MFAuth.get_user_attribute_policy',
+                new=mock_get_user_attribute_policy_allow)
+    def test_lambda_handler_bulk_put_conflict(self):
+        import lambda_items
+        get_existing_items = lambda_items.get_existing_items
+
+        def get_existing_items_then_modify(*args):
+            existing_items = get_existing_items(*args)
+            # another request modifies app 1 and deletes app 2 after they have been read.
+            self.apps_table.update_item(Key={'app_id': '1'}, UpdateExpression='SET description = :description, '
+                                                                              '#history = :history',
+                                        ExpressionAttributeNames={'#history': '_history'},
+                                        ExpressionAttributeValues={
+                                            ':description': 'concurrent',
+                                            ':history': {'lastModifiedTimestamp': '2024-01-01T00:00:00'}})
+            self.apps_table.delete_item(Key={'app_id': '2'})
+            return existing_items
+
+        event = self.get_bulk_put_event([
+            {'id': '1', 'attributes': {'aws_region': 'us-west-2'}},
+            {'id': '2', 'attributes': {'aws_region': 'us-west-2'}}
+        ])
+        with mock.patch('lambda_items.get_existing_items', side_effect=get_existing_items_then_modify), \
+                mock.patch('lambda_items.cmf_item_changes.increment_items_version_after_write') as mock_increment:
+            results = json.loads(lambda_items.lambda_handler(event, None)['body'])['results']
+            mock_increment.assert_not_called()
+        self.assertEqual([
+            {'id': '1', 'status': 'conflict',
+             'errors': ['app Id: 1 was modified or deleted by another request, retry the update']},
+            {'id': '2', 'status': 'conflict',
+             'errors': ['app Id: 2 was modified or deleted by another request, retry the update']}
+        ], results)
+        app_1 = self.apps_table.get_item(Key={'app_id': '1'})['Item']
+        self.assertEqual('concurrent', app_1['description'])
+        self.assertEqual('us-east-1', app_1['aws_region'])
+        self.assertTrue('Item' not in self.apps_table.get_item(Key={'app_id': '2'}))
+
+        # a retry reads the new version of the item and is applied.
+        results = json.loads(lambda_items.lambda_handler(event, None)['body'])['results']
+        self.assertEqual('updated', results[0]['status'])
+        self.assertEqual('us-west-2', self.apps_table.get_item(Key={'app_id': '1'})['Item']['aws_region'])
+
+    @mock.patch('lambda_items.MFAuth.get_user_attribute_policy',
+                new=mock_get_user_attribute_policy_allow)
+    def test_lambda_handler_bulk_put_invalid_body(self):
+        import lambda_items
+        invalid_bodies = [
+            [{'id': '1', 'attributes': {'app_id': '3'}}],
+            [{'id': '1', 'attributes': {}}],
+            [{'attributes': {'app_name': 'x'}}],
+            [{'id': '1', 'attributes': {'description': 'x'}}, {'id': 1, 'attributes': {'description': 'y'}}],
+            []
+        ]
+        for body in invalid_bodies:
+            response = lambda_items.lambda_handler(self.get_bulk_put_event(body), None)
+            self.assertEqual(400, response['statusCode'])
+        response = lambda_items.lambda_handler({**self.get_bulk_put_event([]), 'body': 'INVALID JSON'}, None)
+        self.assertEqual({'errors': ['malformed json input']}, json.loads(response['body']))
+
+    @mock.patch('lambda_items.MFAuth.get_user_attribute_policy',
+                new=mock_get_user_attribute_policy_deny)
+    def test_lambda_handler_bulk_put_not_authorized(self):
+        import lambda_items
+        response = lambda_items.lambda_handler(
+            self.get_bulk_put_event([{'id': '1', 'attributes': {'app_name': 'x'}}]), None)
+        self.assertEqual(401, response['statusCode'])
+        self.assertEqual('Wordpress', self.apps_table.get_item(Key={'app_id': '1'})['Item']['app_name'])
+
+    def get_bulk_delete_event(self, item_ids):
+        return {
+            'httpMethod': 'DELETE',
+            'pathParameters': {
+                'schema': 'app'
+            },
+            'body': json.dumps(item_ids)
+        }
+
+    @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
+                new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_bulk_delete(self):
+        import lambda_items
+        self.apps_table.update_item(Key={'app_id': '2'}, UpdateExpression='SET deletion_protection = :true',
+                                    ExpressionAttributeValues={':true': True})
+        response = lambda_items.lambda_handler(self.get_bulk_delete_event(['1', 2, '99', '1']), None)
+        self.assertTrue('statusCode' not in response)
+        self.assertEqual([
+            {'id': '1', 'status': 'deleted'},
+            {'id': '2', 'status': 'protected',
+             'errors': ['Record has deletion protection flag enabled, and cannot be deleted.']},
+            {'id': '99', 'status': 'not_found', 'errors': ['app Id: 99 does not exist']}
+        ], json.loads(response['body'])['results'])
+        self.assertEqual(['2'], [item['app_id'] for item in self.apps_table.scan()['Items']])
+
+    @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
+                new=mock_get_mf_auth_policy_allow)
+    def test_lambda_handler_bulk_delete_invalid_body(self):
+        import lambda_items
+        for body in [[], {'id': '1'}, [None], [True], ['']]:
+            response = lambda_items.lambda_handler(self.get_bulk_delete_event(body), None)
+            self.assertEqual(400, response['statusCode'])
+        response = lambda_items.lambda_handler({**self.get_bulk_delete_event([]), 'body': 'INVALID JSON'}, None)
+        self.assertEqual({'errors': ['malformed json input']}, json.loads(response['body']))
+        self.assert_no_new_items_added()
+
+    @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
+                new=mock_get_mf_auth_policy_default_deny)
+    def test_lambda_handler_bulk_delete_not_authorized(self):
+        import lambda_items
+        response = lambda_items.lambda_handler(self.get_bulk_delete_event(['1']), None)
+        self.assertEqual(401, response['statusCode'])
+        self.assert_no_new_items_added()
+
+    @mock.patch('lambda_items.MFAuth.get_user_resource_creation_policy',
+                new=mock_get_mf_auth_policy_allow)
+    @mock.patch('lambda_items.client_ddb.delete_item')
+    def test_lambda_handler_bulk_delete_unprocessed(self, mock_delete_item):
+        import botocore
+        import lambda_items
+        mock_delete_item.side_effect = botocore.exceptions.ClientError(
+            {'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'DeleteItem')
+        response = lambda_items.lambda_handler(self.get_bulk_delete_event(['1', '2']), None)
+        self.assertEqual(['unprocessed', 'unprocessed'],
+                         [result['status'] for result in json.loads(response['body'])['results']])
@@ -24,6 +24,7 @@ class LambdaNotificationsTest(unittest.TestCase):
         super().setUp()
         self.schema_table_name = lambda_notifications.schema_table_name
         self.ddb_client = boto3.client('dynamodb')
+        test_common_utils.create_counters_table(self.ddb_client, 'cmf-unittest-counters')
         self.event_get = {
             'httpMethod': 'GET'
         }
@@ -59,6 +60,22 @@ class LambdaNotificationsTest(unittest.TestCase):
                          }
         self.assertEqual(expected_body, body)
 
+    def test_lambda_handler_not_modified(self):
+        import lambda_notifications
+        import cmf_counters
+        test_common_utils.create_and_populate_schemas(self.ddb_client, self.schema_table_name)
+        response = lambda_notifications.lambda_handler(self.event_get, None)
+        etag = response['headers']['ETag']
+
+        response = lambda_notifications.lambda_handler({**self.event_get, 'headers': {'If-None-Match': etag}}, None)
+        self.assertEqual(304, response['statusCode'])
+        self.assertEqual('', response['body'])
+
+        cmf_counters.increment_counter(cmf_counters.SCHEMA_VERSION_COUNTER)
+        response = lambda_notifications.lambda_handler({**self.event_get, 'headers': {'If-None-Match': etag}}, None)
+        self.assertEqual(200, response['statusCode'])
+        self.assertNotEqual(etag, response['headers']['ETag'])
+
     def test_lambda_handler_success_modified_TS(self):
         if 'cors' in os.environ:
             del os.environ['cors']
@@ -22,6 +22,7 @@ class LambdaPolicyTest(unittest.TestCase):
         self.ddb_client = boto3.client('dynamodb')
         test_common_utils.create_and_populate_policies(self.ddb_client, lambda_policy.policies_table_name)
         test_common_utils.create_and_populate_schemas(self.ddb_client, lambda_policy.schema_table_name)
+        test_common_utils.create_counters_table(self.ddb_client, 'cmf-unittest-counters')
 
     def test_lambda_handler_get_success(self):
         import lambda_policy
@@ -190,6 +191,7 @@ class LambdaPolicyTest(unittest.TestCase):
         self.assertEqual(expected, response)
         inserted_item = lambda_policy.policy_table.get_item(Key={'policy_id': '4'})['Item']
         self.assertEqual(expected_item, inserted_item)
+        self.assertEqual(1, lambda_policy.cmf_counters.get_counter(lambda_policy.cmf_counters.PERMISSIONS_VERSION_COUNTER))
 
     def test_lambda_handler_post_flags_false(self):
         import lambda_policy
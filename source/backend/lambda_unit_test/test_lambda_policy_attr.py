@@ -22,6 +22,7 @@ class LambdaPolicyAttrTest(unittest.TestCase):
         self.ddb_client = boto3.client('dynamodb')
         test_common_utils.create_and_populate_policies(self.ddb_client, lambda_policy_attr.policies_table_name)
         test_common_utils.create_and_populate_schemas(self.ddb_client, lambda_policy_attr.schema_table_name)
+        test_common_utils.create_counters_table(self.ddb_client, 'cmf-unittest-counters')
 
     def test_lambda_handler_get_success(self):
         import lambda_policy_attr
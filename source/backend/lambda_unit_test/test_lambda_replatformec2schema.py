@@ -30,6 +30,7 @@ class LambdaReplatformEc2SchemaTest(unittest.TestCase):
         import lambda_replatformec2schema
         self.ddb_client = boto3.client('dynamodb')
         test_common_utils.create_and_populate_schemas(self.ddb_client, lambda_replatformec2schema.SCHEMA_TABLE)
+        test_common_utils.create_counters_table(self.ddb_client, 'cmf-unittest-counters')
         self.schema_table = boto3.resource('dynamodb').Table(lambda_replatformec2schema.SCHEMA_TABLE)
         self.lambda_context = LambdaContextLogStream('testing')
         self.event_create = {
@@ -22,6 +22,7 @@ class LambdaRoleTest(unittest.TestCase):
         self.ddb_client = boto3.client('dynamodb')
         test_common_utils.create_and_populate_policies(self.ddb_client, lambda_role.policies_table_name)
         test_common_utils.create_and_populate_roles(self.ddb_client, lambda_role.roles_table_name)
+        test_common_utils.create_counters_table(self.ddb_client, 'cmf-unittest-counters')
 
     def test_lambda_handler_get_success(self):
         import lambda_role
@@ -277,6 +278,7 @@ class LambdaRoleTest(unittest.TestCase):
             ]
         }
         self.assertEqual(expected_item, inserted_item)
+        self.assertEqual(1, lambda_role.cmf_counters.get_counter(lambda_role.cmf_counters.PERMISSIONS_VERSION_COUNTER))
 
     def test_lambda_handler_put_unexpected(self):
         import lambda_role
@@ -22,6 +22,7 @@ class LambdaRoleItemTest(unittest.TestCase):
         self.ddb_client = boto3.client('dynamodb')
         test_common_utils.create_and_populate_policies(self.ddb_client, lambda_role.policies_table_name)
         test_common_utils.create_and_populate_roles(self.ddb_client, lambda_role.roles_table_name)
+        test_common_utils.create_counters_table(self.ddb_client, 'cmf-unittest-counters')
 
     def test_lambda_handler_get_success(self):
         set_cors_flag('lambda_role_item', True)
@@ -324,6 +325,8 @@ class LambdaRoleItemTest(unittest.TestCase):
         self.assertEqual(expected, response)
         deleted_item = lambda_role_item.role_table.get_item(Key={'role_id': '2'})
         self.assertFalse('Item' in deleted_item)
+        self.assertEqual(1, lambda_role_item.cmf_counters.get_counter(
+            lambda_role_item.cmf_counters.PERMISSIONS_VERSION_COUNTER))
 
     def test_lambda_handler_delete_doesnt_exist(self):
         import lambda_role_item
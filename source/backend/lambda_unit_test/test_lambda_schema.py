@@ -24,7 +24,9 @@ class LambdaSchemaTest(unittest.TestCase):
         os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
         self.ddb_client = boto3.client('dynamodb')
         self.schema_table_name = f'{os.environ["application"]}-{os.environ["environment"]}-schema'
+        self.counters_table_name = f'{os.environ["application"]}-{os.environ["environment"]}-counters'
         test_common_utils.create_and_populate_schemas(self.ddb_client, self.schema_table_name)
+        test_common_utils.create_counters_table(self.ddb_client, self.counters_table_name)
 
     def test_get_schema_meta_data_success(self):
         import lambda_schema
@@ -43,6 +45,31 @@ class LambdaSchemaTest(unittest.TestCase):
         response_metadata = sorted(json.loads(response_metadata['body']), key=lambda entry: entry['schema_name'])
         self.assertEqual(expected_metadata, response_metadata)
 
+    def test_get_schema_meta_data_not_modified(self):
+        import lambda_schema
+        event_get = {
+            "httpMethod": 'GET',
+            "pathParameters": None
+        }
+        response = lambda_schema.lambda_handler(event_get, None)
+        etag = response['headers']['ETag']
+        self.assertEqual('ETag', response['headers']['Access-Control-Expose-Headers'])
+
+        event_get['headers'] = {'if-none-match': etag}
+        with mock.patch.object(lambda_schema, 'get_schema_list') as mock_get_schema_list:
+            response = lambda_schema.lambda_handler(event_get, None)
+            mock_get_schema_list.assert_not_called()
+        self.assertEqual(304, response['statusCode'])
+        self.assertEqual('', response['body'])
+        self.assertEqual(etag, response['headers']['ETag'])
+
+        # any schema change invalidates the ETag.
+        lambda_schema.lambda_handler({'httpMethod': 'DELETE', 'pathParameters': {'schema_name': 'app'}}, None)
+        response = lambda_schema.lambda_handler(event_get, None)
+        self.assertNotIn('statusCode', response)
+        self.assertNotEqual(etag, response['headers']['ETag'])
+        self.assertIn({'schema_name': 'app', 'schema_type': 'deleted-user'}, json.loads(response['body']))
+
     def test_non_get_with_no_schema(self):
         import lambda_schema
         event_get = {
@@ -105,6 +132,9 @@ class LambdaSchemaTest(unittest.TestCase):
             'lastModifiedTimestamp': ANY
         }
         self.assertEqual(expected, deleted_schema)
+        schema_version = self.ddb_client.get_item(
+            TableName=self.counters_table_name, Key={'counter_name': {'S': 'schema_version'}})['Item']
+        self.assertEqual('1', schema_version['counter_value']['N'])
 
     def test_delete_dont_exist(self):
         # TODO: this tests the current code as is, but the intent was to return 400
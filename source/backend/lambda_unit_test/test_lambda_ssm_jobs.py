@@ -76,6 +76,35 @@ class LambdaSSMJobsTest(unittest.TestCase):
         jobs_complete = [job for job in jobs if job['status'] == 'COMPLETE']
         self.assertEqual(2, len(jobs_complete))
 
+    def test_lambda_handler_get_unsorted_success(self):
+        import lambda_ssm_jobs
+        event = {
+            'httpMethod': 'GET',
+            'queryStringParameters': {
+                'maximumdays': 30,
+                'sort': 'none'
+            }
+        }
+        with mock.patch('lambda_ssm_jobs.cmf_dynamodb.scan_pages',
+                        wraps=lambda_ssm_jobs.cmf_dynamodb.scan_pages) as mock_scan_pages:
+            response = lambda_ssm_jobs.lambda_handler(event, None)
+            mock_scan_pages.assert_called_once()
+        jobs = json.loads(response['body'])
+        self.assertEqual({'Test job 1': 'RUNNING', 'Test job 2': 'TIMED-OUT'},
+                         {job['jobname']: job['status'] for job in jobs})
+
+    def test_lambda_handler_get_sorted_latest_first(self):
+        import lambda_ssm_jobs
+        event = {
+            'httpMethod': 'GET',
+            'queryStringParameters': {
+                'maximumdays': 30
+            }
+        }
+        response = lambda_ssm_jobs.lambda_handler(event, None)
+        # job 2 has just timed out, so it was completed last.
+        self.assertEqual(['Test job 2', 'Test job 1'], [job['jobname'] for job in json.loads(response['body'])])
+
     def test_lambda_handler_post_success(self):
         import lambda_ssm_jobs
         event = {
@@ -93,6 +93,7 @@ class LambdaSSMSocketTest(unittest.TestCase):
     def setUp(self, _) -> None:
         os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
         import lambda_ssm_socket
+        lambda_ssm_socket.jwks_cache.clear()
         self.test_conn_id = '1'
         self.next_conn_id = '3'
         self.event_connect = {
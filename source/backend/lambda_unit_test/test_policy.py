@@ -42,9 +42,13 @@ class PolicyTestCase(TestCase):
 
     @mock.patch.dict('os.environ', default_mock_os_environ)
     def setUp(self) -> None:
-        from lambda_layers.lambda_layer_policy.python.policy import MFAuth, AuthPolicy
+        from lambda_layers.lambda_layer_policy.python.policy import MFAuth, AuthPolicy, permission_matrix_cache, \
+            authorizer_decision_cache
         import lambda_role
+        permission_matrix_cache.clear()
+        authorizer_decision_cache.clear()
         self.ddb_client = boto3.client('dynamodb')
+        test_common_utils.create_counters_table(self.ddb_client, 'cmf-unittest-counters')
         test_common_utils.create_and_populate_policies(
             self.ddb_client,
             lambda_role.policies_table_name,
@@ -132,6 +136,7 @@ class PolicyTestCase(TestCase):
         print("Tearing down")
         self.ddb_client.delete_table(TableName=lambda_role.policies_table_name)
         self.ddb_client.delete_table(TableName=lambda_role.roles_table_name)
+        self.ddb_client.delete_table(TableName='cmf-unittest-counters')
         self.dynamodb = None
         print("Teardown complete")
 
@@ -326,13 +331,71 @@ class PolicyTestCase(TestCase):
         self.assertEqual(response, expected_response)
 
 
-    def test_get_user_policy_list(self):
-        log.info("Testing policy: get_user_policy_list")
-        response = self.auth.get_user_policy_list(self.put_event)
-        print("Response: ", response)
-        expected_response = ['1', '2']
-        self.assertEqual(response, expected_response)
+    def get_admin_event(self, method_path, stage='test'):
+        return {
+            "type": "REQUEST",
+            "authorizationToken": "token",
+            "methodArn": "arn:aws:execute-api:us-east-1:accountid:abcdef123/" + stage + "/" + method_path,
+            "headers": {}
+        }
 
+    def get_admin_claims(self, groups, expires_in=3600):
+        return {'token_use': 'id', 'sub': 'user-id', 'email': self.email, 'cognito:groups': groups,
+                'exp': int(time.time()) + expires_in}
+
+    def test_get_admin_resource_policy_allows_whole_api(self):
+        log.info("Testing policy: get_admin_resource_policy allows all the methods of the API for admins")
+        with mock.patch.object(self.auth, 'get_claims', return_value=self.get_admin_claims(['admin'])):
+            response = self.auth.get_admin_resource_policy(self.get_admin_event('GET/admin/users'))
+
+        expected_response = {
+            "principalId": "user-id",
+            "policyDocument": {
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Action": "execute-api:Invoke",
+                    "Effect": "Allow",
+                    "Resource": ["arn:aws:execute-api:us-east-1:accountid:abcdef123/test/*/admin/*",
+                                 "arn:aws:execute-api:us-east-1:accountid:abcdef123/test/*/admin"]
+                }]
+            }
+        }
+        self.assertEqual(expected_response, response)
+
+    def test_get_admin_resource_policy_denies_non_admin(self):
+        log.info("Testing policy: get_admin_resource_policy denies users that are not admins")
+        with mock.patch.object(self.auth, 'get_claims', return_value=self.get_admin_claims(['readonly'])):
+            response = self.auth.get_admin_resource_policy(self.get_admin_event('POST/login'))
+
+        self.assertEqual([{"Action": "execute-api:Invoke", "Effect": "Deny",
+                           "Resource": ["arn:aws:execute-api:us-east-1:accountid:abcdef123/test/*/*"]}],
+                         response['policyDocument']['Statement'])
+
+    def test_get_admin_resource_policy_cached(self):
+        log.info("Testing policy: get_admin_resource_policy decisions are cached")
+        with mock.patch.object(self.auth, 'get_claims', return_value=self.get_admin_claims(['admin'])), \
+                mock.patch.object(self.auth, 'add_methods_for_admin_api',
+                                  wraps=self.auth.add_methods_for_admin_api) as mock_add_methods:
+            response = self.auth.get_admin_resource_policy(self.get_admin_event('GET/admin/users'))
+            response['policyDocument']['Statement'].clear()
+            cached_response = self.auth.get_admin_resource_policy(self.get_admin_event('DELETE/admin/groups/test'))
+            other_stage_response = self.auth.get_admin_resource_policy(self.get_admin_event('GET/admin/users', 'prod'))
+
+        mock_add_methods.assert_has_calls([mock.call('admin', ['admin'], self.email, mock.ANY, '*', '/admin/*')] * 2)
+        self.assertEqual(2, mock_add_methods.call_count)
+        self.assertEqual("Allow", cached_response['policyDocument']['Statement'][0]['Effect'])
+        self.assertEqual("arn:aws:execute-api:us-east-1:accountid:abcdef123/prod/*/admin/*",
+                         other_stage_response['policyDocument']['Statement'][0]['Resource'][0])
+
+    def test_get_admin_resource_policy_cache_expired(self):
+        log.info("Testing policy: get_admin_resource_policy decisions are not used after the token expires")
+        with mock.patch.object(self.auth, 'get_claims', return_value=self.get_admin_claims(['admin'], -1)), \
+                mock.patch.object(self.auth, 'add_methods_for_admin_api',
+                                  wraps=self.auth.add_methods_for_admin_api) as mock_add_methods:
+            self.auth.get_admin_resource_policy(self.get_admin_event('GET/admin/users'))
+            self.auth.get_admin_resource_policy(self.get_admin_event('GET/admin/users'))
+
+        self.assertEqual(2, mock_add_methods.call_count)
 
     def test_get_user_resource_creation_policy_for_put_event(self):
         log.info("Testing policy: get_user_resource_creation_policy for put event")
@@ -426,6 +489,22 @@ class PolicyTestCase(TestCase):
         self.assertEqual(response, expected_response)
 
 
+    def test_get_user_attribute_policy_with_attribute_names(self):
+        log.info("Testing policy: get_user_attribute_policy with the attribute names provided")
+        schema_name = 'app'
+        response = self.auth.get_user_attribute_policy(self.put_event, schema_name, ['app_name', 'wave_id'])
+        print("Response: ", response)
+        expected_response = {
+            "action": "allow",
+            "cause": "You have permission to update attributes : app_name,wave_id",
+            "user": {
+                "userRef": "testuser",
+                "email": "test@example.com"
+            }
+        }
+        self.assertEqual(response, expected_response)
+
+
     def test_get_user_attribute_policy_without_cognito_user(self):
         log.info("Testing policy: get_user_attribute_policy for event having no cognito user name")
         schema_name = 'app'
@@ -479,4 +558,153 @@ class PolicyTestCase(TestCase):
             "action": "deny",
             "cause": "Email address not provided. Access denied."
         }
-        self.assertEqual(response, expected_response)
\ No newline at end of file
+        self.assertEqual(response, expected_response)
+
+    def test_build_permission_matrix(self):
+        log.info("Testing policy: build_permission_matrix")
+        from lambda_layers.lambda_layer_policy.python.policy import build_permission_matrix
+        roles = [
+            {'role_id': '1', 'groups': [{'group_name': 'admin'}, {'group_name': 'user'}],
+             'policies': [{'policy_id': '1'}, {'policy_id': '2'}]},
+            {'role_id': '2', 'groups': [{'group_name': 'readonly'}], 'policies': [{'policy_id': '2'}]}
+        ]
+        policies = [
+            {'policy_id': '1', 'entity_access': [
+                {'schema_name': 'server', 'create': True, 'update': True, 'delete': False,
+                 'attributes': [{'attr_name': 'server_name'}]}]},
+            {'policy_id': '2', 'entity_access': [
+                {'schema_name': 'server', 'read': True, 'attributes': [{'attr_name': 'server_os'}]},
+                {'schema_name': 'server', 'attributes': [{'attr_name': 'ignored'}]}]},
+            {'policy_id': '3', 'entity_access': [{'schema_name': 'wave', 'delete': True}]}
+        ]
+
+        matrix = build_permission_matrix(roles, policies)
+
+        self.assertEqual(['admin', 'user', 'readonly'], list(matrix.keys()))
+        self.assertEqual({'server': {'actions': {'create', 'read', 'update'},
+                                     'attributes': {'server_name', 'server_os'}}}, matrix['admin'])
+        self.assertEqual({'server': {'actions': {'read'}, 'attributes': {'server_os'}}}, matrix['readonly'])
+        self.assertIsInstance(matrix['admin']['server']['attributes'], frozenset)
+
+    def test_get_user_attribute_policy_with_attribute_set(self):
+        log.info("Testing policy: get_user_attribute_policy with the set of the attributes of a batch")
+        allowed_attributes = self.auth.get_user_allowed_attributes(self.put_event, 'application')
+        attribute_names = set(allowed_attributes) | {'not_allowed_2', 'not_allowed_1'}
+
+        response = self.auth.get_user_attribute_policy(self.put_event, 'app', attribute_names)
+
+        self.assertIsInstance(allowed_attributes, frozenset)
+        self.assertIn('app_name', allowed_attributes)
+        self.assertEqual('deny', response['action'])
+        self.assertEqual('You do not have permission to update attributes : not_allowed_1,not_allowed_2',
+                         response['cause'])
+
+    def test_permission_matrix_compiled_once(self):
+        log.info("Testing policy: permission matrix is compiled once")
+        with mock.patch.object(self.auth.role_table, 'scan', wraps=self.auth.role_table.scan) as mock_scan:
+            self.assertEqual('allow', self.auth.get_user_resource_creation_policy(self.put_event, 'app')['action'])
+            self.assertEqual('allow', self.auth.get_user_attribute_policy(
+                self.put_event, 'app', ['app_name'])['action'])
+
+        mock_scan.assert_called_once()
+
+    @mock.patch('lambda_layers.lambda_layer_policy.python.policy.PermissionMatrixCache.version_check_seconds', 0)
+    def test_permission_matrix_compiled_on_permissions_version_change(self):
+        log.info("Testing policy: permission matrix is compiled again when the permissions version changes")
+        self.assertEqual('allow', self.auth.get_user_resource_creation_policy(self.put_event, 'app')['action'])
+
+        self.auth.role_table.delete_item(Key={'role_id': '1'})
+        self.assertEqual('allow', self.auth.get_user_resource_creation_policy(self.put_event, 'app')['action'])
+
+        self.auth.counters_table.put_item(Item={'counter_name': 'permissions_version', 'counter_value': 1})
+        self.assertEqual('deny', self.auth.get_user_resource_creation_policy(self.put_event, 'app')['action'])
+
+    def test_permission_matrix_without_permissions_version(self):
+        log.info("Testing policy: permission matrix is compiled for every request without the permissions version")
+        self.ddb_client.delete_table(TableName='cmf-unittest-counters')
+        with mock.patch.object(self.auth.role_table, 'scan', wraps=self.auth.role_table.scan) as mock_scan:
+            self.assertEqual('allow', self.auth.get_user_resource_creation_policy(self.put_event, 'app')['action'])
+            self.assertEqual('allow', self.auth.get_user_resource_creation_policy(self.put_event, 'app')['action'])
+        test_common_utils.create_counters_table(self.ddb_client, 'cmf-unittest-counters')
+
+        self.assertEqual(2, mock_scan.call_count)
+
+
+def get_jwks_response(jwks):
+    response = mock.MagicMock()
+    response.__enter__.return_value.read.return_value = json.dumps(jwks)
+    return response
+
+
+@mock.patch.dict('os.environ', mock_os_environ)
+@mock_aws
+class JWKSCacheTestCase(TestCase):
+
+    @mock.patch.dict('os.environ', mock_os_environ)
+    def setUp(self) -> None:
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from lambda_layers.lambda_layer_policy.python import policy
+        self.policy = policy
+        policy.jwks_cache.clear()
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self.private_key.public_key()))
+        self.jwks = {'keys': [{**jwk, 'kid': 'key-1', 'alg': 'RS256', 'use': 'sig'}]}
+        self.auth = policy.MFAuth()
+        self.issuer = self.auth.pool_url('us-east-1', 'testuserpool')
+
+    def get_token(self, kid='key-1', expires_in=3600, email='test@example.com'):
+        return jwt.encode({'iss': self.issuer, 'aud': 'testclientid', 'exp': int(time.time()) + expires_in,
+                           'email': email, 'token_use': 'id'},
+                          self.private_key, algorithm='RS256', headers={'kid': kid})
+
+    def get_claims(self, token):
+        return self.auth.get_claims('us-east-1', 'testuserpool', token, 'testclientid')
+
+    def test_get_claims_downloads_key_set_once(self):
+        log.info("Testing policy: test_get_claims_downloads_key_set_once")
+        token = self.get_token()
+        with mock.patch('urllib.request.urlopen', return_value=get_jwks_response(self.jwks)) as mock_urlopen:
+            self.assertEqual('test@example.com', self.get_claims(token)['email'])
+            self.assertEqual('test@example.com', self.get_claims(token)['email'])
+            self.assertEqual('other@example.com', self.get_claims(self.get_token(email='other@example.com'))['email'])
+
+        mock_urlopen.assert_called_once()
+
+    def test_get_claims_cached_until_expiry(self):
+        log.info("Testing policy: test_get_claims_cached_until_expiry")
+        token = self.get_token()
+        with mock.patch('urllib.request.urlopen', return_value=get_jwks_response(self.jwks)):
+            claims = self.get_claims(token)
+
+        with mock.patch.object(jwt.api_jwt, 'decode_complete') as mock_decode:
+            self.assertEqual(claims, self.get_claims(token))
+            mock_decode.assert_not_called()
+
+        with mock.patch('time.time', return_value=claims['exp']):
+            self.assertIsNone(self.policy.jwks_cache.get_claims((self.issuer, token, 'testclientid', None)))
+
+    def test_get_claims_unknown_key_refreshes_key_set(self):
+        log.info("Testing policy: test_get_claims_unknown_key_refreshes_key_set")
+        with mock.patch('urllib.request.urlopen', return_value=get_jwks_response(self.jwks)) as mock_urlopen:
+            self.get_claims(self.get_token())
+            # a key that is not in the key set is only looked for once in the minimum refresh interval.
+            self.assertRaises(jwt.exceptions.PyJWKClientError, self.get_claims, self.get_token(kid='key-2'))
+            self.assertRaises(jwt.exceptions.PyJWKClientError, self.get_claims, self.get_token(kid='key-3'))
+            self.assertEqual(1, mock_urlopen.call_count)
+
+            with mock.patch.object(self.policy.jwks_cache, 'min_refresh_seconds', 0):
+                self.assertRaises(jwt.exceptions.PyJWKClientError, self.get_claims, self.get_token(kid='key-2'))
+            self.assertEqual(2, mock_urlopen.call_count)
+
+    def test_claims_cache_bounded(self):
+        log.info("Testing policy: test_claims_cache_bounded")
+        jwks_cache = self.policy.jwks_cache
+        exp = int(time.time()) + 3600
+        with mock.patch.object(jwks_cache, 'claims_cache_max_size', 2):
+            jwks_cache.put_claims('token-1', {'exp': exp})
+            jwks_cache.put_claims('token-2', {'exp': exp})
+            jwks_cache.get_claims('token-1')
+            jwks_cache.put_claims('token-3', {'exp': exp})
+            jwks_cache.put_claims('token-4', {'email': 'no expiry'})
+
+        self.assertEqual(['token-1', 'token-3'], list(jwks_cache.claims.keys()))
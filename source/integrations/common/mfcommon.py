@@ -23,6 +23,8 @@ databaseendpoint = '/user/database'
 appendpoint = '/user/app'
 waveendpoint = '/user/wave'
 REQUESTS_DEFAULT_TIMEOUT = 60
+# Maximum number of values in a single 'in' filter condition supported by the API.
+FILTER_IN_MAX_VALUES = 100
 
 PREFIX_CREDENTIALS_STORE = 'cached_secret:'
 ERROR_MSG_PREFIX = "ERROR:"
@@ -85,8 +87,10 @@ def build_requests_parameters(token, api_id, api_path, mf_config_override=None):
     }
 
 
-def get_data_from_api(token, api_id, api_path, mf_config_override=None):
+def get_data_from_api(token, api_id, api_path, mf_config_override=None, query_parameters=None):
     request_parameters = build_requests_parameters(token, api_id, api_path, mf_config_override)
+    if query_parameters:
+        request_parameters['params'] = query_parameters
 
     try:
         requests_response = requests.get(**request_parameters)  # nosec B113
@@ -216,24 +220,62 @@ def filter_items(items, key, item_ids=None):
         return items
 
 
+def get_filter_query_parameters(filters):
+    # Filters are applied by the API, deployments that do not support filters ignore the parameter and return all
+    # items, so results are still filtered by the caller.
+    return {'filter': json.dumps(filters)}
+
+
+def get_filter_in_condition(attribute, values):
+    return {'attribute': attribute, 'comparator': 'in', 'value': list(values)}
+
+
+def get_factory_wave_apps(waveid, token, app_ids=None):
+    filters = [{'attribute': 'wave_id', 'comparator': 'eq', 'value': str(waveid)}]
+    if app_ids and len(app_ids) <= FILTER_IN_MAX_VALUES:
+        filters.insert(0, get_filter_in_condition('app_id', app_ids))
+
+    apps_api_response = get_data_from_api(
+        token, get_mf_config_user_api_id(), appendpoint, query_parameters=get_filter_query_parameters(filters))
+
+    return json.loads(apps_api_response.text)
+
+
+def get_factory_apps_servers(app_ids, token, server_ids=None, rtype=None):
+    filters = []
+    if server_ids and len(server_ids) <= FILTER_IN_MAX_VALUES:
+        filters.append(get_filter_in_condition('server_id', server_ids))
+    if rtype is not None:
+        filters.append({'attribute': 'r_type', 'comparator': 'eq', 'value': rtype})
+
+    servers = {}
+    for i in range(0, len(app_ids), FILTER_IN_MAX_VALUES):
+        app_filters = [get_filter_in_condition('app_id', app_ids[i:i + FILTER_IN_MAX_VALUES])] + filters
+        servers_api_response = get_data_from_api(
+            token, get_mf_config_user_api_id(), serverendpoint,
+            query_parameters=get_filter_query_parameters(app_filters))
+        for server in json.loads(servers_api_response.text):
+            servers[server['server_id']] = server
+
+    return list(servers.values())
+
+
 # Function is used to get servers based on the AWS account they are targeted to.
 def get_factory_servers(waveid, token, app_ids=None, server_ids=None, os_split=True, rtype=None):
     try:
         linux_exist = False
         windows_exist = False
-        # Get all Apps and servers from migration factory
+        # Get the Apps in the wave and their servers from migration factory
 
-        servers_api_response = get_data_from_api(token, get_mf_config_user_api_id(), serverendpoint)
+        cmf_apps = get_factory_wave_apps(waveid, token, app_ids)
 
-        cmf_servers = json.loads(servers_api_response.text)
-
-        cmf_servers = filter_items(cmf_servers, 'server_id', server_ids)
+        cmf_apps = filter_items(cmf_apps, 'app_id', app_ids)
 
-        apps_api_response = get_data_from_api(token, get_mf_config_user_api_id(), appendpoint)
+        wave_app_ids = [app['app_id'] for app in cmf_apps if app.get('wave_id') == str(waveid)]
 
-        cmf_apps = json.loads(apps_api_response.text)
+        cmf_servers = get_factory_apps_servers(wave_app_ids, token, server_ids, rtype)
 
-        cmf_apps = filter_items(cmf_apps, 'app_id', app_ids)
+        cmf_servers = filter_items(cmf_servers, 'server_id', server_ids)
 
         servers = sorted(cmf_servers, key=lambda i: i['server_name'])
         apps = sorted(cmf_apps, key=lambda i: i['app_name'])
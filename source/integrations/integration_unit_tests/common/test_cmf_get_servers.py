@@ -4,10 +4,16 @@
 
 import botocore
 import contextlib, io
+import json
 from unittest import TestCase, mock
 from common.test_mfcommon_util import default_mock_os_environ, logger, mock_file_open
 
 
+class ApiResponse:
+    def __init__(self, json_value):
+        self.text = json.dumps(json_value)
+
+
 @mock.patch.dict('os.environ', default_mock_os_environ)
 @mock.patch('builtins.open', new=mock_file_open)
 class CMFGetServersTestCase(TestCase):
@@ -59,3 +65,30 @@ class CMFGetServersTestCase(TestCase):
         print("Response: ", response)
         expected_response = message
         self.assertEqual(response, expected_response)
+
+    @mock.patch('mfcommon.get_data_from_api')
+    def test_get_factory_servers_filters_by_wave(self, mock_get_data_from_api):
+        logger.info("Testing test_cmf_get_servers: "
+                    "test_get_factory_servers_filters_by_wave")
+        import mfcommon
+        app = {'app_id': '1', 'app_name': 'app one', 'wave_id': '1', 'aws_accountid': '111111111111',
+               'aws_region': 'us-east-1'}
+        server = {'server_id': '1', 'server_name': 'server1', 'app_id': '1', 'r_type': 'Rehost',
+                  'server_os_family': 'linux', 'server_fqdn': 'server1.example.com'}
+        other_server = {'server_id': '2', 'server_name': 'server2', 'app_id': '2', 'r_type': 'Rehost',
+                        'server_os_family': 'linux', 'server_fqdn': 'server2.example.com'}
+        mock_get_data_from_api.side_effect = [
+            ApiResponse([app]),
+            ApiResponse([server, other_server])
+        ]
+        aws_accounts = mfcommon.get_factory_servers('1', 'test_token', os_split=False, rtype='Rehost')
+        self.assertEqual([server], aws_accounts[0]['servers'])
+
+        apps_call, servers_call = mock_get_data_from_api.call_args_list
+        self.assertEqual(mfcommon.appendpoint, apps_call.args[2])
+        self.assertEqual([{'attribute': 'wave_id', 'comparator': 'eq', 'value': '1'}],
+                         json.loads(apps_call.kwargs['query_parameters']['filter']))
+        self.assertEqual(mfcommon.serverendpoint, servers_call.args[2])
+        self.assertEqual([{'attribute': 'app_id', 'comparator': 'in', 'value': ['1']},
+                          {'attribute': 'r_type', 'comparator': 'eq', 'value': 'Rehost'}],
+                         json.loads(servers_call.kwargs['query_parameters']['filter']))
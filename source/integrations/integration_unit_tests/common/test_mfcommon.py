@@ -498,7 +498,7 @@ class CommonTestCase(TestCase):
         response = print_str.getvalue()
         print("Response: ", response)
         expected_response = ("ERROR: Bad response from API https://xxxxxx.execute-api.us-east-1.amazonaws.com"
-                             "/prod/user/server/user/server. Not yet implemented\n")
+                             "/prod/user/app/user/app. Not yet implemented\n")
         self.assertEqual(response, expected_response)
 
     @mock.patch("requests.get", new=mock_requests_get_empty_accounts)
@@ -730,7 +730,7 @@ class CommonTestCase(TestCase):
         response = print_str.getvalue()
         print("Response: ", response)
         expected_response = \
-        "ERROR: Could not connect to API endpoint https://xxxxxx.execute-api.us-east-1.amazonaws.com/prod/user/server/user/server.\n"
+        "ERROR: Could not connect to API endpoint https://xxxxxx.execute-api.us-east-1.amazonaws.com/prod/user/app/user/app.\n"
         self.assertEqual(response, expected_response)
 
     def test_get_mf_config_user_api_id_with_user_api(self):
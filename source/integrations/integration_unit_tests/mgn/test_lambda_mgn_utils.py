@@ -26,6 +26,7 @@ class LambdaMgnUtilsTestCase(TestCase):
 
     def setUp(self):
         super().setUp()
+        lambda_mgn_utils.clear_credentials_cache()
 
     def tearDown(self):
         super().tearDown()
@@ -44,6 +45,18 @@ class LambdaMgnUtilsTestCase(TestCase):
         self.assertIn("SecretAccessKey", result)
         self.assertIn("SessionToken", result)
 
+    def test_assume_role_reuses_credentials_until_expiry(self):
+        result = lambda_mgn_utils.assume_role("111111111111", 'us-east-1')
+
+        with mock.patch('lambda_mgn_utils.assume_role_in_account') as mock_assume_role:
+            self.assertEqual(result['AccessKeyId'],
+                             lambda_mgn_utils.assume_role("111111111111", 'us-east-1')['AccessKeyId'])
+            mock_assume_role.assert_not_called()
+
+        with mock.patch('lambda_mgn_utils.CREDENTIALS_EXPIRY_MARGIN_SECONDS', new=365 * 24 * 3600):
+            self.assertNotEqual(result['AccessKeyId'],
+                                lambda_mgn_utils.assume_role("111111111111", 'us-east-1')['AccessKeyId'])
+
     @mock.patch('boto3.client')
     def test_assume_role_returns_error_on_sts_fail(self, mock_client):
         mock_client.return_value = mock.Mock
@@ -15,6 +15,7 @@ import cmf_logger
 import cmf_pipeline
 import threading
 import cmf_boto
+import cmf_dynamodb
 
 MGN_ACTIONS = [
     'Validate Launch Template',
@@ -70,26 +71,24 @@ servers_table = cmf_boto.resource('dynamodb').Table(servers_table_name)
 apps_table = cmf_boto.resource('dynamodb').Table(apps_table_name)
 
 
-# Pagination for server DynamoDB table scan
-def scan_dynamodb_server_table():
-    response = servers_table.scan(ConsistentRead=True)
-    scan_data = response['Items']
-    while 'LastEvaluatedKey' in response:
-        log.info("Last Evaluate key for server is   " + str(response['LastEvaluatedKey']))
-        response = servers_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], ConsistentRead=True)
-        scan_data.extend(response['Items'])
-    return (scan_data)
+# Only the apps in the wave are read, queried by app id when a list of apps is provided.
+def get_wave_apps(waveid, app_ids=None):
+    filters = [{'attribute': 'wave_id', 'comparator': cmf_dynamodb.FILTER_EQUAL_COMPARATOR, 'value': str(waveid)}]
+    if app_ids:
+        filters.insert(0, {'attribute': 'app_id', 'comparator': cmf_dynamodb.FILTER_IN_COMPARATOR,
+                           'value': list(app_ids)})
+    return cmf_dynamodb.get_filtered_items(apps_table, filters)
 
 
-# Pagination for app DynamoDB table scan
-def scan_dynamodb_app_table():
-    response = apps_table.scan(ConsistentRead=True)
-    scan_data = response['Items']
-    while 'LastEvaluatedKey' in response:
-        log.info("Last Evaluate key for app is   " + str(response['LastEvaluatedKey']))
-        response = apps_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], ConsistentRead=True)
-        scan_data.extend(response['Items'])
-    return (scan_data)
+# Only the servers of the apps provided are read, queried through the app_id index.
+def get_apps_servers(app_ids):
+    app_ids = list(app_ids)
+    servers = []
+    for i in range(0, len(app_ids), cmf_dynamodb.FILTER_IN_MAX_VALUES):
+        filters = [{'attribute': 'app_id', 'comparator': cmf_dynamodb.FILTER_IN_COMPARATOR,
+                    'value': app_ids[i:i + cmf_dynamodb.FILTER_IN_MAX_VALUES]}]
+        servers.extend(cmf_dynamodb.get_filtered_items(servers_table, filters))
+    return servers
 
 
 # Pagination for describe MGN source servers
@@ -247,15 +246,14 @@ def get_servers(target_aws_accounts, filtered_apps,
 def get_factory_servers(waveid, accountid, appidlist, server_ids=None):
     errors = []
     try:
-        # Get all Apps and servers from migration factory
-        cmf_servers = scan_dynamodb_server_table()
+        # Get the Apps in the wave and their servers from migration factory
+        cmf_app = get_wave_apps(waveid, appidlist)
+        cmf_app = filter_items(cmf_app, 'app_id', appidlist)
+        cmf_app = sorted(cmf_app, key=lambda i: i['app_name'])
 
+        cmf_servers = get_apps_servers(app['app_id'] for app in cmf_app)
         cmf_servers = filter_items(cmf_servers, 'server_id', server_ids)
         cmf_servers = sorted(cmf_servers, key=lambda i: i['server_name'])
-
-        cmf_app = scan_dynamodb_app_table()
-        cmf_app = filter_items(cmf_app, 'app_id', appidlist)
-        cmf_app = sorted(cmf_app, key=lambda i: i['app_name'])
         if accountid == '' and len(appidlist) == 0:
             msg = "ERROR: Either AWS Account Id or Application Id List must be provided"
             log.error(msg)
@@ -463,7 +461,8 @@ def verify_target_account_servers(serverlist):
                 continue
             target_account_session = lambda_mgn_utils.get_session(target_account_creds,
                                                                   str(account['aws_region']))
-            mgn_client_base = cmf_boto.session_client(target_account_session, "mgn", account['aws_region'])
+            mgn_client_base = cmf_boto.session_client(target_account_session, "mgn", account['aws_region'],
+                                                      credentials_expiration=target_account_creds.get('Expiration'))
             mgn_sourceservers = get_mgn_source_servers(mgn_client_base)
 
             msg, account, source_server_ids = verify_account_server(
@@ -499,7 +498,8 @@ def get_mgn_launch_template_id(creds, region, factoryserver, mgn_source_server_l
 
     msg_process_id = f"PID: {str(os.getpid())}"
     session = lambda_mgn_utils.get_session(creds, region)
-    mgn_client = cmf_boto.session_client(session, "mgn", region_name=region)
+    mgn_client = cmf_boto.session_client(session, "mgn", region_name=region,
+                                         credentials_expiration=creds.get('Expiration'))
     log.info(msg_process_id + " - Getting EC2 Launch template Id for " + factoryserver['server_name'])
     log.info(msg_process_id + " - " + str(factoryserver))
     ec2_launch_template_id = mgn_client.get_launch_configuration(sourceServerID=factoryserver['source_server_id'])[
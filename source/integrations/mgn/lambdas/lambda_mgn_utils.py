@@ -2,6 +2,8 @@
 #  SPDX-License-Identifier: Apache-2.0
 
 import os
+import threading
+import time
 import boto3
 import botocore.exceptions
 import logging
@@ -9,8 +11,44 @@ import logging
 log = logging.getLogger()
 log.setLevel(logging.INFO)
 
+# The credentials of the role assumed in each target account and region are reused until they are about to expire,
+# so that the clients created from them are shared by cmf_boto instead of being created again for every call.
+CREDENTIALS_EXPIRY_MARGIN_SECONDS = 300
+_credentials_lock = threading.Lock()
+_credentials_cache = {}
+
+
+def is_credentials_valid(credentials):
+    expiration = credentials.get('Expiration')
+    if not hasattr(expiration, 'timestamp'):
+        return False
+    return expiration.timestamp() - CREDENTIALS_EXPIRY_MARGIN_SECONDS > time.time()
+
+
+def clear_credentials_cache():
+    with _credentials_lock:
+        _credentials_cache.clear()
+
 
 def assume_role(account_id, region):
+    """
+    Returns the credentials of the CMF-MGNAutomation role in the account, reusing the credentials of a previous call
+    for the same account and region until they are about to expire.
+    """
+    cache_key = (account_id, region)
+    with _credentials_lock:
+        credentials = _credentials_cache.get(cache_key)
+    if credentials is not None and is_credentials_valid(credentials):
+        return dict(credentials)
+
+    credentials = assume_role_in_account(account_id, region)
+    if 'ERROR' not in credentials and is_credentials_valid(credentials):
+        with _credentials_lock:
+            _credentials_cache[cache_key] = dict(credentials)
+    return credentials
+
+
+def assume_role_in_account(account_id, region):
     sts_client = boto3.client('sts', region_name=region)
     role_arn = 'arn:aws:iam::' + account_id + ':role/CMF-MGNAutomation'
     log.info(f"Creating new session with role: 'arn:aws:iam::{obfuscate_account_id(account_id)}:role/CMF-MGNAutomation'")
@@ -25,7 +63,7 @@ def assume_role(account_id, region):
             if region:
                 # Assume that STS is not available in region so try global.
                 log.info(f"Unable to obtain STS client in region {region}, trying global.")
-                return assume_role(account_id, region=None)
+                return assume_role_in_account(account_id, region=None)
             raise
         log.debug('Logged in as: ' + user)
         sessionname = user.split('/')[1]